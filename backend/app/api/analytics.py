@@ -8,24 +8,45 @@ from app.database.supabase_client import get_supabase_client
 from app.core.dependencies import verify_bot_access
 from app.core.cache import cached
 from app.core.config import settings
+from app.core.responses import direct_json_response
+from app.core.timestamps import HOUR, MAX_HOURLY_DAYS, resolve_granularity
+from app.models.analytics import DetailedAnalytics
+from app.core.tracing import TracedAPIRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(route_class=TracedAPIRoute)
 
-@router.get("/{bot_id}/dashboard", response_model=Dict[str, Any])
-@cached(ttl=settings.RESPONSE_CACHE_TTL if settings.ENABLE_RESPONSE_CACHE else None, key_params=['bot_id', 'days'])
+GRANULARITY_PATTERN = "^(hour|day|week|month|auto)$"
+
+
+def _resolve_granularity(granularity: str, days: int) -> str:
+    """Гранулярность точек графика с проверкой ограничения почасовых данных"""
+    resolved = resolve_granularity(granularity, days)
+    if resolved == HOUR and days > MAX_HOURLY_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Почасовые данные доступны для периода до {MAX_HOURLY_DAYS} дней"
+        )
+    return resolved
+
+
+@router.get("/{bot_id}/dashboard", response_model=None)
+@direct_json_response
+@cached(ttl=settings.RESPONSE_CACHE_TTL if settings.ENABLE_RESPONSE_CACHE else None, key_params=['bot_id', 'days', 'granularity'])
 async def get_dashboard_analytics(
     bot_id: str = Path(..., description="ID бота"),
     days: int = Query(7, ge=1, le=365, description="Количество дней для анализа"),
+    granularity: str = Query("day", pattern=GRANULARITY_PATTERN, description="Гранулярность графика роста: hour, day, week, month или auto"),
     current_user_id: int = Depends(verify_bot_access)
 ) -> Dict[str, Any]:
     """
     Получение полной аналитики для дашборда
     
     Returns:
-        Dict с метриками, воронкой продаж и выручкой по дням
+        Dict с метриками, воронкой продаж и ростом пользователей
     """
+    granularity = _resolve_granularity(granularity, days)
     try:
         logger.info(f"📊 Запрос аналитики дашборда для бота {bot_id}, период: {days} дней")
         
@@ -43,7 +64,7 @@ async def get_dashboard_analytics(
         logger.info(f"📈 Получение данных роста пользователей...")
         # Вычисляем базовое количество: общее количество минус новые за период
         base_total = max(0, metrics_data.get('total_users', 0) - metrics_data.get('new_users', 0))
-        user_growth_data = await db_client.get_user_growth_data(bot_id, days, base_total)
+        user_growth_data = await db_client.get_user_growth_data(bot_id, days, base_total, granularity)
         
         # Формируем ответ
         response = {
@@ -51,6 +72,7 @@ async def get_dashboard_analytics(
             "metrics": metrics_data,
             "funnel": funnel_data,
             "user_growth": user_growth_data,
+            "granularity": granularity,
             "generated_at": datetime.now().isoformat()
         }
         
@@ -65,7 +87,8 @@ async def get_dashboard_analytics(
             detail="Ошибка получения аналитики"
         )
 
-@router.get("/{bot_id}/metrics", response_model=Dict[str, Any])
+@router.get("/{bot_id}/metrics", response_model=None)
+@direct_json_response
 @cached(ttl=settings.RESPONSE_CACHE_TTL if settings.ENABLE_RESPONSE_CACHE else None, key_params=['bot_id', 'days'])
 async def get_bot_metrics(
     bot_id: str = Path(..., description="ID бота"),
@@ -102,7 +125,8 @@ async def get_bot_metrics(
             detail="Ошибка получения метрик"
         )
 
-@router.get("/{bot_id}/funnel", response_model=Dict[str, Any])
+@router.get("/{bot_id}/funnel", response_model=None)
+@direct_json_response
 @cached(ttl=settings.RESPONSE_CACHE_TTL if settings.ENABLE_RESPONSE_CACHE else None, key_params=['bot_id', 'days'])
 async def get_funnel_analytics(
     bot_id: str = Path(..., description="ID бота"),
@@ -139,9 +163,50 @@ async def get_funnel_analytics(
             detail="Ошибка получения воронки продаж"
         )
 
+@router.get("/{bot_id}/growth", response_model=None)
+@direct_json_response
+@cached(ttl=settings.RESPONSE_CACHE_TTL if settings.ENABLE_RESPONSE_CACHE else None, key_params=['bot_id', 'days', 'granularity'])
+async def get_growth_analytics(
+    bot_id: str = Path(..., description="ID бота"),
+    days: int = Query(30, ge=1, le=365, description="Количество дней для анализа"),
+    granularity: str = Query("auto", pattern=GRANULARITY_PATTERN, description="Гранулярность: hour, day, week, month или auto"),
+    current_user_id: int = Depends(verify_bot_access)
+) -> Dict[str, Any]:
+    """
+    Получение роста и активности пользователей по интервалам
+    
+    Returns:
+        Dict с точками графика (date, total_users, new_users, active_users)
+    """
+    granularity = _resolve_granularity(granularity, days)
+    try:
+        logger.info(f"📈 Запрос роста пользователей для бота {bot_id}, период: {days} дней, гранулярность: {granularity}")
+        
+        db_client = get_supabase_client(bot_id)
+        await db_client.initialize()
+        
+        # Базовое количество пользователей - как total_users - new_users дашборда, без расчета метрик
+        base_total = await db_client.get_base_user_count(bot_id, days)
+        user_growth_data = await db_client.get_user_growth_data(bot_id, days, base_total, granularity)
+        
+        return {
+            "success": True,
+            "bot_id": bot_id,
+            "period_days": days,
+            "granularity": granularity,
+            "user_growth": user_growth_data
+        }
+        
+    except Exception as e:
+        logger.error(f"Ошибка получения роста пользователей для бота {bot_id}: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Ошибка получения роста пользователей"
+        )
+
 # Эндпоинт выручки удалён по требованию. Оставлены метрики и воронка.
 
-@router.get("/{bot_id}/detailed", response_model=Dict[str, Any])
+@router.get("/{bot_id}/detailed", response_model=DetailedAnalytics)
 async def get_detailed_analytics(
     bot_id: str = Path(..., description="ID бота"),
     days: int = Query(30, ge=1, le=365, description="Количество дней для анализа"),
@@ -189,7 +254,8 @@ async def get_detailed_analytics(
             detail="Ошибка получения детальной аналитики"
         )
 
-@router.get("/{bot_id}/recent-events", response_model=Dict[str, Any])
+@router.get("/{bot_id}/recent-events", response_model=None)
+@direct_json_response
 async def get_recent_events(
     bot_id: str = Path(..., description="ID бота"),
     limit: int = Query(10, ge=1, le=50, description="Количество событий"),
@@ -208,11 +274,11 @@ async def get_recent_events(
         await db_client.initialize()
         
         # Получаем события из таблицы scheduled_events, колонка info_dashboard
-        events_response = db_client.client.table('scheduled_events').select(
+        events_response = await db_client.execute_query(db_client.client.table('scheduled_events').select(
             'info_dashboard'
         ).eq('bot_id', bot_id).not_.is_('info_dashboard', 'null').order(
             'created_at', desc=True
-        ).limit(limit).execute()
+        ).limit(limit), 'scheduled_events')
         
         # Парсим JSON из info_dashboard
         events_list = []
@@ -250,7 +316,8 @@ async def get_recent_events(
         # Возвращаем пустой список при ошибке
         return {"success": True, "bot_id": bot_id, "events": []}
 
-@router.get("/{bot_id}/export", response_model=Dict[str, Any])
+@router.get("/{bot_id}/export", response_model=None)
+@direct_json_response
 async def export_analytics(
     bot_id: str = Path(..., description="ID бота"),
     days: int = Query(30, ge=1, le=365, description="Количество дней для экспорта"),
@@ -4,18 +4,22 @@ from typing import List, Dict, Any
 
 from app.database.supabase_client import get_supabase_client
 from app.core.dependencies import verify_bot_access
+from app.core.log_sampling import lazy, sampled
+from app.core.responses import direct_json_response
+from app.core.tracing import TracedAPIRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(route_class=TracedAPIRoute)
 
 @router.get("/{telegram_id}")
+@direct_json_response
 async def get_user_bots(telegram_id: int):
     """
     Получение списка ботов пользователя
     """
     try:
-        logger.info(f"Запрос списка ботов для пользователя {telegram_id}")
+        logger.info("Запрос списка ботов для пользователя %s", telegram_id, extra=sampled(0.1))
         
         db_client = get_supabase_client()
         await db_client.initialize()
@@ -33,17 +37,14 @@ async def get_user_bots(telegram_id: int):
             # Получаем базовую статистику (исключаем пользователей с first_name = Test)
             users_count = 0
             try:
-                logger.info(f"🔍 Подсчет пользователей для bot_id: {bot_id}")
-                users_response = bot_client.client.table('sales_users').select(
+                users_response = await bot_client.execute_query(bot_client.client.table('sales_users').select(
                     'telegram_id'
-                ).eq('bot_id', bot_id).not_.like('first_name', 'Test%').execute()
+                ).eq('bot_id', bot_id).not_.like('first_name', 'Test%'), 'sales_users')
                 
-                logger.info(f"📊 Ответ от БД: data={users_response.data}")
-                logger.info(f"📊 Тип данных: {type(users_response.data)}")
-                logger.info(f"📊 Длина массива: {len(users_response.data) if users_response.data else 0}")
+                logger.debug("📊 Ответ от БД для бота %s: data=%s", bot_id, lazy(lambda: users_response.data))
                 
                 users_count = len(users_response.data) if users_response.data else 0
-                logger.info(f"✅ Для бота {bot_id} найдено {users_count} пользователей (без Test)")
+                logger.debug("✅ Для бота %s найдено %d пользователей (без Test)", bot_id, users_count)
             except Exception as e:
                 logger.error(f"❌ Ошибка получения пользователей для бота {bot_id}: {e}")
             
@@ -57,7 +58,7 @@ async def get_user_bots(telegram_id: int):
             }
             bots_info.append(bot_info)
         
-        logger.info(f"Найдено {len(bots_info)} ботов для пользователя {telegram_id}")
+        logger.info("Найдено %d ботов для пользователя %s", len(bots_info), telegram_id, extra=sampled(0.1))
         
         return {
             "success": True,
@@ -73,6 +74,7 @@ async def get_user_bots(telegram_id: int):
         )
 
 @router.get("/{bot_id}/info")
+@direct_json_response
 async def get_bot_info(
     bot_id: str,
     current_user_id: int = Depends(verify_bot_access)
@@ -113,6 +115,7 @@ async def get_bot_info(
         )
 
 @router.get("/{bot_id}/users")
+@direct_json_response
 async def get_bot_users(
     bot_id: str,
     limit: int = Query(100, ge=1, le=1000),
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import threading
+from fastapi import APIRouter, HTTPException, Query, Depends
+from typing import Dict, Any
+
+from app.core.config import settings
+from app.core.dependencies import verify_admin_token
+from app.core.profiler import try_start_profiling, finish_profiling
+from app.core.memory_profiler import estimate_structure_sizes, get_memory_profiler, snapshot_structures
+from app.core.slow_queries import get_slow_query_log
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(dependencies=[Depends(verify_admin_token)])
+
+# Ссылки на фоновые окна профилирования, чтобы задачи не собрал GC до завершения
+_profile_tasks = set()
+
+@router.post("/profile")
+async def start_profile_window(
+    seconds: int = Query(10, ge=1, description="Длительность окна профилирования в секундах"),
+    profile_format: str = Query("collapsed", pattern="^(collapsed|speedscope)$", alias="format", description="Формат профиля")
+) -> Dict[str, Any]:
+    """
+    Запускает профилирование event loop на заданное окно времени (в фоне)
+    
+    Returns:
+        Dict со статусом и длительностью окна; файл появится в LOG_DIR/profiles
+    """
+    seconds = min(seconds, settings.PROFILING_MAX_SECONDS)
+    sampler = try_start_profiling(threading.get_ident())
+    if sampler is None:
+        raise HTTPException(
+            status_code=409,
+            detail="Профилирование уже выполняется"
+        )
+    
+    async def finish_after_window():
+        await asyncio.sleep(seconds)
+        finish_profiling(sampler, f"window-{seconds}s", profile_format)
+    
+    task = asyncio.create_task(finish_after_window())
+    _profile_tasks.add(task)
+    task.add_done_callback(_profile_tasks.discard)
+    logger.info(f"Запущено профилирование event loop на {seconds} секунд (формат: {profile_format})")
+    
+    return {
+        "success": True,
+        "status": "started",
+        "seconds": seconds,
+        "format": profile_format
+    }
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=500, description="Количество запросов в ответе"),
+    reset: bool = Query(False, description="Очистить top-N после чтения")
+) -> Dict[str, Any]:
+    """
+    Возвращает самые медленные запросы к Supabase с момента запуска (или последней очистки)
+    
+    Returns:
+        Dict со статистикой журнала и списком запросов по убыванию длительности
+    """
+    slow_query_log = get_slow_query_log()
+    queries = slow_query_log.get_top(limit)
+    stats = slow_query_log.get_stats()
+    if reset:
+        slow_query_log.clear()
+    
+    return {
+        "success": True,
+        **stats,
+        "queries": queries
+    }
+
+@router.get("/memory")
+async def get_memory_report() -> Dict[str, Any]:
+    """
+    Отчет о памяти процесса: RSS, состояние tracemalloc и размеры долгоживущих структур
+    
+    Returns:
+        Dict со статистикой памяти
+    """
+    return {
+        "success": True,
+        **get_memory_profiler().get_stats(),
+        "structures": await asyncio.to_thread(estimate_structure_sizes, snapshot_structures())
+    }
+
+@router.post("/memory/start")
+async def start_memory_tracing(
+    frames: int = Query(1, ge=1, le=50, description="Глубина стека для каждой аллокации")
+) -> Dict[str, Any]:
+    """
+    Запускает tracemalloc и снимает базовый снимок для последующих сравнений
+    
+    Returns:
+        Dict со статусом tracemalloc
+    """
+    await asyncio.to_thread(get_memory_profiler().start, frames)
+    return {
+        "success": True,
+        **get_memory_profiler().get_stats()
+    }
+
+@router.post("/memory/snapshot")
+async def take_memory_snapshot(
+    limit: int = Query(20, ge=1, le=200, description="Количество позиций в diff"),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$", description="Группировка аллокаций")
+) -> Dict[str, Any]:
+    """
+    Снимает снимок tracemalloc и возвращает наибольшие изменения относительно предыдущего снимка
+    
+    Returns:
+        Dict с diff аллокаций и размерами долгоживущих структур
+    """
+    profiler = get_memory_profiler()
+    if not profiler.is_tracing:
+        raise HTTPException(
+            status_code=409,
+            detail="tracemalloc не запущен, вызовите /internal/memory/start"
+        )
+    
+    try:
+        diff = await asyncio.to_thread(profiler.snapshot_diff, limit, group_by)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return {
+        "success": True,
+        **profiler.get_stats(),
+        "diff": diff,
+        "structures": await asyncio.to_thread(estimate_structure_sizes, snapshot_structures())
+    }
+
+@router.post("/memory/stop")
+async def stop_memory_tracing() -> Dict[str, Any]:
+    """
+    Останавливает tracemalloc и освобождает снимки
+    
+    Returns:
+        Dict со статусом
+    """
+    await asyncio.to_thread(get_memory_profiler().stop)
+    return {
+        "success": True,
+        "tracing": False
+    }
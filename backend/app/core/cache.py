@@ -5,9 +5,16 @@ import time
 import hashlib
 import json
 import logging
+import os
+from pathlib import Path
 from typing import Any, Dict, Optional
 from functools import wraps
 
+from app.core.config import settings
+from app.core.memory_profiler import register_structure
+from app.core.metrics import CACHE_REQUESTS_TOTAL
+from app.core.server_timing import timed
+
 logger = logging.getLogger(__name__)
 
 
@@ -53,6 +60,8 @@ class ResponseCache:
             # Проверяем, не истек ли TTL
             if current_time < cached_item['expires_at']:
                 self._hits += 1
+                cached_item['hits'] = cached_item.get('hits', 0) + 1
+                CACHE_REQUESTS_TOTAL.inc(endpoint, "hit")
                 logger.debug(f"Cache HIT: {endpoint}")
                 return cached_item['value']
             else:
@@ -61,6 +70,7 @@ class ResponseCache:
                 logger.debug(f"Cache EXPIRED: {endpoint}")
         
         self._misses += 1
+        CACHE_REQUESTS_TOTAL.inc(endpoint, "miss")
         logger.debug(f"Cache MISS: {endpoint}")
         return None
     
@@ -79,8 +89,10 @@ class ResponseCache:
         
         self._cache[key] = {
             'value': value,
+            'endpoint': endpoint,
             'expires_at': time.time() + ttl,
-            'created_at': time.time()
+            'created_at': time.time(),
+            'hits': 0
         }
         
         logger.debug(f"Cache SET: {endpoint} (TTL: {ttl}s)")
@@ -102,6 +114,47 @@ class ResponseCache:
             self._cache.clear()
             logger.info("Cache cleared completely")
     
+    def dump(self, path: Path, max_entries: int = 100) -> int:
+        """
+        Сохраняет самые востребованные неистекшие записи в файл (при завершении работы)
+        
+        Returns:
+            Количество сохраненных записей
+        """
+        current_time = time.time()
+        hot_items = sorted(
+            ((key, item) for key, item in self._cache.items() if item['expires_at'] > current_time),
+            key=lambda pair: pair[1].get('hits', 0),
+            reverse=True
+        )[:max_entries]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(dict(hot_items), default=str), encoding='utf-8')
+        os.replace(tmp_path, path)
+        return len(hot_items)
+    
+    def load(self, path: Path) -> int:
+        """
+        Загружает записи, сохраненные dump (истекшие пропускаются)
+        
+        Returns:
+            Количество загруженных записей
+        """
+        try:
+            items = json.loads(path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось загрузить снимок кеша {path}: {e}")
+            return 0
+        current_time = time.time()
+        loaded = 0
+        for key, item in items.items():
+            if item.get('expires_at', 0) > current_time and key not in self._cache:
+                self._cache[key] = item
+                loaded += 1
+        return loaded
+    
     def get_stats(self) -> Dict[str, Any]:
         """Возвращает статистику кеша"""
         total_requests = self._hits + self._misses
@@ -118,6 +171,7 @@ class ResponseCache:
 
 # Глобальный экземпляр кеша
 _response_cache = ResponseCache(default_ttl=30)
+register_structure("ResponseCache._cache", lambda: _response_cache._cache)
 
 
 def cached(ttl: Optional[int] = None, key_params: Optional[list] = None):
@@ -151,7 +205,8 @@ def cached(ttl: Optional[int] = None, key_params: Optional[list] = None):
                         cache_params[f'arg_{i}'] = arg
             
             # Пытаемся получить из кеша
-            cached_value = _response_cache.get(endpoint, cache_params)
+            with timed("cache"):
+                cached_value = _response_cache.get(endpoint, cache_params)
             if cached_value is not None:
                 return cached_value
             
@@ -177,6 +232,21 @@ def clear_cache(endpoint: Optional[str] = None) -> None:
     _response_cache.clear(endpoint)
 
 
+def get_cache_snapshot_path() -> Path:
+    """Файл снимка горячих записей кеша"""
+    return Path(settings.LOG_DIR) / "response_cache.json"
+
+
+def persist_cache(max_entries: int = 100) -> int:
+    """Сохраняет горячие записи кеша (используется при graceful shutdown)"""
+    return _response_cache.dump(get_cache_snapshot_path(), max_entries)
+
+
+def restore_cache() -> int:
+    """Восстанавливает записи кеша, сохраненные при предыдущем завершении"""
+    return _response_cache.load(get_cache_snapshot_path())
+
+
 
 
 
@@ -38,13 +38,130 @@ class Settings(BaseSettings):
     # GZIP_MINIMUM_SIZE: минимальный размер ответа в байтах для сжатия (по умолчанию 500 байт)
     GZIP_MINIMUM_SIZE: int = 500
     
+    # Server (app.server, production точка входа)
+    # SERVER_HOST / SERVER_PORT: адрес и порт HTTP сервера (по умолчанию 0.0.0.0:8000)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    # WORKERS: количество воркеров; если не указано, по одному на CPU с учетом квоты контейнера
+    WORKERS: Optional[int] = None
+    # SERVER_PRELOAD: загружать приложение в мастер-процессе до fork воркеров (по умолчанию True)
+    SERVER_PRELOAD: bool = True
+    # SERVER_BACKLOG: размер очереди входящих соединений (по умолчанию 2048)
+    SERVER_BACKLOG: int = 2048
+    # SERVER_KEEPALIVE_SECONDS: время удержания keep-alive соединения (по умолчанию 5)
+    SERVER_KEEPALIVE_SECONDS: int = 5
+    # SERVER_LIMIT_CONCURRENCY: максимум одновременных соединений на воркер, сверх - 503 (по умолчанию без лимита)
+    SERVER_LIMIT_CONCURRENCY: Optional[int] = None
+    # SERVER_LIMIT_MAX_REQUESTS: перезапуск воркера после N запросов (по умолчанию без лимита)
+    SERVER_LIMIT_MAX_REQUESTS: Optional[int] = None
+    # SERVER_FORWARDED_ALLOW_IPS: IP прокси, которым доверяются X-Forwarded-* (по умолчанию 127.0.0.1)
+    SERVER_FORWARDED_ALLOW_IPS: str = "127.0.0.1"
+    
     # Request Timeout
     # REQUEST_TIMEOUT_SECONDS: максимальное время выполнения запроса в секундах (по умолчанию 30)
     REQUEST_TIMEOUT_SECONDS: int = 30
     
     # Database Connection Pooling
-    # DB_POOL_MAX_CONNECTIONS: максимальное количество соединений в пуле (по умолчанию 50)
+    # DB_POOL_MAX_CONNECTIONS: максимальное количество клиентов в пуле, вытеснение по LRU (по умолчанию 50)
     DB_POOL_MAX_CONNECTIONS: int = 50
+    # DB_POOL_IDLE_TIMEOUT_SECONDS: клиенты без обращений дольше этого времени вытесняются (по умолчанию 300)
+    DB_POOL_IDLE_TIMEOUT_SECONDS: int = 300
+    # DB_POOL_HEALTH_CHECK_INTERVAL_SECONDS: интервал фоновой проверки доступности Supabase, 0 - отключить (по умолчанию 30)
+    DB_POOL_HEALTH_CHECK_INTERVAL_SECONDS: int = 30
+    # DB_HTTP_MAX_CONNECTIONS: максимальное количество HTTP соединений общей сессии (по умолчанию 100)
+    DB_HTTP_MAX_CONNECTIONS: int = 100
+    # DB_HTTP_KEEPALIVE_CONNECTIONS: максимальное количество keep-alive соединений (по умолчанию 20)
+    DB_HTTP_KEEPALIVE_CONNECTIONS: int = 20
+    # DB_HTTP_KEEPALIVE_EXPIRY_SECONDS: время жизни простаивающего keep-alive соединения (по умолчанию 30)
+    DB_HTTP_KEEPALIVE_EXPIRY_SECONDS: int = 30
+    # DB_HTTP_TIMEOUT_SECONDS: таймаут HTTP запросов к Supabase (по умолчанию 30)
+    DB_HTTP_TIMEOUT_SECONDS: int = 30
+    
+    # Startup warm-up
+    # ENABLE_WARMUP: прогрев DNS, соединений и дашбордов популярных ботов при запуске (по умолчанию True)
+    ENABLE_WARMUP: bool = True
+    # WARMUP_TIMEOUT_SECONDS: максимальная длительность прогрева, после нее сервис считается готовым (по умолчанию 15)
+    WARMUP_TIMEOUT_SECONDS: int = 15
+    # WARMUP_CONNECTIONS: количество заранее открываемых keep-alive соединений к Supabase (по умолчанию 4)
+    WARMUP_CONNECTIONS: int = 4
+    # WARMUP_TOP_BOTS: количество самых запрашиваемых ботов, для которых вычисляется дашборд (по умолчанию 5)
+    WARMUP_TOP_BOTS: int = 5
+    # WARMUP_ACCESS_FILE: файл статистики обращений к ботам (по умолчанию LOG_DIR/bot_access.json)
+    WARMUP_ACCESS_FILE: Optional[str] = None
+    # WARMUP_ACCESS_SAVE_INTERVAL_SECONDS: интервал сохранения статистики обращений (по умолчанию 300)
+    WARMUP_ACCESS_SAVE_INTERVAL_SECONDS: int = 300
+    
+    # Health checks
+    # HEALTH_DB_CHECK_INTERVAL_SECONDS: интервал фоновой проверки БД для /readyz (по умолчанию 10)
+    HEALTH_DB_CHECK_INTERVAL_SECONDS: int = 10
+    # HEALTH_DB_CHECK_TIMEOUT_SECONDS: таймаут фоновой проверки БД (по умолчанию 5)
+    HEALTH_DB_CHECK_TIMEOUT_SECONDS: int = 5
+    # HEALTH_DB_STALE_SECONDS: результат проверки БД старше этого времени считается устаревшим (по умолчанию 30)
+    HEALTH_DB_STALE_SECONDS: int = 30
+    # READINESS_MAX_LOOP_LAG_MS: при задержке event loop выше порога сервис не готов (по умолчанию 1000 мс)
+    READINESS_MAX_LOOP_LAG_MS: int = 1000
+    
+    # Graceful shutdown
+    # DRAIN_GRACE_SECONDS: максимальное время ожидания выполняющихся запросов при завершении (по умолчанию 25)
+    DRAIN_GRACE_SECONDS: int = 25
+    # DRAIN_DELAY_SECONDS: пауза после SIGTERM, чтобы балансировщик увидел 503 от /readyz (по умолчанию 0)
+    DRAIN_DELAY_SECONDS: int = 0
+    # DRAIN_RETRY_AFTER_SECONDS: значение Retry-After для отклоненных во время drain запросов (по умолчанию 1)
+    DRAIN_RETRY_AFTER_SECONDS: int = 1
+    # DRAIN_PERSIST_CACHE_ENTRIES: количество горячих записей кеша, сохраняемых при завершении (по умолчанию 100)
+    DRAIN_PERSIST_CACHE_ENTRIES: int = 100
+    
+    # CPU offloading
+    # CPU_EXECUTOR_KIND: пул для агрегации и кодирования больших ответов: thread или process (по умолчанию thread)
+    CPU_EXECUTOR_KIND: str = "thread"
+    # CPU_EXECUTOR_WORKERS: размер пула (по умолчанию min(4, количество CPU))
+    CPU_EXECUTOR_WORKERS: Optional[int] = None
+    # CPU_EXECUTOR_MAX_PENDING: максимум задач в пуле одновременно, остальные ждут очереди (по умолчанию 32)
+    CPU_EXECUTOR_MAX_PENDING: int = 32
+    # CPU_OFFLOAD_ROW_THRESHOLD: агрегация от этого количества строк выполняется в пуле (по умолчанию 5000)
+    CPU_OFFLOAD_ROW_THRESHOLD: int = 5000
+    # RESPONSE_OFFLOAD_ITEM_THRESHOLD: ответы от этого количества элементов списков кодируются в пуле (по умолчанию 5000)
+    RESPONSE_OFFLOAD_ITEM_THRESHOLD: int = 5000
+    
+    # AGGREGATION_ENGINE: агрегация строк: auto, python или numpy (по умолчанию auto - numpy для больших ботов)
+    AGGREGATION_ENGINE: str = "auto"
+    # VECTORIZED_AGGREGATION_MIN_ROWS: в режиме auto numpy используется от этого количества строк (по умолчанию 5000)
+    VECTORIZED_AGGREGATION_MIN_ROWS: int = 5000
+    
+    # Timezones
+    # DEFAULT_BOT_TIMEZONE: часовой пояс IANA для дней графиков и "сегодня" ботов без своей настройки (по умолчанию Europe/Moscow)
+    DEFAULT_BOT_TIMEZONE: str = "Europe/Moscow"
+    # BOT_TIMEZONES: часовые пояса отдельных ботов через запятую в формате bot_id=пояс
+    # Пример: "bot1=Europe/Moscow,bot2=Asia/Yekaterinburg"
+    BOT_TIMEZONES: str = ""
+    
+    def get_bot_timezone(self, bot_id: str) -> str:
+        """Возвращает часовой пояс бота (BOT_TIMEZONES или DEFAULT_BOT_TIMEZONE)"""
+        for item in self.BOT_TIMEZONES.split(','):
+            name, _, zone = item.partition('=')
+            if name.strip() == bot_id and zone.strip():
+                return zone.strip()
+        return self.DEFAULT_BOT_TIMEZONE
+    
+    # Incremental fetch
+    # ENABLE_INCREMENTAL_FETCH: хранить строки ботов в памяти и запрашивать только новые по created_at (по умолчанию True)
+    ENABLE_INCREMENTAL_FETCH: bool = True
+    # INCREMENTAL_MAX_BOTS: количество ботов, чьи строки хранятся в памяти (по умолчанию 20)
+    INCREMENTAL_MAX_BOTS: int = 20
+    # INCREMENTAL_OVERLAP_SECONDS: перекрытие с watermark для строк, записанных с задержкой (по умолчанию 60)
+    INCREMENTAL_OVERLAP_SECONDS: int = 60
+    # INCREMENTAL_MIN_REFRESH_SECONDS: запросы чаще интервала используют уже загруженные строки (по умолчанию 2)
+    INCREMENTAL_MIN_REFRESH_SECONDS: float = 2.0
+    # INCREMENTAL_CHECK_SECONDS: сверка набора с базой - этапы и удаления сессий запрошенного периода
+    # (только id и current_stage) и количество пользователей; изменения уже загруженных строк
+    # запаздывают не больше чем на RESPONSE_CACHE_TTL + этот интервал (по умолчанию 30)
+    INCREMENTAL_CHECK_SECONDS: float = 30.0
+    # INCREMENTAL_FULL_REFRESH_SECONDS: полная перезагрузка набора - страховка от изменений, которые сверка
+    # не видит; сужает окно сессий до запрошенного периода (по умолчанию 900)
+    INCREMENTAL_FULL_REFRESH_SECONDS: int = 900
+    # ENABLE_DAILY_AGGREGATES: метрики, воронка и рост любого периода из дневных агрегатов набора строк бота
+    # (префиксные суммы по дням, требует ENABLE_INCREMENTAL_FETCH) (по умолчанию True)
+    ENABLE_DAILY_AGGREGATES: bool = True
     
     # Response Caching
     # ENABLE_RESPONSE_CACHE: включить in-memory кеширование ответов (по умолчанию True)
@@ -62,6 +179,42 @@ class Settings(BaseSettings):
     # RATE_LIMIT_MAX_TRACKED_IPS: максимальное количество отслеживаемых IP (по умолчанию 10000)
     RATE_LIMIT_MAX_TRACKED_IPS: int = 10000
     
+    # Metrics
+    # ENABLE_METRICS: включить endpoint /metrics в формате Prometheus (по умолчанию True)
+    ENABLE_METRICS: bool = True
+    # ENABLE_LOOP_MONITOR: мониторинг задержки event loop и блокирующих вызовов (по умолчанию True)
+    ENABLE_LOOP_MONITOR: bool = True
+    # LOOP_MONITOR_INTERVAL_MS: интервал измерения задержки event loop (по умолчанию 250 мс)
+    LOOP_MONITOR_INTERVAL_MS: int = 250
+    # LOOP_BLOCK_THRESHOLD_MS: блокировка loop дольше порога логируется со стеком (по умолчанию 200 мс)
+    LOOP_BLOCK_THRESHOLD_MS: int = 200
+    
+    # Tracing
+    # ENABLE_TRACING: включить трассировку запросов (по умолчанию False)
+    ENABLE_TRACING: bool = False
+    # TRACE_EXPORT_ENDPOINT: OTLP/HTTP endpoint коллектора (например, http://localhost:4318/v1/traces);
+    # если не указан, трассы пишутся в LOG_DIR/traces.jsonl
+    TRACE_EXPORT_ENDPOINT: Optional[str] = None
+    # TRACE_SLOW_THRESHOLD_MS: трассы медленнее порога сохраняются всегда (по умолчанию 1000 мс)
+    TRACE_SLOW_THRESHOLD_MS: int = 1000
+    # TRACE_SAMPLE_RATE: доля сохраняемых быстрых трасс без ошибок (по умолчанию 0.01)
+    TRACE_SAMPLE_RATE: float = 0.01
+    
+    # Slow query log
+    # SLOW_QUERY_THRESHOLD_MS: запросы к Supabase дольше порога пишутся в slow_queries.log (по умолчанию 500 мс)
+    SLOW_QUERY_THRESHOLD_MS: int = 500
+    # SLOW_QUERY_TOP_N: количество самых медленных запросов, хранимых в памяти (по умолчанию 50)
+    SLOW_QUERY_TOP_N: int = 50
+    
+    # Internal / Admin
+    # ADMIN_TOKEN: токен для внутренних endpoint (/internal/*) и профилирования по заголовку X-Profile;
+    # если не указан, внутренние endpoint недоступны
+    ADMIN_TOKEN: Optional[str] = None
+    # PROFILING_INTERVAL_MS: интервал снятия стеков сэмплирующим профайлером (по умолчанию 5 мс)
+    PROFILING_INTERVAL_MS: int = 5
+    # PROFILING_MAX_SECONDS: максимальная длительность окна профилирования (по умолчанию 60 секунд)
+    PROFILING_MAX_SECONDS: int = 60
+    
     # Logging
     # LOG_LEVEL: уровень логирования (DEBUG, INFO, WARNING, ERROR, CRITICAL)
     # Если не указан, определяется автоматически по ENVIRONMENT
@@ -72,6 +225,15 @@ class Settings(BaseSettings):
     LOG_FILE_MAX_BYTES: int = 10 * 1024 * 1024
     # LOG_FILE_BACKUP_COUNT: количество резервных копий файлов логов (по умолчанию 5)
     LOG_FILE_BACKUP_COUNT: int = 5
+    # LOG_CAPTURE_STACK: добавлять stack trace к ERROR записям без исключения (по умолчанию False)
+    LOG_CAPTURE_STACK: bool = False
+    # ENABLE_LOG_THROTTLE: подавление повторяющихся фоновых INFO/DEBUG логов с одного места вызова;
+    # логи запросов (с request_id) и журнал запросов не подавляются (по умолчанию True)
+    ENABLE_LOG_THROTTLE: bool = True
+    # LOG_THROTTLE_RATE_PER_SECOND: сколько записей в секунду пропускается с одного места вызова (по умолчанию 5)
+    LOG_THROTTLE_RATE_PER_SECOND: float = 5.0
+    # LOG_THROTTLE_BURST: сколько записей подряд пропускается до начала подавления (по умолчанию 20)
+    LOG_THROTTLE_BURST: int = 20
     
     # Environment
     ENVIRONMENT: str = "production"
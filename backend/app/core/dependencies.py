@@ -1,12 +1,18 @@
 """
 Dependencies для FastAPI - проверка авторизации и доступа
 """
+import hmac
 import logging
 from fastapi import HTTPException, Request, Depends
 from typing import Optional, Callable
 
 from app.database.supabase_client import get_supabase_client
+from app.core.config import settings
 from app.core.validators import validate_bot_id
+from app.core.request_context import bind_bot_id
+from app.core.server_timing import timed
+from app.core.tracing import start_span
+from app.core.warmup import get_access_tracker
 
 logger = logging.getLogger(__name__)
 
@@ -73,10 +79,11 @@ def verify_bot_access_factory(bot_id_param: str = "bot_id") -> Callable:
             )
         
         # Проверяем доступ пользователя к боту
-        db_client = get_supabase_client()
-        await db_client.initialize()
-        
-        user_bots = await db_client.get_user_bots(current_user_id)
+        with timed("access"), start_span("verify_bot_access", **{"bot.id": bot_id}):
+            db_client = get_supabase_client()
+            await db_client.initialize()
+            
+            user_bots = await db_client.get_user_bots(current_user_id)
         
         if bot_id not in user_bots:
             logger.warning(f"Пользователь {current_user_id} пытается получить доступ к боту {bot_id}, к которому у него нет доступа")
@@ -85,6 +92,9 @@ def verify_bot_access_factory(bot_id_param: str = "bot_id") -> Callable:
                 detail="Нет доступа к данному боту"
             )
         
+        bind_bot_id(bot_id)
+        days = request.query_params.get("days")
+        get_access_tracker().record(bot_id, int(days) if days and days.isdigit() else None)
         logger.info(f"Пользователь {current_user_id} имеет доступ к боту {bot_id}")
         return current_user_id
     
@@ -93,3 +103,28 @@ def verify_bot_access_factory(bot_id_param: str = "bot_id") -> Callable:
 # Создаем стандартную dependency для bot_id
 verify_bot_access = verify_bot_access_factory("bot_id")
 
+
+def is_valid_admin_token(token: Optional[str]) -> bool:
+    """Проверяет токен администратора (внутренние endpoint и профилирование)"""
+    if not settings.ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token, settings.ADMIN_TOKEN)
+
+
+async def verify_admin_token(request: Request) -> None:
+    """
+    Проверяет заголовок X-Admin-Token для внутренних endpoint
+    
+    Raises:
+        HTTPException: 404 если ADMIN_TOKEN не настроен, 403 если токен неверный
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    
+    if not is_valid_admin_token(request.headers.get("X-Admin-Token")):
+        logger.warning(f"Попытка доступа к внутреннему endpoint {request.url.path} с неверным токеном")
+        raise HTTPException(
+            status_code=403,
+            detail="Нет доступа"
+        )
+
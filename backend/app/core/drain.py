@@ -0,0 +1,145 @@
+"""
+Graceful drain: при завершении работы новые запросы получают 503,
+а выполняющиеся завершаются в пределах DRAIN_GRACE_SECONDS
+"""
+import asyncio
+import logging
+import os
+import signal
+import time
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DrainState:
+    """Флаг режима drain и счетчик выполняющихся запросов"""
+
+    def __init__(self):
+        self.draining = False
+        self.in_flight = 0
+        self.rejected = 0
+        self.started_at: Optional[float] = None
+        self._idle: Optional[asyncio.Event] = None
+        # Задача drain по SIGTERM: ссылка не дает GC собрать ее до завершения
+        self.task: Optional[asyncio.Task] = None
+
+    def _get_idle_event(self) -> asyncio.Event:
+        if self._idle is None:
+            self._idle = asyncio.Event()
+            if self.in_flight == 0:
+                self._idle.set()
+        return self._idle
+
+    def request_started(self) -> None:
+        self.in_flight += 1
+        self._get_idle_event().clear()
+
+    def request_finished(self) -> None:
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self._get_idle_event().set()
+
+    def start(self) -> bool:
+        """Включает режим drain; возвращает False, если он уже включен"""
+        if self.draining:
+            return False
+        self.draining = True
+        self.started_at = time.monotonic()
+        return True
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Ждет завершения выполняющихся запросов; возвращает False по таймауту"""
+        try:
+            await asyncio.wait_for(self._get_idle_event().wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "draining": self.draining,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "draining_for_seconds": round(time.monotonic() - self.started_at, 1) if self.started_at else None
+        }
+
+
+_drain_state = DrainState()
+
+
+def get_drain_state() -> DrainState:
+    """Возвращает глобальное состояние drain"""
+    return _drain_state
+
+
+async def drain(grace_seconds: Optional[float] = None) -> bool:
+    """
+    Переводит сервис в режим drain и ждет завершения выполняющихся запросов
+
+    Returns:
+        True, если все запросы завершились в пределах grace периода
+    """
+    grace_seconds = settings.DRAIN_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    if _drain_state.start():
+        logger.info(f"Режим drain: новые запросы отклоняются, выполняется запросов: {_drain_state.in_flight}")
+    completed = await _drain_state.wait_idle(grace_seconds)
+    if completed:
+        logger.info("Все выполняющиеся запросы завершены")
+    else:
+        logger.warning(
+            f"Grace период {grace_seconds} с истек, не завершено запросов: {_drain_state.in_flight}"
+        )
+    return completed
+
+
+def install_drain_signal_handler(on_drained: Optional[Callable[[], None]] = None) -> bool:
+    """
+    Перехватывает SIGTERM: сначала drain, затем штатное завершение сервера
+
+    По умолчанию после drain процесс отправляет себе SIGINT, который
+    по-прежнему обрабатывает uvicorn (закрытие сокетов, lifespan shutdown).
+
+    Args:
+        on_drained: Функция завершения сервера (по умолчанию SIGINT себе)
+
+    Returns:
+        True, если обработчик установлен
+    """
+    loop = asyncio.get_running_loop()
+    if on_drained is None:
+        on_drained = lambda: os.kill(os.getpid(), signal.SIGINT)
+    exit_requested = False
+
+    def request_exit() -> None:
+        nonlocal exit_requested
+        if not exit_requested:
+            exit_requested = True
+            on_drained()
+
+    def handle_sigterm() -> None:
+        if _drain_state.draining:
+            # Повторный сигнал: завершаемся, не дожидаясь grace периода
+            request_exit()
+            return
+
+        logger.info(f"Получен SIGTERM, начинаем graceful drain (выполняется запросов: {_drain_state.in_flight})")
+        _drain_state.start()
+
+        async def drain_then_exit():
+            # Пауза, чтобы балансировщик успел увидеть 503 от /readyz
+            if settings.DRAIN_DELAY_SECONDS:
+                await asyncio.sleep(settings.DRAIN_DELAY_SECONDS)
+            await drain()
+            request_exit()
+
+        _drain_state.task = loop.create_task(drain_then_exit())
+
+    try:
+        loop.add_signal_handler(signal.SIGTERM, handle_sigterm)
+    except (NotImplementedError, RuntimeError, ValueError):
+        # Windows или не главный поток: drain выполнится на этапе shutdown
+        return False
+    return True
@@ -8,8 +8,6 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
-from app.core.logging_config import get_logger
-
 logger = logging.getLogger(__name__)
 
 
@@ -17,16 +15,8 @@ async def http_exception_handler(request: Request, exc: HTTPException) -> JSONRe
     """
     Обработчик для HTTPException (400, 401, 403, 404, и т.д.)
     """
-    # Получаем Request ID из state
+    # Получаем Request ID из state (request_id и user_id в логах берутся из контекста запроса)
     request_id = getattr(request.state, "request_id", None)
-    user_id = request.cookies.get('telegram_id')
-    
-    # Создаем структурированный логгер
-    structured_logger = get_logger(
-        __name__,
-        request_id=request_id,
-        user_id=user_id
-    )
     
     # Формируем стандартизированный ответ
     error_response = {
@@ -39,15 +29,13 @@ async def http_exception_handler(request: Request, exc: HTTPException) -> JSONRe
     }
     
     # Логируем ошибку
-    structured_logger.warning(
+    logger.warning(
         f"HTTP {exc.status_code}: {exc.detail}",
         extra={
             "status_code": exc.status_code,
             "error_message": exc.detail,
             "path": request.url.path,
-            "method": request.method,
-            "request_id": request_id,
-            "user_id": user_id
+            "method": request.method
         }
     )
     
@@ -62,13 +50,6 @@ async def starlette_http_exception_handler(request: Request, exc: StarletteHTTPE
     Обработчик для Starlette HTTPException (используется FastAPI для некоторых ошибок)
     """
     request_id = getattr(request.state, "request_id", None)
-    user_id = request.cookies.get('telegram_id')
-    
-    structured_logger = get_logger(
-        __name__,
-        request_id=request_id,
-        user_id=user_id
-    )
     
     error_response = {
         "success": False,
@@ -79,15 +60,13 @@ async def starlette_http_exception_handler(request: Request, exc: StarletteHTTPE
         }
     }
     
-    structured_logger.warning(
+    logger.warning(
         f"HTTP {exc.status_code}: {exc.detail}",
         extra={
             "status_code": exc.status_code,
             "error_message": exc.detail,
             "path": request.url.path,
-            "method": request.method,
-            "request_id": request_id,
-            "user_id": user_id
+            "method": request.method
         }
     )
     
@@ -102,13 +81,6 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     Обработчик для ошибок валидации Pydantic
     """
     request_id = getattr(request.state, "request_id", None)
-    user_id = request.cookies.get('telegram_id')
-    
-    structured_logger = get_logger(
-        __name__,
-        request_id=request_id,
-        user_id=user_id
-    )
     
     # Форматируем ошибки валидации
     errors = exc.errors()
@@ -131,16 +103,14 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         }
     }
     
-    structured_logger.warning(
+    logger.warning(
         f"Validation Error: {error_detail}",
         extra={
             "status_code": status.HTTP_422_UNPROCESSABLE_ENTITY,
             "error_detail": error_detail,
             "errors": errors,
             "path": request.url.path,
-            "method": request.method,
-            "request_id": request_id,
-            "user_id": user_id
+            "method": request.method
         }
     )
     
@@ -155,13 +125,6 @@ async def global_exception_handler(request: Request, exc: Exception) -> JSONResp
     Глобальный обработчик для всех необработанных исключений (500 ошибки)
     """
     request_id = getattr(request.state, "request_id", None)
-    user_id = request.cookies.get('telegram_id')
-    
-    structured_logger = get_logger(
-        __name__,
-        request_id=request_id,
-        user_id=user_id
-    )
     
     # Формируем ответ (скрываем детали в production)
     from app.core.config import settings
@@ -174,7 +137,9 @@ async def global_exception_handler(request: Request, exc: Exception) -> JSONResp
         error_detail = f"{type(exc).__name__}: {str(exc)}"
     
     # Логируем полную информацию об ошибке
-    structured_logger.error(
+    # Этот обработчик вызывается снаружи middleware стека, где контекст запроса
+    # уже сброшен, поэтому request_id и user_id передаем явно
+    logger.error(
         f"Unhandled exception: {type(exc).__name__}: {str(exc)}",
         extra={
             "error_type": type(exc).__name__,
@@ -182,7 +147,7 @@ async def global_exception_handler(request: Request, exc: Exception) -> JSONResp
             "path": request.url.path,
             "method": request.method,
             "request_id": request_id,
-            "user_id": user_id
+            "user_id": request.cookies.get('telegram_id')
         },
         exc_info=True
     )
@@ -0,0 +1,131 @@
+"""
+Вынос CPU-нагруженной работы (агрегация строк, кодирование больших ответов)
+из event loop в ограниченный пул потоков или процессов
+
+Работа меньше порога по количеству строк выполняется на месте: передача
+в пул стоит дороже самой работы.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CPU_TASKS_TOTAL = registry.counter(
+    "cpu_offload_tasks_total", "CPU задачи по месту выполнения", ("mode",)
+)
+CPU_TASK_WAIT = registry.histogram(
+    "cpu_offload_queue_wait_seconds", "Ожидание свободного места в пуле CPU задач",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+)
+
+
+class CPUExecutor:
+    """Ограниченный пул для CPU-нагруженных функций"""
+
+    def __init__(self, kind: str = "thread", max_workers: Optional[int] = None, max_pending: int = 32,
+                 row_threshold: int = 5000):
+        """
+        Args:
+            kind: "thread" или "process"
+            max_workers: Размер пула (по умолчанию min(4, CPU))
+            max_pending: Максимум задач в пуле одновременно, остальные ждут очереди
+            row_threshold: Задачи с меньшим количеством строк выполняются на месте
+        """
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Неизвестный тип пула: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending
+        self.row_threshold = row_threshold
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+        self._stats = {"inline": 0, "offloaded": 0, "errors": 0}
+
+    def _get_executor(self) -> Executor:
+        # Пул создается при первой задаче: в prefork режиме - уже в воркере, после fork
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cpu")
+            logger.info(f"Пул CPU задач создан: {self.kind}, воркеров: {self.max_workers}")
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+        return self._semaphore
+
+    async def run(self, func: Callable[..., Any], *args: Any, rows: Optional[int] = None) -> Any:
+        """
+        Выполняет func(*args) на месте или в пуле, в зависимости от количества строк
+
+        Args:
+            rows: Количество обрабатываемых строк (None - всегда выполнять в пуле)
+
+        Для пула процессов func и аргументы должны сериализоваться pickle.
+        """
+        if rows is not None and rows < self.row_threshold:
+            self._stats["inline"] += 1
+            CPU_TASKS_TOTAL.inc("inline")
+            return func(*args)
+
+        semaphore = self._get_semaphore()
+        wait_start = time.perf_counter()
+        async with semaphore:
+            CPU_TASK_WAIT.observe(time.perf_counter() - wait_start)
+            self._stats["offloaded"] += 1
+            CPU_TASKS_TOTAL.inc(self.kind)
+            self._pending += 1
+            loop = asyncio.get_running_loop()
+            if self.kind == "thread":
+                # Контекст запроса (тайминги, request_id) доступен и в потоке
+                call = functools.partial(contextvars.copy_context().run, func, *args)
+            else:
+                call = functools.partial(func, *args)
+            try:
+                return await loop.run_in_executor(self._get_executor(), call)
+            except Exception:
+                self._stats["errors"] += 1
+                raise
+            finally:
+                self._pending -= 1
+
+    def shutdown(self) -> None:
+        """Останавливает пул, не дожидаясь задач в очереди"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "row_threshold": self.row_threshold,
+            "pending": self._pending,
+            **self._stats
+        }
+
+
+_cpu_executor = CPUExecutor(
+    kind=settings.CPU_EXECUTOR_KIND,
+    max_workers=settings.CPU_EXECUTOR_WORKERS,
+    max_pending=settings.CPU_EXECUTOR_MAX_PENDING,
+    row_threshold=settings.CPU_OFFLOAD_ROW_THRESHOLD
+)
+
+
+def get_cpu_executor() -> CPUExecutor:
+    """Возвращает глобальный пул CPU задач"""
+    return _cpu_executor
@@ -0,0 +1,155 @@
+"""
+Проверки liveness/readiness без запроса к БД на каждую пробу
+
+Состояние БД обновляется фоновой задачей; /readyz только читает его вместе
+с сигналами насыщения пула соединений, кеша и event loop.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Пробы оркестратора: не ограничиваются rate limiting и логируются на уровне DEBUG
+PROBE_PATHS = frozenset({"/livez", "/readyz"})
+
+
+class DatabaseStatusMonitor:
+    """Периодически проверяет доступность БД и хранит последний результат"""
+
+    def __init__(self, interval: float = 10, timeout: float = 5):
+        """
+        Args:
+            interval: Интервал проверки в секундах
+            timeout: Таймаут одной проверки в секундах
+        """
+        self.interval = interval
+        self.timeout = timeout
+        self.connected: Optional[bool] = None
+        self.error: Optional[str] = None
+        self.latency_ms: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self._checked_monotonic: Optional[float] = None
+        self._consecutive_failures = 0
+
+    async def check(self) -> bool:
+        """Выполняет одну проверку БД (минимальный запрос к sales_users)"""
+        from app.database.supabase_client import get_supabase_client
+
+        start_time = time.perf_counter()
+        try:
+            db_client = get_supabase_client()
+            await db_client.initialize()
+            # execute() синхронный: в потоке он не блокирует event loop, и wait_for
+            # действительно ограничивает ожидание (сам запрос завершится по таймауту httpx)
+            query = db_client.client.table('sales_users').select('telegram_id').limit(1)
+            await asyncio.wait_for(asyncio.to_thread(query.execute), timeout=self.timeout)
+            self.connected = True
+            self.error = None
+            self._consecutive_failures = 0
+        except Exception as e:
+            self.connected = False
+            self.error = str(e) or type(e).__name__
+            self._consecutive_failures += 1
+            if self._consecutive_failures == 1:
+                logger.warning(f"Проверка БД не прошла: {self.error}")
+        self.latency_ms = round((time.perf_counter() - start_time) * 1000, 1)
+        self.checked_at = time.time()
+        self._checked_monotonic = time.monotonic()
+        return self.connected
+
+    async def run(self) -> None:
+        """Фоновый цикл проверок"""
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    @property
+    def age_seconds(self) -> Optional[float]:
+        if self._checked_monotonic is None:
+            return None
+        return time.monotonic() - self._checked_monotonic
+
+    def to_dict(self) -> Dict[str, Any]:
+        age = self.age_seconds
+        return {
+            "connected": self.connected,
+            "error": self.error,
+            "latency_ms": self.latency_ms,
+            "checked_at": self.checked_at,
+            "age_seconds": round(age, 1) if age is not None else None,
+            "consecutive_failures": self._consecutive_failures
+        }
+
+
+_db_status = DatabaseStatusMonitor(
+    interval=settings.HEALTH_DB_CHECK_INTERVAL_SECONDS,
+    timeout=settings.HEALTH_DB_CHECK_TIMEOUT_SECONDS
+)
+
+
+def get_db_status() -> DatabaseStatusMonitor:
+    """Возвращает фоновый монитор состояния БД"""
+    return _db_status
+
+
+def _saturation(used: int, capacity: int) -> Dict[str, Any]:
+    return {
+        "used": used,
+        "capacity": capacity,
+        "ratio": round(used / capacity, 3) if capacity else None
+    }
+
+
+def get_readiness() -> Dict[str, Any]:
+    """
+    Вычисляет готовность из уже собранных данных (без обращения к БД)
+
+    Returns:
+        Dict с флагом ready, причинами неготовности и сигналами насыщения
+    """
+    from app.core.cache import get_cache_stats
+    from app.core.drain import get_drain_state
+    from app.core.executor import get_cpu_executor
+    from app.core.loop_monitor import get_loop_monitor
+    from app.core.warmup import is_warmed_up
+    from app.database.supabase_client import get_connection_pool_stats
+
+    reasons = []
+    if get_drain_state().draining:
+        reasons.append("draining")
+    if not is_warmed_up():
+        reasons.append("warmup_in_progress")
+
+    age = _db_status.age_seconds
+    if _db_status.connected is None:
+        reasons.append("database_not_checked")
+    elif not _db_status.connected:
+        reasons.append("database_unavailable")
+    elif age is not None and age > settings.HEALTH_DB_STALE_SECONDS:
+        reasons.append("database_status_stale")
+
+    pool_stats = get_connection_pool_stats()
+    executor_stats = get_cpu_executor().get_stats()
+    loop_lag_ms = round(get_loop_monitor().last_lag * 1000, 1)
+    if settings.ENABLE_LOOP_MONITOR and loop_lag_ms > settings.READINESS_MAX_LOOP_LAG_MS:
+        reasons.append("event_loop_overloaded")
+
+    return {
+        "ready": not reasons,
+        "reasons": reasons,
+        "database": _db_status.to_dict(),
+        "saturation": {
+            "connection_pool": {
+                **_saturation(pool_stats["cached_clients"], pool_stats["max_connections"]),
+                "pending_creations": pool_stats["pending_creations"],
+                "healthy": pool_stats["healthy"]
+            },
+            "cpu_executor": _saturation(executor_stats["pending"], executor_stats["max_pending"]),
+            "response_cache": {"entries": get_cache_stats()["size"]},
+            "event_loop": {"last_lag_ms": loop_lag_ms, "max_allowed_ms": settings.READINESS_MAX_LOOP_LAG_MS}
+        }
+    }
@@ -0,0 +1,128 @@
+"""
+Сэмплирование и ограничение частоты логов для горячих участков кода
+"""
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+# Атрибут записи с вероятностью сэмплирования, задается через extra на месте вызова
+SAMPLE_RATE_ATTR = "sample_rate"
+
+# Логгер журнала HTTP запросов (RequestLoggingMiddleware)
+ACCESS_LOGGER_NAME = "app.middleware.request_logging"
+
+
+def sampled(rate: float, **extra: Any) -> Dict[str, Any]:
+    """
+    Формирует extra для записи, которая должна логироваться с вероятностью rate
+
+    Usage:
+        logger.info("Запрос метрик для бота %s", bot_id, extra=sampled(0.1))
+    """
+    extra[SAMPLE_RATE_ATTR] = rate
+    return extra
+
+
+class LazyPayload:
+    """Ленивое представление payload: функция вызывается только при форматировании записи"""
+
+    __slots__ = ("_func",)
+
+    def __init__(self, func: Callable[[], Any]):
+        self._func = func
+
+    def __str__(self) -> str:
+        return str(self._func())
+
+    __repr__ = __str__
+
+
+def lazy(func: Callable[[], Any]) -> LazyPayload:
+    """
+    Откладывает построение тяжелого payload до форматирования записи
+
+    Usage:
+        logger.debug("Ответ от БД: %s", lazy(lambda: response.data))
+    """
+    return LazyPayload(func)
+
+
+class LogThrottleFilter(logging.Filter):
+    """
+    Фильтр для handlers: сэмплирование по месту вызова и token bucket
+    для подавления повторяющихся сообщений
+
+    Решение принимается один раз на запись и кешируется в ней, поэтому
+    фильтр можно вешать сразу на несколько handlers. Записи уровнем выше
+    max_level (WARNING и выше по умолчанию) никогда не подавляются.
+
+    Token bucket подавляет только фоновые повторы: записи с request_id
+    (добавляется RequestContextFilter, который должен стоять раньше) и записи
+    логгеров exempt_loggers (журнал запросов) по нему не ограничиваются -
+    каждый запрос пишет их с одних и тех же мест вызова. Явное
+    сэмплирование через sampled() применяется ко всем записям.
+    """
+
+    def __init__(self, rate_per_second: float = 5.0, burst: int = 20, max_level: int = logging.INFO,
+                 exempt_loggers: Iterable[str] = ()):
+        """
+        Args:
+            rate_per_second: Скорость пополнения токенов для одного места вызова
+            burst: Максимальное количество записей подряд для одного места вызова
+            max_level: Максимальный уровень, к которому применяется ограничение
+            exempt_loggers: Логгеры, записи которых не ограничиваются token bucket
+        """
+        super().__init__()
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_level = max_level
+        self.exempt_loggers = frozenset(exempt_loggers)
+        # Место вызова -> (токены, время последнего пополнения, подавлено записей)
+        self._buckets: Dict[Tuple[str, int], Tuple[float, float, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        decision = record.__dict__.get("_throttle_decision")
+        if decision is None:
+            decision = self._decide(record)
+            record._throttle_decision = decision
+        return decision
+
+    def _decide(self, record: logging.LogRecord) -> bool:
+        sample_rate = record.__dict__.pop(SAMPLE_RATE_ATTR, None)
+        if record.levelno > self.max_level:
+            return True
+        if record.name in self.exempt_loggers or record.__dict__.get("request_id") is not None:
+            return sample_rate is None or random.random() < sample_rate
+
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+
+        with self._lock:
+            tokens, last_refill, suppressed = self._buckets.get(key, (float(self.burst), now, 0))
+            tokens = min(float(self.burst), tokens + (now - last_refill) * self.rate_per_second)
+
+            if (sample_rate is not None and random.random() >= sample_rate) or tokens < 1.0:
+                self._buckets[key] = (tokens, now, suppressed + 1)
+                return False
+
+            self._buckets[key] = (tokens - 1.0, now, 0)
+
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} suppressed)"
+            record.args = None
+            record.suppressed = suppressed
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает статистику подавленных записей"""
+        with self._lock:
+            pending = sum(suppressed for _, _, suppressed in self._buckets.values())
+            return {
+                "tracked_call_sites": len(self._buckets),
+                "pending_suppressed": pending,
+                "rate_per_second": self.rate_per_second,
+                "burst": self.burst
+            }
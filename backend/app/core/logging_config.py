@@ -5,20 +5,68 @@ import json
 import logging
 import logging.handlers
 import os
-from datetime import datetime
+import time
+import traceback
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 from app.core.config import settings
+from app.core.log_sampling import ACCESS_LOGGER_NAME, LogThrottleFilter, SAMPLE_RATE_ATTR
+from app.core.request_context import RequestContextFilter
+from app.core.slow_queries import SLOW_QUERY_LOGGER_NAME
+
+
+# Стандартные атрибуты LogRecord, которые не относятся к пользовательскому extra
+_RESERVED_RECORD_KEYS = frozenset(logging.LogRecord(
+    name="", level=0, pathname="", lineno=0, msg="", args=None, exc_info=None
+).__dict__.keys()) | {"message", "asctime"}
+
+# Контекстные поля выводятся первыми и только если заданы
+_CONTEXT_KEYS = ("request_id", "user_id", "bot_id", "ip_address", "user_agent")
+
+_SKIP_EXTRA_KEYS = _RESERVED_RECORD_KEYS | frozenset(_CONTEXT_KEYS) | {SAMPLE_RATE_ATTR}
+
+try:
+    import orjson
+
+    def _dumps(data: Dict[str, Any]) -> str:
+        return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+except ImportError:  # orjson опционален, используем stdlib
+    orjson = None
+
+    def _dumps(data: Dict[str, Any]) -> str:
+        return json.dumps(data, ensure_ascii=False, default=str)
 
 
 class JSONFormatter(logging.Formatter):
     """JSON форматтер для структурированного логирования"""
     
+    def __init__(self, static_fields: Optional[Dict[str, Any]] = None, capture_stack: bool = False):
+        """
+        Args:
+            static_fields: Поля, добавляемые в каждую запись (вычисляются один раз)
+            capture_stack: Добавлять stack trace к ERROR записям без exc_info
+        """
+        super().__init__()
+        self._static_fields = dict(static_fields or {})
+        self._capture_stack = capture_stack
+        # Кеш префикса timestamp с точностью до секунды
+        # (секунда, префикс) одним кортежем: форматтер общий для потоков, пара заменяется атомарно
+        self._cached_timestamp: Tuple[Optional[int], str] = (None, "")
+    
+    def _format_timestamp(self, created: float) -> str:
+        """Форматирует время записи в ISO 8601 (UTC), переиспользуя префикс секунды"""
+        second = int(created)
+        cached_second, prefix = self._cached_timestamp
+        if second != cached_second:
+            prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            self._cached_timestamp = (second, prefix)
+        return f"{prefix}.{int((created - second) * 1_000_000):06d}Z"
+    
     def format(self, record: logging.LogRecord) -> str:
         """Форматирует запись лога в JSON"""
         log_data: Dict[str, Any] = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": self._format_timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -26,40 +74,31 @@ class JSONFormatter(logging.Formatter):
             "function": record.funcName,
             "line": record.lineno,
         }
+        if self._static_fields:
+            log_data.update(self._static_fields)
+        
+        record_dict = record.__dict__
         
         # Добавляем контекст из extra, если есть
-        if hasattr(record, 'request_id') and record.request_id:
-            log_data["request_id"] = record.request_id
-        if hasattr(record, 'user_id') and record.user_id:
-            log_data["user_id"] = record.user_id
-        if hasattr(record, 'bot_id') and record.bot_id:
-            log_data["bot_id"] = record.bot_id
-        if hasattr(record, 'ip_address') and record.ip_address:
-            log_data["ip_address"] = record.ip_address
-        if hasattr(record, 'user_agent') and record.user_agent:
-            log_data["user_agent"] = record.user_agent
+        for key in _CONTEXT_KEYS:
+            value = record_dict.get(key)
+            if value:
+                log_data[key] = value
         
         # Добавляем все остальные поля из extra
-        if hasattr(record, '__dict__'):
-            for key, value in record.__dict__.items():
-                if key not in ['name', 'msg', 'args', 'created', 'filename', 'funcName', 
-                              'levelname', 'levelno', 'lineno', 'module', 'msecs', 'message',
-                              'pathname', 'process', 'processName', 'relativeCreated', 'thread',
-                              'threadName', 'exc_info', 'exc_text', 'stack_info', 'request_id',
-                              'user_id', 'bot_id', 'ip_address', 'user_agent']:
-                    if not key.startswith('_'):
-                        log_data[key] = value
+        for key, value in record_dict.items():
+            if key not in _SKIP_EXTRA_KEYS and not key.startswith('_'):
+                log_data[key] = value
         
         # Добавляем информацию об исключении, если есть
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
         
-        # Добавляем stack trace для ошибок
-        if record.levelno >= logging.ERROR and record.exc_info is None:
-            import traceback
+        # Stack trace для ошибок без исключения (только если включено явно)
+        if self._capture_stack and record.levelno >= logging.ERROR and record.exc_info is None:
             log_data["stack_trace"] = traceback.format_stack()
         
-        return json.dumps(log_data, ensure_ascii=False)
+        return _dumps(log_data)
 
 
 class StructuredLoggerAdapter(logging.LoggerAdapter):
@@ -74,6 +113,10 @@ class StructuredLoggerAdapter(logging.LoggerAdapter):
         return msg, kwargs
 
 
+# Глобальный фильтр подавления логов (создается в setup_logging)
+_throttle_filter: Optional[LogThrottleFilter] = None
+
+
 def setup_logging():
     """Настраивает логирование в зависимости от окружения"""
     # Определяем уровень логирования
@@ -107,7 +150,21 @@ def setup_logging():
         )
     else:
         # В production используем JSON формат
-        formatter = JSONFormatter()
+        formatter = JSONFormatter(
+            static_fields={"environment": settings.ENVIRONMENT},
+            capture_stack=settings.LOG_CAPTURE_STACK
+        )
+    
+    # Фильтр сэмплирования и подавления повторов (общий для всех handlers)
+    global _throttle_filter
+    _throttle_filter = None
+    if settings.ENABLE_LOG_THROTTLE:
+        _throttle_filter = LogThrottleFilter(
+            rate_per_second=settings.LOG_THROTTLE_RATE_PER_SECOND,
+            burst=settings.LOG_THROTTLE_BURST,
+            # Журнал запросов пишется с двух мест вызова на каждый запрос и не подавляется
+            exempt_loggers=(ACCESS_LOGGER_NAME,)
+        )
     
     # Console handler (всегда выводим в консоль)
     console_handler = logging.StreamHandler()
@@ -139,6 +196,28 @@ def setup_logging():
         error_handler.setFormatter(formatter)
         root_logger.addHandler(error_handler)
     
+    # Контекст запроса (request_id, user_id, bot_id) добавляется из contextvars
+    context_filter = RequestContextFilter()
+    for handler in root_logger.handlers:
+        handler.addFilter(context_filter)
+        if _throttle_filter is not None:
+            handler.addFilter(_throttle_filter)
+    
+    # Журнал медленных запросов к БД: отдельный файл, всегда в JSON
+    slow_query_handler = logging.handlers.RotatingFileHandler(
+        filename=log_dir / "slow_queries.log",
+        maxBytes=settings.LOG_FILE_MAX_BYTES,
+        backupCount=settings.LOG_FILE_BACKUP_COUNT,
+        encoding='utf-8'
+    )
+    slow_query_handler.setFormatter(JSONFormatter(static_fields={"environment": settings.ENVIRONMENT}))
+    slow_query_handler.addFilter(context_filter)
+    slow_query_logger = logging.getLogger(SLOW_QUERY_LOGGER_NAME)
+    slow_query_logger.handlers.clear()
+    slow_query_logger.addHandler(slow_query_handler)
+    slow_query_logger.setLevel(logging.WARNING)
+    slow_query_logger.propagate = False
+    
     # Настраиваем уровни для сторонних библиотек
     logging.getLogger("uvicorn").setLevel(logging.INFO)
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
@@ -168,3 +247,9 @@ def get_logger(name: str, **context) -> StructuredLoggerAdapter:
     logger = logging.getLogger(name)
     return StructuredLoggerAdapter(logger, context)
 
+
+def get_log_throttle_stats() -> Dict[str, Any]:
+    """Возвращает статистику подавления логов"""
+    if _throttle_filter is None:
+        return {"enabled": False}
+    return {"enabled": True, **_throttle_filter.get_stats()}
@@ -0,0 +1,146 @@
+"""
+Мониторинг задержки event loop и детектор блокирующих вызовов
+
+Фоновая задача измеряет задержку планирования (насколько позже ожидаемого
+просыпается asyncio.sleep), а сторожевой поток фиксирует моменты, когда
+loop не отвечает дольше порога, и снимает стек потока loop в этот момент.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+LOOP_LAG = registry.histogram(
+    "event_loop_lag_seconds", "Задержка планирования event loop", buckets=LOOP_LAG_BUCKETS
+)
+LOOP_BLOCKED_TOTAL = registry.counter(
+    "event_loop_blocked_total", "Количество блокировок event loop дольше порога"
+)
+
+
+class LoopMonitor:
+    """Монитор задержки event loop с детектором блокировок"""
+
+    def __init__(self, interval: float = 0.25, block_threshold: float = 0.2, max_events: int = 20):
+        """
+        Args:
+            interval: Интервал измерения задержки в секундах
+            block_threshold: Порог блокировки loop в секундах
+            max_events: Сколько последних блокировок хранить для отчета
+        """
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.max_stack_depth = 30
+        self.blocking_events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._heartbeat = time.monotonic()
+        self._reported_heartbeat: Optional[float] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Запускает измерение задержки и сторожевой поток (вызывается из event loop)"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop_event.clear()
+        self._task = asyncio.get_running_loop().create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(
+            f"Мониторинг event loop запущен (интервал: {self.interval * 1000:.0f} мс, "
+            f"порог блокировки: {self.block_threshold * 1000:.0f} мс)"
+        )
+
+    async def stop(self) -> None:
+        """Останавливает мониторинг"""
+        self._stop_event.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _measure(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._heartbeat = now
+            self.last_lag = lag
+            if lag > self.max_lag:
+                self.max_lag = lag
+            LOOP_LAG.observe(lag)
+
+    def _watch(self) -> None:
+        check_interval = self.block_threshold / 2
+        while not self._stop_event.wait(check_interval):
+            heartbeat = self._heartbeat
+            blocked_for = time.monotonic() - heartbeat - self.interval
+            if blocked_for < self.block_threshold or self._reported_heartbeat == heartbeat:
+                continue
+            # Один отчет на одну блокировку: стек снимаем, пока loop еще занят
+            self._reported_heartbeat = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame, limit=self.max_stack_depth)) if frame is not None else ""
+            LOOP_BLOCKED_TOTAL.inc()
+            self.blocking_events.append({
+                "detected_at": time.time(),
+                "blocked_ms": round(blocked_for * 1000, 1),
+                "stack": stack
+            })
+            logger.warning(
+                f"Event loop заблокирован более {blocked_for * 1000:.0f} мс",
+                extra={"blocked_ms": round(blocked_for * 1000, 1), "stack": stack}
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает статистику задержки loop и последние блокировки"""
+        return {
+            "running": self._task is not None,
+            "last_lag_ms": round(self.last_lag * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "blocked_total": int(LOOP_BLOCKED_TOTAL.get()),
+            "block_threshold_ms": round(self.block_threshold * 1000),
+            "recent_blocks": [
+                {"detected_at": event["detected_at"], "blocked_ms": event["blocked_ms"]}
+                for event in self.blocking_events
+            ]
+        }
+
+
+_loop_monitor: Optional[LoopMonitor] = None
+
+
+def get_loop_monitor() -> LoopMonitor:
+    """Получает или создает глобальный монитор event loop"""
+    global _loop_monitor
+    if _loop_monitor is None:
+        _loop_monitor = LoopMonitor(
+            interval=settings.LOOP_MONITOR_INTERVAL_MS / 1000,
+            block_threshold=settings.LOOP_BLOCK_THRESHOLD_MS / 1000
+        )
+    return _loop_monitor
+
+
+def get_loop_monitor_stats() -> Dict[str, Any]:
+    """Возвращает статистику монитора event loop"""
+    return get_loop_monitor().get_stats()
@@ -0,0 +1,208 @@
+"""
+Диагностика памяти: снимки tracemalloc с diff по файлам/строкам и размеры
+долгоживущих структур приложения (кеш ответов, rate limiting, пул соединений)
+"""
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_GROUPING = ("lineno", "filename", "traceback")
+
+# Размер оценивается по выборке элементов, чтобы не обходить большие структуры целиком
+_SIZE_SAMPLE = 200
+_MAX_DEPTH = 4
+
+# Собственные аллокации tracemalloc и импорт-машинерии не интересны
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _deep_sizeof(obj: Any, seen: set, depth: int = 0) -> int:
+    """Приблизительный рекурсивный размер объекта (контейнеры и __dict__)"""
+    if id(obj) in seen or depth > _MAX_DEPTH:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return size
+    # Вложенные контейнеры копируются одним вызовом (атомарно под GIL): обход
+    # копии не падает, если event loop изменяет их во время оценки в потоке
+    if isinstance(obj, dict):
+        for key, value in tuple(obj.items()):
+            size += _deep_sizeof(key, seen, depth + 1) + _deep_sizeof(value, seen, depth + 1)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in tuple(obj):
+            size += _deep_sizeof(item, seen, depth + 1)
+    elif hasattr(obj, "__dict__"):
+        size += _deep_sizeof(vars(obj), seen, depth + 1)
+    return size
+
+
+def snapshot_container(container: Any) -> Tuple[int, int, List[Any]]:
+    """
+    Количество элементов, размер контейнера и копия выборки первых _SIZE_SAMPLE
+    элементов; вызывается там же, где контейнер изменяется (в event loop)
+    """
+    items = container.items() if isinstance(container, dict) else container
+    return len(container), sys.getsizeof(container), list(islice(items, _SIZE_SAMPLE))
+
+
+def estimate_container_size(snapshot: Tuple[int, int, List[Any]]) -> Dict[str, Any]:
+    """
+    Оценивает размер контейнера по снимку: точный размер самого контейнера и
+    экстраполяцию по выборке (можно вызывать в потоке)
+    """
+    entries, container_bytes, sample = snapshot
+    seen: set = set()
+    sample_bytes = sum(_deep_sizeof(item, seen) for item in sample)
+    estimated = container_bytes + (sample_bytes * entries // len(sample) if sample else 0)
+    return {
+        "entries": entries,
+        "container_bytes": container_bytes,
+        "estimated_bytes": estimated,
+        "sampled_entries": len(sample)
+    }
+
+
+# Имя структуры -> функция, возвращающая контейнер
+_structures: Dict[str, Callable[[], Any]] = {}
+
+
+def register_structure(name: str, getter: Callable[[], Any]) -> None:
+    """Регистрирует долгоживущую структуру для отчета о памяти"""
+    _structures[name] = getter
+
+
+def snapshot_structures() -> Dict[str, Any]:
+    """Снимки всех зарегистрированных структур (вызывать в event loop, где они изменяются)"""
+    result: Dict[str, Any] = {}
+    for name, getter in list(_structures.items()):
+        try:
+            container = getter()
+            result[name] = snapshot_container(container) if container is not None else None
+        except Exception as e:
+            result[name] = {"error": str(e)}
+    return result
+
+
+def estimate_structure_sizes(snapshots: Dict[str, Any]) -> Dict[str, Any]:
+    """Размеры структур по снимкам snapshot_structures (тяжелая часть, выполняется в потоке)"""
+    return {
+        name: estimate_container_size(snapshot) if isinstance(snapshot, tuple) else snapshot
+        for name, snapshot in snapshots.items()
+    }
+
+
+def get_structure_sizes() -> Dict[str, Any]:
+    """Возвращает размеры всех зарегистрированных структур (синхронно)"""
+    return estimate_structure_sizes(snapshot_structures())
+
+
+def get_rss_bytes() -> Optional[int]:
+    """Текущий RSS процесса (Linux), иначе None"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        import resource
+        return resident_pages * resource.getpagesize()
+    except (OSError, ImportError, IndexError, ValueError):
+        return None
+
+
+class MemoryProfiler:
+    """Управляет tracemalloc и сравнением последовательных снимков"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._previous_at: Optional[float] = None
+
+    @property
+    def is_tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1) -> None:
+        """Запускает tracemalloc и снимает базовый снимок"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+                logger.info(f"tracemalloc запущен (глубина стека: {frames})")
+            self._previous = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+            self._previous_at = time.time()
+
+    def stop(self) -> None:
+        """Останавливает tracemalloc и освобождает снимки"""
+        with self._lock:
+            self._previous = None
+            self._previous_at = None
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+                logger.info("tracemalloc остановлен")
+
+    def snapshot_diff(self, limit: int = 20, group_by: str = "lineno") -> Dict[str, Any]:
+        """
+        Снимает новый снимок и сравнивает его с предыдущим
+
+        Args:
+            limit: Количество позиций с наибольшим приростом
+            group_by: Группировка: lineno, filename или traceback
+
+        Returns:
+            Dict с top-N изменений; новый снимок становится базой для следующего сравнения
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing() or self._previous is None:
+                raise RuntimeError("tracemalloc не запущен")
+            snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+            stats = snapshot.compare_to(self._previous, group_by)
+            interval = time.time() - self._previous_at
+            self._previous = snapshot
+            self._previous_at = time.time()
+
+        top = []
+        for stat in stats[:limit]:
+            frames = stat.traceback.format() if group_by == "traceback" else None
+            frame = stat.traceback[0]
+            top.append({
+                "location": frame.filename if group_by == "filename" else f"{frame.filename}:{frame.lineno}",
+                "size_diff_bytes": stat.size_diff,
+                "size_bytes": stat.size,
+                "count_diff": stat.count_diff,
+                "count": stat.count,
+                **({"traceback": frames} if frames else {})
+            })
+        return {
+            "interval_seconds": round(interval, 1),
+            "total_size_diff_bytes": sum(stat.size_diff for stat in stats),
+            "top": top
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {"tracing": tracemalloc.is_tracing(), "rss_bytes": get_rss_bytes()}
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            stats.update({
+                "traced_current_bytes": current,
+                "traced_peak_bytes": peak,
+                "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+                "baseline_at": self._previous_at
+            })
+        return stats
+
+
+_memory_profiler = MemoryProfiler()
+
+
+def get_memory_profiler() -> MemoryProfiler:
+    """Возвращает глобальный профайлер памяти"""
+    return _memory_profiler
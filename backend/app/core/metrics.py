@@ -0,0 +1,218 @@
+"""
+Легковесный реестр метрик (counters, gauges, histograms) с экспортом в формате Prometheus
+"""
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Стандартные границы бакетов для латентности в секундах
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Монотонно возрастающий счетчик с метками"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        """Увеличивает счетчик для набора значений меток"""
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def get(self, *labelvalues: str) -> float:
+        """Возвращает текущее значение счетчика"""
+        return self._values.get(labelvalues, 0.0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in items
+        ]
+
+
+class Histogram:
+    """Гистограмма с фиксированными бакетами и метками"""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Метки -> [счетчики по бакетам (последний = +Inf), сумма, количество]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        """Добавляет наблюдение для набора значений меток"""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._values[labelvalues] = state
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def get_count(self, *labelvalues: str) -> int:
+        """Возвращает количество наблюдений"""
+        state = self._values.get(labelvalues)
+        return state[2] if state else 0
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = [(labels, list(state[0]), state[1], state[2]) for labels, state in self._values.items()]
+        lines = []
+        bounds = self.buckets + (float("inf"),)
+        for labels, bucket_counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, bucket_counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Gauge:
+    """Gauge, значение которого вычисляется при сборе метрик"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self._callback = callback
+
+    def collect(self) -> List[str]:
+        try:
+            value = float(self._callback())
+        except Exception:
+            return []
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class MetricsRegistry:
+    """Реестр метрик приложения"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Регистрирует (или возвращает существующий) счетчик"""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS
+    ) -> Histogram:
+        """Регистрирует (или возвращает существующую) гистограмму"""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], float]) -> Gauge:
+        """Регистрирует gauge с функцией вычисления значения"""
+        return self._register(Gauge(name, documentation, callback))
+
+    def get(self, name: str) -> Optional[object]:
+        """Возвращает метрику по имени"""
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Возвращает все метрики в текстовом формате Prometheus (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+# Глобальный реестр метрик
+registry = MetricsRegistry()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Метрики HTTP запросов
+HTTP_REQUESTS_TOTAL = registry.counter(
+    "http_requests_total", "Количество HTTP запросов", ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "Время обработки HTTP запросов", ("method", "route", "status")
+)
+
+# Метрики запросов к Supabase
+DB_QUERY_DURATION = registry.histogram(
+    "supabase_query_duration_seconds", "Время выполнения запросов к Supabase", ("table", "operation", "outcome")
+)
+DB_ROWS_FETCHED = registry.counter(
+    "supabase_rows_fetched_total", "Количество строк, полученных из Supabase", ("table", "operation")
+)
+DB_BYTES_FETCHED = registry.counter(
+    "supabase_response_bytes_total", "Объем ответов Supabase в байтах", ("table", "operation")
+)
+
+# Метрики кеша и rate limiting
+CACHE_REQUESTS_TOTAL = registry.counter(
+    "response_cache_requests_total", "Обращения к кешу ответов", ("endpoint", "result")
+)
+RATE_LIMIT_REJECTIONS = registry.counter(
+    "rate_limit_rejections_total", "Запросы, отклоненные rate limiting", ("window",)
+)
+
+
+def render_metrics() -> str:
+    """Возвращает метрики приложения в формате Prometheus"""
+    return registry.render()
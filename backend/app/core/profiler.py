@@ -0,0 +1,164 @@
+"""
+Сэмплирующий профайлер по запросу: снимает стеки потока event loop
+с заданным интервалом и сохраняет их в LOG_DIR/profiles в формате
+collapsed stacks (flamegraph.pl, speedscope) или speedscope JSON
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import CodeType
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FORMATS = ("collapsed", "speedscope")
+
+
+def _code_label(code: CodeType, cache: Dict[CodeType, str]) -> str:
+    label = cache.get(code)
+    if label is None:
+        filename = "/".join(Path(code.co_filename).parts[-2:])
+        label = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+        cache[code] = label
+    return label
+
+
+class StackSampler:
+    """Фоновый поток, периодически снимающий стек указанного потока"""
+
+    def __init__(self, thread_id: int, interval: float = 0.005, max_depth: int = 128):
+        """
+        Args:
+            thread_id: Идентификатор профилируемого потока (обычно поток event loop)
+            interval: Интервал между снимками в секундах
+            max_depth: Максимальная глубина стека
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._labels: Dict[CodeType, str] = {}
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> "StackSampler":
+        self.started_at = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self) -> "StackSampler":
+        self._stop_event.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        return self
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack: List[str] = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(_code_label(frame.f_code, self._labels))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples[";".join(stack)] += 1
+
+    def to_collapsed(self) -> str:
+        """Формат collapsed stacks: "frame1;frame2;frame3 count" на строку"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+    def to_speedscope(self, name: str) -> str:
+        """Формат speedscope (sampled profile)"""
+        frame_index: Dict[str, int] = {}
+        frames: List[Dict[str, str]] = []
+        samples: List[List[int]] = []
+        weights: List[float] = []
+        for stack, count in self.samples.items():
+            indices = []
+            for label in stack.split(";"):
+                index = frame_index.get(label)
+                if index is None:
+                    index = frame_index[label] = len(frames)
+                    frames.append({"name": label})
+                indices.append(index)
+            samples.append(indices)
+            weights.append(count * self.interval)
+        return json.dumps({
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.duration,
+                "samples": samples,
+                "weights": weights
+            }],
+            "name": name,
+            "exporter": "dashboard-backend"
+        })
+
+
+# Одновременно допускается только одна сессия профилирования
+_profiling_lock = threading.Lock()
+
+
+def try_start_profiling(thread_id: Optional[int] = None) -> Optional[StackSampler]:
+    """
+    Запускает профилирование потока (по умолчанию текущего)
+
+    Returns:
+        StackSampler или None, если уже идет другая сессия профилирования
+    """
+    if not _profiling_lock.acquire(blocking=False):
+        return None
+    try:
+        return StackSampler(
+            thread_id or threading.get_ident(),
+            interval=settings.PROFILING_INTERVAL_MS / 1000
+        ).start()
+    except Exception:
+        _profiling_lock.release()
+        raise
+
+
+def finish_profiling(sampler: StackSampler, label: str, profile_format: str = "collapsed") -> Path:
+    """
+    Останавливает профилирование и сохраняет результат в LOG_DIR/profiles
+
+    Returns:
+        Путь к файлу профиля
+    """
+    try:
+        sampler.stop()
+    finally:
+        _profiling_lock.release()
+
+    profile_dir = Path(settings.LOG_DIR) / "profiles"
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    safe_label = "".join(c if c.isalnum() or c in "-_" else "_" for c in label)[:80]
+    timestamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+
+    if profile_format == "speedscope":
+        path = profile_dir / f"profile-{safe_label}-{timestamp}.speedscope.json"
+        content = sampler.to_speedscope(label)
+    else:
+        path = profile_dir / f"profile-{safe_label}-{timestamp}.collapsed"
+        content = sampler.to_collapsed()
+
+    path.write_text(content, encoding="utf-8")
+    logger.info(
+        f"Профиль сохранен: {path} ({sum(sampler.samples.values())} снимков за {sampler.duration:.2f}s, pid={os.getpid()})"
+    )
+    return path
@@ -0,0 +1,99 @@
+"""
+Контекст запроса на contextvars: request_id, user_id, bot_id и дедлайн
+
+Значения устанавливаются middleware и зависимостями и автоматически
+доступны в любом коде, выполняемом в рамках запроса (включая SupabaseClient),
+без передачи адаптеров логгера и extra словарей.
+"""
+import logging
+import time
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Optional, Tuple
+
+_request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_user_id_var: ContextVar[Optional[str]] = ContextVar("user_id", default=None)
+_bot_id_var: ContextVar[Optional[str]] = ContextVar("bot_id", default=None)
+# Дедлайн запроса по time.monotonic()
+_deadline_var: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+def set_request_context(request_id: Optional[str], user_id: Optional[str] = None) -> Tuple[Token, Token]:
+    """
+    Устанавливает контекст нового запроса
+
+    Returns:
+        Токены для reset_request_context
+    """
+    return _request_id_var.set(request_id), _user_id_var.set(user_id)
+
+
+def reset_request_context(tokens: Tuple[Token, Token]) -> None:
+    """Восстанавливает контекст, действовавший до set_request_context"""
+    request_id_token, user_id_token = tokens
+    _request_id_var.reset(request_id_token)
+    _user_id_var.reset(user_id_token)
+
+
+def bind_bot_id(bot_id: Optional[str]) -> None:
+    """Привязывает bot_id к текущему запросу (после проверки доступа)"""
+    _bot_id_var.set(bot_id)
+
+
+def set_deadline(timeout_seconds: float) -> Token:
+    """Устанавливает дедлайн текущего запроса через timeout_seconds секунд"""
+    return _deadline_var.set(time.monotonic() + timeout_seconds)
+
+
+def reset_deadline(token: Token) -> None:
+    """Сбрасывает дедлайн, установленный set_deadline"""
+    _deadline_var.reset(token)
+
+
+def get_request_id() -> Optional[str]:
+    """Возвращает request_id текущего запроса"""
+    return _request_id_var.get()
+
+
+def get_user_id() -> Optional[str]:
+    """Возвращает user_id текущего запроса"""
+    return _user_id_var.get()
+
+
+def get_bot_id() -> Optional[str]:
+    """Возвращает bot_id текущего запроса"""
+    return _bot_id_var.get()
+
+
+def get_remaining_time() -> Optional[float]:
+    """Возвращает оставшееся до дедлайна время в секундах (None, если дедлайна нет)"""
+    deadline = _deadline_var.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def get_request_context() -> Dict[str, Any]:
+    """Возвращает снимок текущего контекста запроса"""
+    return {
+        "request_id": _request_id_var.get(),
+        "user_id": _user_id_var.get(),
+        "bot_id": _bot_id_var.get(),
+        "remaining_time": get_remaining_time()
+    }
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Фильтр для handlers: добавляет request_id, user_id и bot_id из контекста
+    в каждую запись, если они не переданы явно через extra
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record_dict = record.__dict__
+        if record_dict.get("request_id") is None:
+            record_dict["request_id"] = _request_id_var.get()
+        if record_dict.get("user_id") is None:
+            record_dict["user_id"] = _user_id_var.get()
+        if record_dict.get("bot_id") is None:
+            record_dict["bot_id"] = _bot_id_var.get()
+        return True
@@ -0,0 +1,103 @@
+"""
+Классы ответов FastAPI
+
+FastJSONResponse кодирует JSON через orjson (если установлен) или stdlib json.
+Декоратор direct_json_response отдает dict эндпоинта этим классом напрямую,
+минуя валидацию response_model и jsonable_encoder FastAPI; большие ответы
+кодируются в пуле CPU задач.
+"""
+import datetime
+import json
+import time
+from decimal import Decimal
+from functools import wraps
+from typing import Any
+
+from fastapi.responses import JSONResponse, Response
+
+from app.core.config import settings
+from app.core.executor import get_cpu_executor
+from app.core.server_timing import record_timing
+
+
+def _default(value: Any) -> Any:
+    """Типы, которые jsonable_encoder FastAPI приводил бы к JSON"""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+try:
+    import orjson
+
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps_json(content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+except ImportError:  # orjson опционален, используем stdlib
+    orjson = None
+
+    def dumps_json(content: Any) -> bytes:
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":"),
+            default=_default,
+        ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse на orjson, который добавляет время сериализации в тайминги запроса"""
+
+    def render(self, content: Any) -> bytes:
+        start_time = time.perf_counter()
+        body = dumps_json(content)
+        record_timing("serialize", (time.perf_counter() - start_time) * 1000)
+        return body
+
+
+def count_items(content: Any) -> int:
+    """Количество элементов списков на двух верхних уровнях ответа (оценка объема кодирования)"""
+    if not isinstance(content, dict):
+        return len(content) if isinstance(content, list) else 0
+    total = 0
+    for value in content.values():
+        if isinstance(value, list):
+            total += len(value)
+        elif isinstance(value, dict):
+            total += sum(len(item) for item in value.values() if isinstance(item, list))
+    return total
+
+
+async def render_json_response(content: Any) -> Response:
+    """FastJSONResponse; ответ от RESPONSE_OFFLOAD_ITEM_THRESHOLD элементов кодируется вне event loop"""
+    items = count_items(content)
+    if items < settings.RESPONSE_OFFLOAD_ITEM_THRESHOLD:
+        return FastJSONResponse(content)
+    start_time = time.perf_counter()
+    body = await get_cpu_executor().run(dumps_json, content)
+    record_timing("serialize", (time.perf_counter() - start_time) * 1000)
+    return Response(body, media_type="application/json")
+
+
+def direct_json_response(func):
+    """
+    Отдает результат эндпоинта через FastJSONResponse без валидации и jsonable_encoder
+
+    Для эндпоинтов, которые сами формируют dict из JSON-совместимых типов
+    (используется вместе с response_model=None).
+    """
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        result = await func(*args, **kwargs)
+        if isinstance(result, Response):
+            return result
+        return await render_json_response(result)
+
+    return wrapper
@@ -0,0 +1,72 @@
+"""
+Поэтапные тайминги запроса для заголовка Server-Timing и структурированного лога
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class RequestTimings:
+    """Набор именованных интервалов одного запроса"""
+
+    __slots__ = ("spans",)
+
+    def __init__(self):
+        # (имя, длительность в миллисекундах)
+        self.spans: List[Tuple[str, float]] = []
+
+    def add(self, name: str, duration_ms: float) -> None:
+        self.spans.append((name, duration_ms))
+
+    def to_header(self, total_ms: Optional[float] = None) -> str:
+        """Форматирует интервалы в значение заголовка Server-Timing"""
+        entries = [f"{name};dur={duration:.1f}" for name, duration in self.spans]
+        if total_ms is not None:
+            entries.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(entries)
+
+    def summary(self) -> Dict[str, float]:
+        """Суммарная длительность по именам (для структурированного лога)"""
+        result: Dict[str, float] = {}
+        for name, duration in self.spans:
+            result[name] = round(result.get(name, 0.0) + duration, 1)
+        return result
+
+
+# Объект таймингов создается на запрос и разделяется всеми дочерними задачами
+_timings_var: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> Tuple[RequestTimings, Token]:
+    """Создает набор таймингов для текущего запроса"""
+    timings = RequestTimings()
+    return timings, _timings_var.set(timings)
+
+
+def reset_request_timings(token: Token) -> None:
+    """Сбрасывает набор таймингов, установленный start_request_timings"""
+    _timings_var.reset(token)
+
+
+def record_timing(name: str, duration_ms: float) -> None:
+    """Добавляет интервал к таймингам текущего запроса (вне запроса ничего не делает)"""
+    timings = _timings_var.get()
+    if timings is not None:
+        timings.add(name, duration_ms)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """
+    Замеряет длительность блока и добавляет ее в тайминги запроса
+
+    Usage:
+        with timed("aggregate"):
+            ...
+    """
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(name, (time.perf_counter() - start_time) * 1000)
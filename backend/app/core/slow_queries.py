@@ -0,0 +1,154 @@
+"""
+Журнал медленных запросов к Supabase: запросы дольше порога пишутся в
+LOG_DIR/slow_queries.log и попадают в top-N по длительности в памяти
+(доступен через /internal/slow-queries)
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.memory_profiler import register_structure
+from app.core.request_context import get_bot_id, get_request_id
+
+# Отдельный логгер без распространения в корневой (handler настраивается в setup_logging)
+SLOW_QUERY_LOGGER_NAME = "app.slow_queries"
+
+slow_query_logger = logging.getLogger(SLOW_QUERY_LOGGER_NAME)
+
+# Параметры PostgREST, не являющиеся фильтрами
+_MODIFIER_PARAMS = frozenset({"limit", "offset", "order", "on_conflict", "columns"})
+
+# Значения длиннее порога (например, in.(...) по тысячам id) сокращаются
+_MAX_FILTER_VALUE_LENGTH = 120
+
+
+def _shorten_filter(value: str) -> str:
+    if len(value) <= _MAX_FILTER_VALUE_LENGTH:
+        return value
+    operator, _, operand = value.partition(".")
+    if operator == "in" and operand.startswith("("):
+        return f"in.(<{operand.count(',') + 1} значений>)"
+    return value[:_MAX_FILTER_VALUE_LENGTH] + "..."
+
+
+def describe_query(query) -> Tuple[Optional[str], Dict[str, str], Dict[str, str]]:
+    """
+    Извлекает из builder PostgREST выбранные колонки, фильтры и модификаторы
+
+    Returns:
+        (columns, filters, modifiers)
+    """
+    request = getattr(query, "request", None)
+    params = getattr(request, "params", None)
+    if params is None:
+        return None, {}, {}
+
+    columns = None
+    filters: Dict[str, str] = {}
+    modifiers: Dict[str, str] = {}
+    for name, value in params.multi_items():
+        if name == "select":
+            columns = value
+        elif name in _MODIFIER_PARAMS:
+            modifiers[name] = value
+        elif name in filters:
+            filters[name] = f"{filters[name]}&{_shorten_filter(value)}"
+        else:
+            filters[name] = _shorten_filter(value)
+    return columns, filters, modifiers
+
+
+class SlowQueryLog:
+    """Top-N самых медленных запросов в памяти"""
+
+    def __init__(self, threshold_ms: float = 500, top_n: int = 50):
+        """
+        Args:
+            threshold_ms: Порог длительности запроса в миллисекундах
+            top_n: Сколько самых медленных запросов хранить в памяти
+        """
+        self.threshold_ms = threshold_ms
+        self.top_n = top_n
+        # Min-heap: (длительность, порядковый номер, запись)
+        self._heap: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._sequence = itertools.count()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def maybe_record(
+        self,
+        query,
+        table: str,
+        operation: str,
+        duration_ms: float,
+        rows: Optional[int],
+        response_bytes: Optional[int],
+        outcome: str
+    ) -> None:
+        """Записывает запрос, если он медленнее порога"""
+        if duration_ms < self.threshold_ms:
+            return
+
+        columns, filters, modifiers = describe_query(query)
+        entry = {
+            "timestamp": time.time(),
+            "table": table,
+            "operation": operation,
+            "duration_ms": round(duration_ms, 1),
+            "columns": columns,
+            "filters": filters,
+            "modifiers": modifiers,
+            "rows": rows,
+            "bytes": response_bytes,
+            "outcome": outcome,
+            "request_id": get_request_id(),
+            "bot_id": get_bot_id()
+        }
+
+        with self._lock:
+            self._total += 1
+            item = (duration_ms, next(self._sequence), entry)
+            if len(self._heap) < self.top_n:
+                heapq.heappush(self._heap, item)
+            elif duration_ms > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+        slow_query_logger.warning(
+            f"Медленный запрос {operation} {table}: {duration_ms:.0f} мс, строк: {rows}",
+            extra={key: value for key, value in entry.items() if key not in ("timestamp", "request_id", "bot_id")}
+        )
+
+    def get_top(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Возвращает самые медленные запросы (по убыванию длительности)"""
+        with self._lock:
+            items = sorted(self._heap, reverse=True)
+        return [entry for _, _, entry in items[:limit]]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": self.threshold_ms,
+            "total_slow_queries": self._total,
+            "tracked": len(self._heap),
+            "top_n": self.top_n
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap.clear()
+            self._total = 0
+
+
+_slow_query_log = SlowQueryLog(
+    threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    top_n=settings.SLOW_QUERY_TOP_N
+)
+register_structure("SlowQueryLog._heap", lambda: _slow_query_log._heap)
+
+
+def get_slow_query_log() -> SlowQueryLog:
+    """Возвращает глобальный журнал медленных запросов"""
+    return _slow_query_log
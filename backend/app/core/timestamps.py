@@ -0,0 +1,212 @@
+"""
+Разбор меток времени PostgREST в секунды от эпохи и интервалы графиков в часовом поясе бота
+
+PostgREST отдает timestamptz в фиксированном формате
+YYYY-MM-DDTHH:MM:SS[.ffffff]+HH:MM (или Z). Для одиночных значений используется
+datetime.fromisoformat (C реализация): разбор фиксированного формата на Python
+(срезы и int, кеш дней или минут) не быстрее, а кеш по строке не окупается -
+created_at почти всегда уникальны. Ускорение дает только разбор колонки: от
+_VECTORIZED_MIN_VALUES значений - векторный разбор байтов фиксированного
+формата через numpy (app.core.vectorized_timestamps).
+Значения другого вида разбираются построчно, поэтому результат всегда совпадает
+с datetime.fromisoformat(value).timestamp().
+
+Метка времени разбирается один раз при построении колоночной таблицы
+(app.database.columnar), дальше интервалы определяются по секундам от эпохи.
+
+Точки графиков - часы или календарные дни часового пояса бота (TimeGrid):
+границы интервалов окна вычисляются один раз, строка относится к интервалу
+делением (если все интервалы окна равной длины) или бинарным поиском по
+границам (переход на летнее время). Недели и месяцы - группы дней.
+"""
+import array
+import logging
+from bisect import bisect_right
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+NAN = float("nan")
+
+# Гранулярность точек графиков
+HOUR = "hour"
+DAY = "day"
+WEEK = "week"
+MONTH = "month"
+AUTO = "auto"
+GRANULARITIES = (HOUR, DAY, WEEK, MONTH, AUTO)
+# Почасовые точки доступны для периода до MAX_HOURLY_DAYS дней
+MAX_HOURLY_DAYS = 31
+
+# Меньше этого количества значений векторный разбор не окупает подготовку массивов
+_VECTORIZED_MIN_VALUES = 1024
+
+_fromisoformat = datetime.fromisoformat
+_UTC = timezone.utc
+
+
+def parse_timestamp(value: Any) -> float:
+    """ISO 8601 строка -> секунды от эпохи (NaN для пустых и нераспознанных значений)"""
+    try:
+        moment = _fromisoformat(value)
+    except (TypeError, ValueError):
+        return NAN
+    if moment.tzinfo is None:
+        # Метки времени без смещения считаются UTC
+        moment = moment.replace(tzinfo=_UTC)
+    return moment.timestamp()
+
+
+def parse_timestamps(values: Sequence[Any]) -> array.array:
+    """Колонка меток времени -> array('d') секунд от эпохи (NaN - пропуск)"""
+    if len(values) >= _VECTORIZED_MIN_VALUES:
+        try:
+            # numpy импортируется при первой большой колонке
+            from app.core import vectorized_timestamps
+        except ImportError:
+            pass
+        else:
+            return vectorized_timestamps.parse_timestamps(values)
+    return array.array("d", map(parse_timestamp, values))
+
+
+def format_timestamp(moment: datetime) -> str:
+    """Момент времени для фильтров PostgREST: UTC с суффиксом Z (без '+' в URL)"""
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+@lru_cache(maxsize=64)
+def get_timezone(name: str) -> tzinfo:
+    """Часовой пояс IANA по имени (UTC, если имя неизвестно)"""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning("Неизвестный часовой пояс %r, используется UTC", name)
+        return timezone.utc
+
+
+def resolve_granularity(granularity: str, days: int) -> str:
+    """
+    Гранулярность точек графика; auto выбирается по длине периода:
+    до 2 дней - часы, до 92 дней - дни, до 183 дней - недели, дальше - месяцы
+    """
+    if granularity != AUTO:
+        return granularity
+    if days <= 2:
+        return HOUR
+    if days <= 92:
+        return DAY
+    if days <= 183:
+        return WEEK
+    return MONTH
+
+
+class TimeGrid:
+    """
+    Интервалы окна из days календарных дней в часовом поясе бота
+
+    Строка относится к мелкому интервалу (час или день) один раз; дни, недели
+    и месяцы получаются группировкой мелких интервалов (groups) без повторного
+    прохода по строкам. boundaries - секунды от эпохи начала каждого интервала
+    и конца последнего, вычисляются один раз при создании.
+    """
+
+    __slots__ = ("tz", "first_day", "days", "hourly", "day_starts", "boundaries", "_step", "_uniform")
+
+    def __init__(self, first_day: date, days: int, tz: tzinfo, hourly: bool = False):
+        self.tz = tz
+        self.first_day = first_day
+        self.days = days
+        self.hourly = hourly
+        self.day_starts = array.array("d", [
+            datetime.combine(first_day + timedelta(days=i), time(), tz).timestamp()
+            for i in range(days + 1)
+        ])
+        self._step = SECONDS_PER_HOUR if hourly else SECONDS_PER_DAY
+        if hourly:
+            # Часы каждого дня (23 или 25 в дни перехода на летнее время)
+            self.boundaries = array.array("d")
+            for start, end in zip(self.day_starts, self.day_starts[1:]):
+                self.boundaries.extend(range(int(start), int(end), SECONDS_PER_HOUR))
+            self.boundaries.append(self.day_starts[-1])
+        else:
+            self.boundaries = self.day_starts
+        # Без перехода на летнее время в окне интервал определяется делением
+        self._uniform = all(
+            end - start == self._step for start, end in zip(self.boundaries, self.boundaries[1:])
+        )
+
+    @classmethod
+    def ending_today(cls, days: int, tz: tzinfo, now: Optional[datetime] = None,
+                     hourly: bool = False) -> "TimeGrid":
+        """Окно из days дней, последний из которых - сегодня в часовом поясе tz"""
+        today = (now or datetime.now(timezone.utc)).astimezone(tz).date()
+        return cls(today - timedelta(days=days - 1), days, tz, hourly)
+
+    @property
+    def buckets(self) -> int:
+        """Количество мелких интервалов"""
+        return len(self.boundaries) - 1
+
+    @property
+    def start(self) -> datetime:
+        """Начало первого дня окна (UTC)"""
+        return datetime.fromtimestamp(self.day_starts[0], tz=timezone.utc)
+
+    @property
+    def today_start(self) -> datetime:
+        """Начало последнего дня окна (UTC)"""
+        return datetime.fromtimestamp(self.day_starts[-2], tz=timezone.utc)
+
+    def index(self, seconds: float) -> int:
+        """Номер мелкого интервала для секунд от эпохи; -1 вне окна и для NaN"""
+        if not self.boundaries[0] <= seconds < self.boundaries[-1]:
+            return -1
+        if self._uniform:
+            return int((seconds - self.boundaries[0]) // self._step)
+        return bisect_right(self.boundaries, seconds) - 1
+
+    def labels(self) -> List[str]:
+        """Начало каждого мелкого интервала по местному времени без смещения (для фронтенда)"""
+        return [
+            datetime.fromtimestamp(boundary, self.tz).replace(tzinfo=None).isoformat()
+            for boundary in self.boundaries[:-1]
+        ]
+
+    def groups(self, granularity: str) -> Tuple[List[int], List[str]]:
+        """
+        Группировка мелких интервалов по гранулярности
+
+        Returns:
+            (номер группы для каждого мелкого интервала, метки групп - начало
+            первого интервала группы в окне)
+        """
+        labels = self.labels()
+        if granularity == HOUR or (granularity == DAY and not self.hourly):
+            return list(range(len(labels))), labels
+
+        group_of: List[int] = []
+        group_labels: List[str] = []
+        previous_key = None
+        for label in labels:
+            day = date.fromisoformat(label[:10])
+            if granularity == DAY:
+                key = day
+            elif granularity == WEEK:
+                key = day - timedelta(days=day.weekday())
+            else:
+                key = (day.year, day.month)
+            if key != previous_key:
+                group_labels.append(label)
+                previous_key = key
+            group_of.append(len(group_labels) - 1)
+        return group_of, group_labels
+
+    def __repr__(self) -> str:
+        step = "hour" if self.hourly else "day"
+        return f"TimeGrid({self.first_day.isoformat()}, days={self.days}, step={step}, tz={self.tz})"
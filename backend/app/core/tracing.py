@@ -0,0 +1,320 @@
+"""
+Легковесная трассировка запросов: spans с parent/child связями, tail-based
+сэмплирование и экспорт в формате OTLP/JSON (файл или локальный коллектор)
+"""
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from fastapi.routing import APIRoute
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "dashboard-backend"
+
+
+class Span:
+    """Один интервал трассы"""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, exc: Optional[BaseException] = None) -> None:
+        self.error = True
+        self.trace.has_error = True
+        if exc is not None:
+            self.attributes["exception.type"] = type(exc).__name__
+            self.attributes["exception.message"] = str(exc)
+
+    def end(self) -> None:
+        self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1_000_000
+
+
+class Trace:
+    """Все spans одного запроса (разделяется дочерними задачами asyncio)"""
+
+    __slots__ = ("trace_id", "spans", "has_error")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List[Span] = []
+        self.has_error = False
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def _trace_id_from_request_id(request_id: Optional[str]) -> str:
+    """Использует X-Request-ID (UUID) как trace_id, чтобы трассы находились по request id"""
+    if request_id:
+        try:
+            return uuid.UUID(request_id).hex
+        except ValueError:
+            pass
+    return os.urandom(16).hex()
+
+
+def get_current_span() -> Optional[Span]:
+    """Возвращает активный span текущего контекста"""
+    return _current_span.get()
+
+
+@contextmanager
+def start_span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Открывает дочерний span активного span (вне трассы ничего не делает)
+
+    Usage:
+        with start_span("db.select sales_users", **{"db.sql.table": "sales_users"}) as span:
+            ...
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    span = Span(parent.trace, name, parent.span_id, attributes)
+    parent.trace.spans.append(span)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as exc:
+        span.set_error(exc)
+        raise
+    finally:
+        span.end()
+        _current_span.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, request_id: Optional[str] = None, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Открывает корневой span запроса; по завершении трасса проходит tail-based
+    сэмплирование и отправляется в экспортер
+    """
+    if not settings.ENABLE_TRACING:
+        yield None
+        return
+
+    trace = Trace(_trace_id_from_request_id(request_id))
+    if request_id:
+        attributes["request.id"] = request_id
+    root = Span(trace, name, None, attributes)
+    trace.spans.append(root)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as exc:
+        root.set_error(exc)
+        raise
+    finally:
+        root.end()
+        _current_span.reset(token)
+        if _should_keep(trace, root):
+            get_exporter().export(trace)
+
+
+def _should_keep(trace: Trace, root: Span) -> bool:
+    """Tail-based сэмплирование: всегда сохраняем медленные и ошибочные трассы"""
+    if trace.has_error:
+        return True
+    if root.duration_ms >= settings.TRACE_SLOW_THRESHOLD_MS:
+        return True
+    return random.random() < settings.TRACE_SAMPLE_RATE
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _span_to_otlp(span: Span) -> Dict[str, Any]:
+    otlp_span = {
+        "traceId": span.trace.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 2 if span.parent_id is None else 1,  # SERVER для корня, INTERNAL для остальных
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns or span.start_ns),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+        "status": {"code": 2 if span.error else 1},
+    }
+    if span.parent_id:
+        otlp_span["parentSpanId"] = span.parent_id
+    return otlp_span
+
+
+def traces_to_otlp(traces: List[Trace]) -> Dict[str, Any]:
+    """Формирует ExportTraceServiceRequest в OTLP/JSON"""
+    return {
+        "resourceSpans": [{
+            "resource": {
+                "attributes": [
+                    {"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+                    {"key": "deployment.environment", "value": {"stringValue": settings.ENVIRONMENT}},
+                ]
+            },
+            "scopeSpans": [{
+                "scope": {"name": "app.core.tracing"},
+                "spans": [_span_to_otlp(span) for trace in traces for span in trace.spans],
+            }],
+        }]
+    }
+
+
+class SpanExporter:
+    """
+    Фоновый экспортер трасс: накапливает трассы в очереди и пачками пишет
+    их в файл (OTLP/JSON построчно) или отправляет в коллектор по HTTP
+    """
+
+    def __init__(self, endpoint: Optional[str], file_path: Path, batch_size: int = 64, flush_interval: float = 2.0):
+        self.endpoint = endpoint
+        self.file_path = file_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[Trace]]" = queue.Queue(maxsize=10000)
+        self._dropped = 0
+        self._exported = 0
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self._dropped += 1
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Дожидается отправки всех накопленных трасс"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Trace] = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+                self._exported += len(batch)
+            except Exception as e:
+                logger.warning(f"Не удалось экспортировать {len(batch)} трасс: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch: List[Trace]) -> None:
+        payload = traces_to_otlp(batch)
+        if self.endpoint:
+            import httpx
+            httpx.post(self.endpoint, json=payload, timeout=5.0).raise_for_status()
+        else:
+            with open(self.file_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "exported": self._exported,
+            "dropped": self._dropped,
+            "destination": self.endpoint or str(self.file_path)
+        }
+
+
+_exporter: Optional[SpanExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter() -> SpanExporter:
+    """Получает или создает глобальный экспортер трасс"""
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = SpanExporter(
+                    endpoint=settings.TRACE_EXPORT_ENDPOINT,
+                    file_path=Path(settings.LOG_DIR) / "traces.jsonl"
+                )
+    return _exporter
+
+
+def flush_traces(timeout: float = 5.0) -> None:
+    """Отправляет накопленные трассы (используется при завершении работы)"""
+    if _exporter is not None:
+        _exporter.flush(timeout)
+
+
+class TracedAPIRoute(APIRoute):
+    """APIRoute, оборачивающий обработку endpoint (зависимости, вызов, сериализацию) в span"""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        span_name = f"endpoint {self.path}"
+        route_path = self.path
+
+        async def traced_handler(request):
+            with start_span(span_name, **{"http.route": route_path}):
+                return await handler(request)
+
+        return traced_handler
+
+
+class TracedMiddleware:
+    """
+    ASGI обертка middleware: span на время ее работы
+
+    Обертки вложены так же, как middleware, поэтому span каждой middleware -
+    дочерний span предыдущей, а ее собственное время - разница с дочерним span.
+    """
+
+    def __init__(self, app, wrapped: type, **options: Any):
+        self.app = wrapped(app, **options)
+        self.span_name = f"middleware {wrapped.__name__}"
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with start_span(self.span_name):
+            await self.app(scope, receive, send)
@@ -0,0 +1,157 @@
+"""
+Векторный (NumPy) разбор колонки меток времени PostgREST
+
+Строки переводятся в матрицу байтов (S32) и группируются по длине и виду
+смещения: внутри группы позиции полей фиксированы, поэтому цифры, разделители
+и диапазоны проверяются и переводятся в секунды целочисленной арифметикой над
+целыми строками матрицы. Строки, не прошедшие проверку (другие варианты ISO 8601, ошибки),
+разбираются построчно app.core.timestamps.parse_timestamp.
+"""
+import array
+from typing import Any, Sequence
+
+import numpy as np
+
+from app.core.timestamps import SECONDS_PER_DAY, TimeGrid, parse_timestamp
+
+# Максимальная длина фиксированного формата: 2024-01-01T00:00:00.000000+00:00
+_MAX_LENGTH = 32
+_DATE_TIME_LENGTH = 19
+_ZERO = ord("0")
+# Дней в месяце невисокосного года (индекс - номер месяца)
+_MONTH_DAYS = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=np.int64)
+
+
+def _number(digits, start: int, end: int):
+    """Число из цифр строк digits[start:end] (int64)"""
+    number = digits[start].astype(np.int64)
+    for position in range(start + 1, end):
+        number = number * 10 + digits[position]
+    return number
+
+
+def _is(digits, position: int, symbol: str):
+    """Маска значений с символом symbol в позиции position"""
+    return digits[position] == (ord(symbol) - _ZERO) % 256
+
+
+def _days_from_civil(year, month, day):
+    """Номер дня от 1970-01-01 для даты пролептического григорианского календаря"""
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def _parse_group(digits, length: int, utc_suffix: bool):
+    """
+    Разбор группы значений одинаковой длины и вида смещения
+
+    Args:
+        digits: Байты значений минус '0' (uint8 с переполнением), строка - позиция символа
+        length: Длина значений группы
+        utc_suffix: Значения оканчиваются на Z
+
+    Returns:
+        (секунды, маска значений фиксированного формата)
+    """
+    count = digits.shape[1]
+    offset_start = length - 1 if utc_suffix else length - 6
+    fraction_digits = offset_start - _DATE_TIME_LENGTH - 1
+    if offset_start > _DATE_TIME_LENGTH and not 1 <= fraction_digits <= 6:
+        # Дробная часть: от 1 до 6 цифр после точки
+        return np.full(count, np.nan), np.zeros(count, dtype=bool)
+
+    # Цифры после вычитания '0' не больше 9, остальные байты - больше
+    digit_positions = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+    if offset_start > _DATE_TIME_LENGTH:
+        digit_positions += range(_DATE_TIME_LENGTH + 1, offset_start)
+    if not utc_suffix:
+        digit_positions += [offset_start + 1, offset_start + 2, offset_start + 4, offset_start + 5]
+    valid = digits[digit_positions].max(axis=0) <= 9
+
+    valid &= _is(digits, 4, "-") & _is(digits, 7, "-") & _is(digits, 13, ":") & _is(digits, 16, ":")
+    valid &= _is(digits, 10, "T") | _is(digits, 10, " ")
+    if offset_start > _DATE_TIME_LENGTH:
+        valid &= _is(digits, _DATE_TIME_LENGTH, ".")
+
+    year = _number(digits, 0, 4)
+    month = _number(digits, 5, 7)
+    day = _number(digits, 8, 10)
+    hour = _number(digits, 11, 13)
+    minute = _number(digits, 14, 16)
+    second = _number(digits, 17, 19)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_days = _MONTH_DAYS[np.clip(month, 1, 12)] + (leap & (month == 2))
+    valid &= (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days)
+    valid &= (hour < 24) & (minute < 60) & (second < 60)
+
+    microseconds = 0
+    if offset_start > _DATE_TIME_LENGTH:
+        microseconds = _number(digits, _DATE_TIME_LENGTH + 1, offset_start) * 10 ** (6 - fraction_digits)
+
+    offset_seconds = 0
+    if not utc_suffix:
+        negative = _is(digits, offset_start, "-")
+        offset_hours = _number(digits, offset_start + 1, offset_start + 3)
+        offset_minutes = _number(digits, offset_start + 4, offset_start + 6)
+        valid &= (negative | _is(digits, offset_start, "+")) & _is(digits, offset_start + 3, ":")
+        valid &= (offset_hours < 24) & (offset_minutes < 60)
+        offset_seconds = np.where(negative, -1, 1) * (offset_hours * 3600 + offset_minutes * 60)
+
+    seconds = (
+        _days_from_civil(year, month, day) * SECONDS_PER_DAY
+        + hour * 3600 + minute * 60 + second - offset_seconds
+    )
+    # Как datetime.timestamp(): целые микросекунды / 10**6
+    return (seconds * 1_000_000 + microseconds) / 1e6, valid
+
+
+def grid_indices(seconds, grid: TimeGrid):
+    """Номера мелких интервалов TimeGrid для массива секунд от эпохи; -1 вне окна и для NaN"""
+    boundaries = np.frombuffer(grid.boundaries, dtype=np.float64)
+    # NaN сортируется в конец: индекс buckets, как и для моментов после окна
+    index = np.searchsorted(boundaries, seconds, side="right") - 1
+    index[index >= grid.buckets] = -1
+    return index
+
+
+def parse_timestamps(values: Sequence[Any]) -> array.array:
+    """Колонка меток времени -> array('d') секунд от эпохи (NaN - пропуск)"""
+    texts = values
+    try:
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    except TypeError:
+        # Пропуски (None) и не строки заменяются пустой строкой
+        texts = [value if type(value) is str else "" for value in values]
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    try:
+        raw = np.array(texts, dtype=f"S{_MAX_LENGTH}")
+    except UnicodeEncodeError:
+        return array.array("d", map(parse_timestamp, values))
+    # Матрица позиция x значение: поля значений лежат в памяти подряд
+    digits = np.subtract(raw.view(np.uint8).reshape(len(texts), _MAX_LENGTH).T, np.uint8(_ZERO), order="C")
+
+    result = np.full(len(texts), np.nan)
+    parsed = lengths == 0  # пустые строки и не строки - пропуски, как в parse_timestamp
+    last = digits[np.clip(lengths - 1, 0, _MAX_LENGTH - 1), np.arange(len(texts))]
+    utc_suffix = last == ord("Z") - _ZERO
+    candidates = (lengths > _DATE_TIME_LENGTH) & (lengths <= _MAX_LENGTH)
+    for length in np.unique(lengths[candidates]).tolist():
+        for suffix in (True, False):
+            if length - (1 if suffix else 6) < _DATE_TIME_LENGTH:
+                continue
+            rows = np.flatnonzero((lengths == length) & (utc_suffix == suffix))
+            if not len(rows):
+                continue
+            group = digits if len(rows) == len(texts) else digits[:, rows]
+            seconds, valid = _parse_group(group, length, suffix)
+            result[rows[valid]] = seconds[valid]
+            parsed[rows[valid]] = True
+
+    # Прочие варианты ISO 8601 и некорректные значения - построчно
+    for index in np.flatnonzero(~parsed).tolist():
+        result[index] = parse_timestamp(values[index])
+    return array.array("d", result.tobytes())
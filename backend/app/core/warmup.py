@@ -0,0 +1,226 @@
+"""
+Прогрев после запуска: DNS, соединения пула Supabase и дашборды самых
+запрашиваемых ботов (по сохраняемой статистике обращений)
+
+Пока прогрев не завершен (или не истек WARMUP_TIMEOUT_SECONDS), сервис
+не сообщает о готовности.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DASHBOARD_DAYS = 7
+
+
+class BotAccessTracker:
+    """
+    Частота обращений к ботам (и выбранных периодов), сохраняемая между перезапусками
+
+    При загрузке счетчики уменьшаются вдвое, чтобы давно неактивные боты
+    постепенно уходили из списка прогрева.
+    """
+
+    def __init__(self, path: Path, max_bots: int = 1000):
+        self.path = path
+        self.max_bots = max_bots
+        # bot_id -> {"count": int, "days": {days: count}}
+        self._counts: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+
+    def record(self, bot_id: str, days: Optional[int] = None) -> None:
+        """Учитывает обращение к боту"""
+        entry = self._counts.get(bot_id)
+        if entry is None:
+            if len(self._counts) >= self.max_bots:
+                return
+            entry = self._counts[bot_id] = {"count": 0, "days": {}}
+        entry["count"] += 1
+        if days is not None:
+            key = str(days)
+            entry["days"][key] = entry["days"].get(key, 0) + 1
+        self._dirty = True
+
+    def top(self, limit: int) -> List[Tuple[str, int]]:
+        """Самые запрашиваемые боты с наиболее частым периодом"""
+        ranked = sorted(self._counts.items(), key=lambda item: item[1]["count"], reverse=True)[:limit]
+        result = []
+        for bot_id, entry in ranked:
+            days = max(entry["days"].items(), key=lambda item: item[1])[0] if entry["days"] else DEFAULT_DASHBOARD_DAYS
+            result.append((bot_id, int(days)))
+        return result
+
+    def load(self) -> None:
+        """Загружает статистику из файла (с затуханием)"""
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать статистику обращений {self.path}: {e}")
+            return
+        for bot_id, entry in data.get("bots", {}).items():
+            count = int(entry.get("count", 0)) // 2
+            if count > 0:
+                self._counts[bot_id] = {
+                    "count": count,
+                    "days": {days: max(1, int(n) // 2) for days, n in entry.get("days", {}).items()}
+                }
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        """
+        Копия счетчиков для записи (None, если статистика не изменилась)
+
+        Вызывается в event loop, где работает record(): запись файла в потоке
+        использует копию, а обращения после снимка попадут в следующее сохранение.
+        """
+        if not self._dirty:
+            return None
+        self._dirty = False
+        return {bot_id: {"count": entry["count"], "days": dict(entry["days"])} for bot_id, entry in self._counts.items()}
+
+    def write(self, counts: Dict[str, Any]) -> None:
+        """Атомарно записывает снимок счетчиков в файл (можно вызывать из потока)"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps({"saved_at": time.time(), "bots": counts}), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            # Снимок не записан: повторим при следующем сохранении
+            self._dirty = True
+            logger.warning(f"Не удалось сохранить статистику обращений {self.path}: {e}")
+
+    def save(self) -> None:
+        """Сохраняет статистику синхронно (если она изменилась)"""
+        counts = self.snapshot()
+        if counts is not None:
+            self.write(counts)
+
+
+class WarmupState:
+    """Состояние прогрева для проверки готовности"""
+
+    def __init__(self):
+        self.status = "pending"  # pending, running, completed, timed_out, failed, disabled
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.steps: Dict[str, Any] = {}
+
+    @property
+    def is_done(self) -> bool:
+        return self.status in ("completed", "timed_out", "failed", "disabled")
+
+    def to_dict(self) -> Dict[str, Any]:
+        duration = None
+        if self.started_at is not None:
+            duration = round((self.finished_at or time.monotonic()) - self.started_at, 3)
+        return {"status": self.status, "duration_seconds": duration, "steps": self.steps}
+
+
+_access_tracker = BotAccessTracker(
+    Path(settings.WARMUP_ACCESS_FILE) if settings.WARMUP_ACCESS_FILE
+    else Path(settings.LOG_DIR) / "bot_access.json"
+)
+_warmup_state = WarmupState()
+
+
+def get_access_tracker() -> BotAccessTracker:
+    """Возвращает глобальную статистику обращений к ботам"""
+    return _access_tracker
+
+
+def get_warmup_state() -> WarmupState:
+    """Возвращает состояние прогрева"""
+    return _warmup_state
+
+
+def is_warmed_up() -> bool:
+    """Завершен ли прогрев (успешно или по таймауту)"""
+    return _warmup_state.is_done
+
+
+async def _resolve_dns() -> int:
+    """Заранее разрешает адрес Supabase"""
+    parts = urlsplit(settings.SUPABASE_URL)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    addresses = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port)
+    return len(addresses)
+
+
+async def _warm_connections() -> int:
+    from app.database.supabase_client import warm_up_connection_pool
+    return await warm_up_connection_pool(settings.WARMUP_CONNECTIONS)
+
+
+async def _warm_dashboards() -> List[str]:
+    """Вычисляет дашборды самых запрашиваемых ботов (заполняет кеш ответов и пул клиентов)"""
+    from app.api.analytics import get_dashboard_analytics
+
+    warmed = []
+    for bot_id, days in _access_tracker.top(settings.WARMUP_TOP_BOTS):
+        try:
+            await get_dashboard_analytics(bot_id=bot_id, days=days, granularity="day", current_user_id=0)
+            warmed.append(f"{bot_id}:{days}")
+        except Exception as e:
+            logger.warning(f"Не удалось прогреть дашборд бота {bot_id}: {e}")
+    return warmed
+
+
+async def _run_steps() -> None:
+    for name, step in (("dns", _resolve_dns), ("connections", _warm_connections), ("dashboards", _warm_dashboards)):
+        step_start = time.perf_counter()
+        try:
+            result = await step()
+            _warmup_state.steps[name] = {"ok": True, "result": result}
+        except Exception as e:
+            _warmup_state.steps[name] = {"ok": False, "error": str(e)}
+            logger.warning(f"Шаг прогрева {name} не выполнен: {e}")
+        _warmup_state.steps[name]["duration_ms"] = round((time.perf_counter() - step_start) * 1000, 1)
+
+
+async def run_warmup() -> None:
+    """Выполняет прогрев с ограничением по времени WARMUP_TIMEOUT_SECONDS"""
+    _access_tracker.load()
+    if not settings.ENABLE_WARMUP:
+        _warmup_state.status = "disabled"
+        return
+
+    _warmup_state.status = "running"
+    _warmup_state.started_at = time.monotonic()
+    try:
+        await asyncio.wait_for(_run_steps(), timeout=settings.WARMUP_TIMEOUT_SECONDS)
+        _warmup_state.status = "completed"
+    except asyncio.TimeoutError:
+        _warmup_state.status = "timed_out"
+        logger.warning(f"Прогрев не уложился в {settings.WARMUP_TIMEOUT_SECONDS} с, сервис помечен готовым")
+    except Exception as e:
+        _warmup_state.status = "failed"
+        logger.error(f"Ошибка прогрева: {e}")
+    finally:
+        _warmup_state.finished_at = time.monotonic()
+
+    logger.info(
+        f"Прогрев завершен: {_warmup_state.status} за {_warmup_state.finished_at - _warmup_state.started_at:.2f} с",
+        extra={"warmup_steps": _warmup_state.steps}
+    )
+
+
+async def persist_access_stats_periodically(interval: float) -> None:
+    """Периодически сохраняет статистику обращений"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            counts = _access_tracker.snapshot()
+            if counts is not None:
+                await asyncio.to_thread(_access_tracker.write, counts)
+        except Exception as e:
+            logger.warning(f"Ошибка сохранения статистики обращений: {e}")
@@ -0,0 +1,288 @@
+"""
+Компактное колоночное представление строк Supabase
+
+PostgREST возвращает список dict с повторяющимися ключами, строковыми
+этапами/bot_id и метками времени в виде строк. ColumnarTable хранит те же
+данные колонками:
+- целые id - array('q'), пропуск - INT_NULL
+- метки времени - array('d') секунд от эпохи (UTC), пропуск - NaN
+  (разбор app.core.timestamps)
+- категории (этап, роль, bot_id) - array('i') кодов и словарь значений, пропуск - -1
+- прочие значения - список
+
+Доступ по строкам - через RowView с __slots__ (row['user_id'], row.get(...)).
+
+Таблицы не изменяются после построения: slice, take, sort_by и concat
+возвращают новые таблицы, поэтому их можно читать из пула агрегации, пока
+набор строк бота обновляется (app.database.incremental). with_values заменяет
+значения одной колонки в копии, разделяя остальные колонки.
+"""
+import array
+import math
+import operator
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from app.core.timestamps import parse_timestamps
+
+INT = "int"
+TIMESTAMP = "timestamp"
+CATEGORY = "category"
+OBJECT = "object"
+
+# Пропуск в целочисленной колонке (telegram_id и id сессий всегда больше)
+INT_NULL = -(2 ** 63)
+
+# Типы известных колонок таблиц; неизвестные колонки хранятся списком
+TABLE_SCHEMAS: Dict[str, Dict[str, str]] = {
+    "sales_users": {
+        "telegram_id": INT,
+        "created_at": TIMESTAMP,
+        "updated_at": TIMESTAMP,
+        "bot_id": CATEGORY,
+        "language_code": CATEGORY,
+    },
+    "sales_chat_sessions": {
+        "id": INT,
+        "user_id": INT,
+        "created_at": TIMESTAMP,
+        "current_stage": CATEGORY,
+        "bot_id": CATEGORY,
+    },
+    "sales_messages": {
+        "session_id": INT,
+        "created_at": TIMESTAMP,
+        "role": CATEGORY,
+    },
+}
+
+Column = Union[array.array, List[Any]]
+
+
+def _int_column(values: List[Any]) -> Column:
+    """array('q') или список, если встречаются не целые значения (например, uuid)"""
+    try:
+        return array.array("q", [INT_NULL if value is None else value for value in values])
+    except (TypeError, OverflowError):
+        return values
+
+
+def _category_column(values: List[Any]):
+    """Коды array('i') и словарь значений"""
+    codes_by_value: Dict[Any, int] = {}
+    codes = array.array("i", [
+        -1 if value is None else codes_by_value.setdefault(value, len(codes_by_value))
+        for value in values
+    ])
+    return codes, list(codes_by_value)
+
+
+class RowView:
+    """Строка ColumnarTable без копирования значений"""
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: "ColumnarTable", index: int):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._table._columns:
+            raise KeyError(key)
+        return self._table.value(key, self._index)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self._table._columns:
+            return default
+        return self._table.value(key, self._index)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: self._table.value(name, self._index) for name in self._table.column_names}
+
+    def __repr__(self) -> str:
+        return f"RowView({self.to_dict()!r})"
+
+
+class ColumnarTable:
+    """Колоночная таблица строк одной таблицы Supabase"""
+
+    __slots__ = ("name", "length", "_columns", "_kinds", "_categories")
+
+    def __init__(self, name: str, length: int):
+        self.name = name
+        self.length = length
+        self._columns: Dict[str, Column] = {}
+        self._kinds: Dict[str, str] = {}
+        self._categories: Dict[str, List[Any]] = {}
+
+    @classmethod
+    def from_rows(cls, name: str, rows: Sequence[Dict[str, Any]],
+                  columns: Optional[Iterable[str]] = None) -> "ColumnarTable":
+        """
+        Строит таблицу из строк PostgREST
+
+        Args:
+            name: Имя таблицы (определяет типы колонок по TABLE_SCHEMAS)
+            rows: Строки ответа
+            columns: Колонки (по умолчанию - ключи первой строки)
+        """
+        if columns is None:
+            columns = list(rows[0]) if rows else []
+        schema = TABLE_SCHEMAS.get(name, {})
+        table = cls(name, len(rows))
+        for column in columns:
+            values = [row.get(column) for row in rows]
+            kind = schema.get(column, OBJECT)
+            if kind == INT:
+                data = _int_column(values)
+                if isinstance(data, list):
+                    kind = OBJECT
+            elif kind == TIMESTAMP:
+                data = parse_timestamps(values)
+            elif kind == CATEGORY:
+                data, table._categories[column] = _category_column(values)
+            else:
+                data = [sys.intern(value) if type(value) is str and len(value) <= 64 else value for value in values]
+            table._columns[column] = data
+            table._kinds[column] = kind
+        return table
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self._columns)
+
+    def kind(self, name: str) -> str:
+        return self._kinds[name]
+
+    def column(self, name: str) -> Column:
+        """Хранимая колонка (для категорий - коды)"""
+        return self._columns[name]
+
+    def categories(self, name: str) -> List[Any]:
+        """Словарь значений категориальной колонки (индекс = код)"""
+        return self._categories[name]
+
+    def value(self, name: str, index: int) -> Any:
+        """Значение колонки в исходном виде (метки времени - datetime UTC)"""
+        data = self._columns[name]
+        kind = self._kinds[name]
+        value = data[index]
+        if kind == INT:
+            return None if value == INT_NULL else value
+        if kind == TIMESTAMP:
+            return None if math.isnan(value) else datetime.fromtimestamp(value, tz=timezone.utc)
+        if kind == CATEGORY:
+            return None if value < 0 else self._categories[name][value]
+        return value
+
+    def values(self, name: str) -> List[Any]:
+        """Колонка списком значений в исходном виде"""
+        return [self.value(name, index) for index in range(self.length)]
+
+    def take(self, indices: Sequence[int]) -> "ColumnarTable":
+        """Новая таблица из строк с указанными индексами"""
+        table = ColumnarTable(self.name, len(indices))
+        for name, data in self._columns.items():
+            taken = [data[index] for index in indices]
+            table._columns[name] = array.array(data.typecode, taken) if isinstance(data, array.array) else taken
+        table._kinds = dict(self._kinds)
+        table._categories = dict(self._categories)
+        return table
+
+    def slice(self, start: int, stop: Optional[int] = None) -> "ColumnarTable":
+        """Новая таблица из строк start:stop"""
+        stop = self.length if stop is None else min(stop, self.length)
+        start = min(start, stop)
+        table = ColumnarTable(self.name, stop - start)
+        table._columns = {name: data[start:stop] for name, data in self._columns.items()}
+        table._kinds = dict(self._kinds)
+        table._categories = dict(self._categories)
+        return table
+
+    def with_values(self, name: str, updates: Dict[int, Any]) -> "ColumnarTable":
+        """
+        Новая таблица, в которой значения колонки name заменены в указанных строках
+
+        Args:
+            name: Колонка (остальные колонки разделяются с self)
+            updates: Индекс строки -> значение в исходном виде
+        """
+        table = ColumnarTable(self.name, self.length)
+        table._columns = dict(self._columns)
+        table._kinds = dict(self._kinds)
+        table._categories = dict(self._categories)
+        data = self._columns[name]
+        kind = self._kinds[name]
+        if kind == CATEGORY:
+            codes_by_value = {value: code for code, value in enumerate(self._categories[name])}
+            stored = {index: -1 if value is None else codes_by_value.setdefault(value, len(codes_by_value))
+                      for index, value in updates.items()}
+            table._categories[name] = list(codes_by_value)
+        elif kind == INT:
+            stored = {index: INT_NULL if value is None else value for index, value in updates.items()}
+        elif kind == TIMESTAMP:
+            stored = {index: math.nan if value is None else value.timestamp() for index, value in updates.items()}
+        else:
+            stored = updates
+        replaced = array.array(data.typecode, data) if isinstance(data, array.array) else list(data)
+        for index, value in stored.items():
+            replaced[index] = value
+        table._columns[name] = replaced
+        return table
+
+    def sort_by(self, name: str) -> "ColumnarTable":
+        """Таблица, упорядоченная по возрастанию колонки (NaN - в начале); self, если уже упорядочена"""
+        keys = [-math.inf if value != value else value for value in self._columns[name]]
+        if all(map(operator.le, keys, keys[1:])):
+            return self
+        return self.take(sorted(range(self.length), key=keys.__getitem__))
+
+    def concat(self, other: "ColumnarTable") -> "ColumnarTable":
+        """Новая таблица из строк self и other (колонки self; словари категорий объединяются)"""
+        table = ColumnarTable(self.name, self.length + other.length)
+        for name, data in self._columns.items():
+            kind = self._kinds[name]
+            other_data = other._columns[name]
+            if kind == CATEGORY and other._kinds[name] == CATEGORY:
+                # Коды other переводятся в коды объединенного словаря
+                codes_by_value = {value: code for code, value in enumerate(self._categories[name])}
+                remap = [codes_by_value.setdefault(value, len(codes_by_value)) for value in other._categories[name]]
+                merged = array.array("i", data)
+                merged.extend([-1 if code < 0 else remap[code] for code in other_data])
+                table._categories[name] = list(codes_by_value)
+            elif kind == other._kinds[name] and isinstance(data, array.array):
+                merged = array.array(data.typecode, data)
+                merged.extend(other_data)
+            else:
+                # Разное представление колонки (например, id не целые) - список значений
+                merged = self.values(name) + other.values(name)
+                kind = OBJECT
+            table._columns[name] = merged
+            table._kinds[name] = kind
+        return table
+
+    def nbytes(self) -> int:
+        """Приблизительный объем данных колонок в байтах"""
+        total = 0
+        for data in self._columns.values():
+            if isinstance(data, array.array):
+                total += data.itemsize * len(data)
+            else:
+                total += sys.getsizeof(data) + sum(sys.getsizeof(value) for value in data)
+        return total
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index: int) -> RowView:
+        if not -self.length <= index < self.length:
+            raise IndexError(index)
+        return RowView(self, index % self.length if self.length else index)
+
+    def __iter__(self) -> Iterator[RowView]:
+        for index in range(self.length):
+            yield RowView(self, index)
+
+    def __repr__(self) -> str:
+        return f"ColumnarTable({self.name!r}, rows={self.length}, columns={self.column_names})"
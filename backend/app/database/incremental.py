@@ -0,0 +1,432 @@
+"""
+Строки ботов в памяти процесса с догрузкой новых строк по created_at
+
+Фронтенд обновляет дашборд каждые ~30 секунд, и каждый промах кеша ответов
+перечитывал из sales_users и sales_chat_sessions все окно заново. BotDataset
+хранит строки бота колоночными таблицами (app.database.columnar),
+упорядоченными по created_at, и watermark - максимальный created_at
+загруженных строк. Обновление запрашивает только строки с
+created_at >= watermark - INCREMENTAL_OVERLAP_SECONDS: перекрытие покрывает
+строки, записанные с задержкой, повторно пришедшие строки заменяются по
+первичному ключу. Сессии старше окна (максимального запрошенного периода)
+вытесняются. Метрики, воронка и рост любого окна считаются по дневным
+агрегатам набора (app.services.daily_aggregates), почасовой рост - по срезам.
+
+Изменения уже загруженных строк не имеют нового created_at. Раз в
+INCREMENTAL_CHECK_SECONDS набор сверяется с базой дешевыми запросами:
+- этапы сессий запрошенного периода (только id и current_stage): измененные
+  этапы заменяются, удаленные сессии убираются; более длинный период
+  сверяется при первом запросе
+- количество пользователей до watermark (head-запрос без строк): при
+  расхождении (переименование в Test..., удаление) набор загружается полностью
+Полная перезагрузка раз в INCREMENTAL_FULL_REFRESH_SECONDS - страховка от
+остальных изменений; она же сужает окно до запрошенного периода.
+"""
+import array
+import asyncio
+import logging
+import math
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.executor import get_cpu_executor
+from app.core.memory_profiler import register_structure
+from app.core.metrics import registry
+from app.core.timestamps import NAN, format_timestamp, get_timezone
+from app.database.columnar import ColumnarTable
+from app.services.daily_aggregates import DailyAggregates
+
+if TYPE_CHECKING:
+    from app.database.supabase_client import SupabaseClient
+
+logger = logging.getLogger(__name__)
+
+USER_COLUMNS = ['telegram_id', 'created_at']
+SESSION_COLUMNS = ['id', 'user_id', 'current_stage', 'created_at']
+STAGE_COLUMNS = ['id', 'current_stage']
+
+DATASET_REFRESHES = registry.counter(
+    "incremental_dataset_refreshes_total", "Обновления наборов строк ботов в памяти", ("kind",)
+)
+
+
+def _timestamp_filter(seconds: float) -> str:
+    """Секунды от эпохи -> значение фильтра PostgREST"""
+    return format_timestamp(datetime.fromtimestamp(seconds, tz=timezone.utc))
+
+
+def _last_created(table: ColumnarTable, default: float) -> float:
+    """Максимальный created_at упорядоченной таблицы (default для пустой)"""
+    created = table.column('created_at')
+    if not len(created) or created[-1] != created[-1]:
+        return default
+    return max(created[-1], default) if default == default else created[-1]
+
+
+def _merge(table: ColumnarTable, batch: ColumnarTable, key: str, since: float, lo: int = 0) -> ColumnarTable:
+    """
+    Добавляет к упорядоченной таблице строки batch с created_at >= since
+
+    Строки таблицы из перекрытия (created_at >= since), пришедшие в batch
+    повторно, заменяются новыми значениями.
+
+    Args:
+        table: Таблица, упорядоченная по created_at
+        batch: Новые строки
+        key: Первичный ключ
+        since: Нижняя граница created_at запроса batch
+        lo: Начало строк с created_at (строки без created_at - в начале таблицы)
+    """
+    if not len(batch):
+        return table
+    tail_start = bisect_left(table.column('created_at'), since, lo)
+    tail = table.slice(tail_start)
+    batch_keys = set(batch.column(key))
+    kept = [index for index, value in enumerate(tail.column(key)) if value not in batch_keys]
+    merged_tail = tail.take(kept).concat(batch).sort_by('created_at')
+    return table.slice(0, tail_start).concat(merged_tail)
+
+
+def _reconcile_stages(sessions: ColumnarTable, stages: ColumnarTable, start: int, stop: int):
+    """
+    Сверяет этапы сессий start:stop с ответом базы
+
+    Args:
+        sessions: Сессии, упорядоченные по created_at
+        stages: Актуальные id и current_stage сессий того же диапазона created_at (по created_at)
+        start: Начало сверяемых строк
+        stop: Конец сверяемых строк
+
+    Returns:
+        Таблица с актуальными этапами без удаленных сессий (отсутствующих в stages)
+        и индекс первой измененной строки (None, если изменений нет)
+    """
+    ids = sessions.column('id')
+    codes = sessions.column('current_stage')
+    codes_by_stage = {stage: code for code, stage in enumerate(sessions.categories('current_stage'))}
+    # Коды ответа в кодах таблицы; этапа, которого нет в таблице, - -2 (всегда отличается)
+    remap = [codes_by_stage.get(stage, -2) for stage in stages.categories('current_stage')]
+    fresh = array.array('i', [code if code < 0 else remap[code] for code in stages.column('current_stage')])
+    stage_ids = stages.column('id')
+    updates: Dict[int, Any] = {}
+    deleted = set()
+    if stage_ids == ids[start:stop]:
+        # Обычно те же сессии в том же порядке: сравниваются массивы кодов
+        current = codes[start:stop]
+        if fresh == current:
+            return sessions, None
+        for position, (code, old_code) in enumerate(zip(fresh, current)):
+            if code != old_code:
+                updates[start + position] = stages.value('current_stage', position)
+    else:
+        positions = dict(zip(stage_ids, range(len(stage_ids))))
+        for index in range(start, stop):
+            position = positions.get(ids[index])
+            if position is None:
+                deleted.add(index)
+            elif fresh[position] != codes[index]:
+                updates[index] = stages.value('current_stage', position)
+        if not updates and not deleted:
+            return sessions, None
+    first_changed = min(min(updates, default=stop), min(deleted, default=stop))
+    if updates:
+        sessions = sessions.with_values('current_stage', updates)
+    if deleted:
+        sessions = sessions.take([index for index in range(len(sessions)) if index not in deleted])
+    return sessions, first_changed
+
+
+class BotDataset:
+    """Пользователи и сессии одного бота, упорядоченные по created_at"""
+
+    def __init__(self, bot_id: str):
+        self.bot_id = bot_id
+        # Все пользователи бота (без тестовых): строки без created_at в начале, дальше по возрастанию
+        self.users: Optional[ColumnarTable] = None
+        self.undated_users = 0
+        # Все сессии с created_at >= sessions_start по возрастанию created_at
+        self.sessions: Optional[ColumnarTable] = None
+        self.sessions_start = 0.0
+        # Длина окна сессий - максимальный запрошенный период, секунды
+        self.window_seconds = 0.0
+        self.users_watermark = NAN
+        self.sessions_watermark = NAN
+        # Дневные агрегаты текущих таблиц (None, если ENABLE_DAILY_AGGREGATES выключен)
+        self.daily: Optional[DailyAggregates] = None
+        self.loaded_at = 0.0
+        self.refreshed_at = 0.0
+        # Сверка с базой: время последней и начало сверенных сессий
+        self.checked_at = 0.0
+        self.checked_from = math.inf
+        self._lock = asyncio.Lock()
+
+    def users_since(self, seconds: float) -> ColumnarTable:
+        """Пользователи с created_at >= seconds"""
+        return self.users.slice(bisect_left(self.users.column('created_at'), seconds, self.undated_users))
+
+    def sessions_since(self, seconds: float) -> ColumnarTable:
+        """Сессии с created_at >= seconds (seconds не раньше sessions_start)"""
+        return self.sessions.slice(bisect_left(self.sessions.column('created_at'), seconds))
+
+    async def refresh(self, db: "SupabaseClient", since: float) -> str:
+        """
+        Обновляет набор так, чтобы сессии с created_at >= since были загружены
+
+        Args:
+            db: Инициализированный клиент Supabase
+            since: Начало запрошенного периода, секунды от эпохи
+
+        Returns:
+            str: Вид обновления: full, backfill, incremental, check или fresh (без запросов)
+        """
+        async with self._lock:
+            now = time.time()
+            monotonic = time.monotonic()
+            # Строки с created_at >= dirty_from изменились (-inf - все, inf - ни одна)
+            dirty_from = math.inf
+            full = self.users is None or monotonic - self.loaded_at >= settings.INCREMENTAL_FULL_REFRESH_SECONDS
+            if not full:
+                self.window_seconds = max(self.window_seconds, now - since)
+                kind = "fresh"
+                if since < self.sessions_start:
+                    if self.checked_from <= self.sessions_start:
+                        # Дозагруженные сессии уже актуальны
+                        self.checked_from = since
+                    await self._backfill(db, since)
+                    # Более длинное окно меняет пользователей периода во всех днях
+                    dirty_from = -math.inf
+                    kind = "backfill"
+                if monotonic - self.refreshed_at >= settings.INCREMENTAL_MIN_REFRESH_SECONDS:
+                    dirty_from = min(dirty_from, await self._fetch_new(db))
+                    self.refreshed_at = monotonic
+                    kind = "incremental"
+                # Сверка после догрузки: отсутствующая в ответе загруженная сессия удалена
+                if monotonic - self.checked_at >= settings.INCREMENTAL_CHECK_SECONDS:
+                    changed_from = await self._check(db, since, math.inf)
+                    self.checked_at = monotonic
+                    self.checked_from = since
+                    kind = "check"
+                elif since < self.checked_from:
+                    changed_from = await self._check(db, since, self.checked_from)
+                    self.checked_from = since
+                    kind = "check"
+                else:
+                    changed_from = math.inf
+                if changed_from is None:
+                    full = True
+                else:
+                    dirty_from = min(dirty_from, changed_from)
+                    self._evict(now - self.window_seconds)
+            if full:
+                # Окно сужается до запрошенного периода; более длинные периоды дозагружаются
+                self.window_seconds = now - since
+                await self._load(db, since, now)
+                self.loaded_at = self.refreshed_at = self.checked_at = monotonic
+                self.checked_from = since
+                dirty_from = -math.inf
+                kind = "full"
+            if settings.ENABLE_DAILY_AGGREGATES:
+                await self._update_daily(dirty_from)
+            DATASET_REFRESHES.inc(kind)
+            return kind
+
+    async def _load(self, db: "SupabaseClient", start: float, now: float) -> None:
+        """Полная загрузка: все пользователи бота и сессии с start"""
+        users_query = db.client.table('sales_users').select(*USER_COLUMNS).eq(
+            'bot_id', self.bot_id
+        ).not_.like('first_name', 'Test%').order('created_at', nullsfirst=True)
+        sessions_query = db.client.table('sales_chat_sessions').select(*SESSION_COLUMNS).eq(
+            'bot_id', self.bot_id
+        ).gte('created_at', _timestamp_filter(start)).order('created_at')
+        users, sessions = await asyncio.gather(
+            db.fetch_table(users_query, 'sales_users', USER_COLUMNS),
+            db.fetch_table(sessions_query, 'sales_chat_sessions', SESSION_COLUMNS)
+        )
+        # PostgREST уже упорядочил строки - обычно это только проверка
+        executor = get_cpu_executor()
+        users = await executor.run(users.sort_by, 'created_at', rows=len(users))
+        sessions = await executor.run(sessions.sort_by, 'created_at', rows=len(sessions))
+
+        created = users.column('created_at')
+        self.undated_users = next((index for index, value in enumerate(created) if value == value), len(created))
+        self.users, self.sessions = users, sessions
+        self.sessions_start = start
+        # Пустая таблица: новые строки ищутся с момента загрузки
+        self.users_watermark = _last_created(users, now)
+        self.sessions_watermark = _last_created(sessions, now)
+        logger.debug(
+            "Набор бота %s загружен: %d пользователей, %d сессий", self.bot_id, len(users), len(sessions)
+        )
+
+    async def _fetch_new(self, db: "SupabaseClient") -> float:
+        """
+        Догружает строки, созданные после watermark (с перекрытием)
+
+        Returns:
+            float: Нижняя граница created_at измененных строк (inf, если новых строк нет)
+        """
+        overlap = settings.INCREMENTAL_OVERLAP_SECONDS
+        users_since = self.users_watermark - overlap
+        sessions_since = self.sessions_watermark - overlap
+        users_query = db.client.table('sales_users').select(*USER_COLUMNS).eq(
+            'bot_id', self.bot_id
+        ).not_.like('first_name', 'Test%').gte('created_at', _timestamp_filter(users_since))
+        sessions_query = db.client.table('sales_chat_sessions').select(*SESSION_COLUMNS).eq(
+            'bot_id', self.bot_id
+        ).gte('created_at', _timestamp_filter(sessions_since))
+        new_users, new_sessions = await asyncio.gather(
+            db.fetch_table(users_query, 'sales_users', USER_COLUMNS),
+            db.fetch_table(sessions_query, 'sales_chat_sessions', SESSION_COLUMNS)
+        )
+        # Копируются только колонки массивов; сортируется и сверяется лишь перекрытие
+        self.users = _merge(self.users, new_users.sort_by('created_at'), 'telegram_id', users_since, self.undated_users)
+        self.sessions = _merge(self.sessions, new_sessions.sort_by('created_at'), 'id', sessions_since)
+        self.users_watermark = _last_created(self.users, self.users_watermark)
+        self.sessions_watermark = _last_created(self.sessions, self.sessions_watermark)
+        return min(users_since if len(new_users) else math.inf, sessions_since if len(new_sessions) else math.inf)
+
+    async def _check(self, db: "SupabaseClient", since: float, until: float) -> Optional[float]:
+        """
+        Сверяет набор с базой: количество пользователей и этапы сессий [since, until)
+
+        Returns:
+            Optional[float]: Нижняя граница created_at измененных сессий (inf, если изменений нет);
+                None, если количество пользователей расходится и нужна полная загрузка
+        """
+        # SDK загружается вместе с первым клиентом (load_supabase_sdk), не при старте воркера
+        from postgrest import CountMethod
+
+        # Пользователи, созданные после watermark, еще не догружены и не считаются
+        watermark = self.users_watermark
+        users_query = db.client.table('sales_users').select('telegram_id', count=CountMethod.exact, head=True).eq(
+            'bot_id', self.bot_id
+        ).not_.like('first_name', 'Test%').or_(f'created_at.is.null,created_at.lte."{_timestamp_filter(watermark)}"')
+        stages_query = db.client.table('sales_chat_sessions').select(*STAGE_COLUMNS).eq(
+            'bot_id', self.bot_id
+        ).gte('created_at', _timestamp_filter(since)).order('created_at')
+        if until < math.inf:
+            stages_query = stages_query.lt('created_at', _timestamp_filter(until))
+        users_response, stages = await asyncio.gather(
+            db.execute_query(users_query, 'sales_users'),
+            db.fetch_table(stages_query, 'sales_chat_sessions', STAGE_COLUMNS)
+        )
+        loaded_users = bisect_right(self.users.column('created_at'), watermark, self.undated_users)
+        if users_response.count != loaded_users:
+            logger.debug(
+                "Количество пользователей бота %s изменилось: %s вместо %d",
+                self.bot_id, users_response.count, loaded_users
+            )
+            return None
+
+        created = self.sessions.column('created_at')
+        start = bisect_left(created, since)
+        stop = len(created) if until == math.inf else bisect_left(created, until, start)
+        sessions, first_changed = _reconcile_stages(self.sessions, stages, start, stop)
+        if first_changed is None:
+            return math.inf
+        changed_from = created[first_changed]
+        self.sessions = sessions
+        logger.debug("Этапы или удаления сессий бота %s с %s", self.bot_id, _timestamp_filter(changed_from))
+        return changed_from
+
+    async def _backfill(self, db: "SupabaseClient", since: float) -> None:
+        """Дозагружает сессии [since, sessions_start) при запросе большего периода"""
+        sessions_query = db.client.table('sales_chat_sessions').select(*SESSION_COLUMNS).eq(
+            'bot_id', self.bot_id
+        ).gte('created_at', _timestamp_filter(since)).lt(
+            'created_at', _timestamp_filter(self.sessions_start)
+        ).order('created_at')
+        older = await db.fetch_table(sessions_query, 'sales_chat_sessions', SESSION_COLUMNS)
+        self.sessions = older.sort_by('created_at').concat(self.sessions)
+        self.sessions_start = since
+
+    async def _update_daily(self, dirty_from: float) -> None:
+        """Пересчитывает дневные агрегаты дней с измененными строками, новых дней и после вытеснения"""
+        daily = self.daily
+        now = datetime.now(timezone.utc)
+        if (daily is not None and dirty_from == math.inf and daily.users is self.users
+                and daily.sessions is self.sessions and now.timestamp() < daily.grid.day_starts[-1]):
+            return
+        previous = None if dirty_from == -math.inf else daily
+        created = self.sessions.column('created_at')
+        if previous is None or previous.users is not self.users:
+            # Новые пользователи: поиск их более ранних сессий проходит по всем сессиям
+            rows = len(created)
+        else:
+            rows = len(created) - bisect_left(created, dirty_from)
+        self.daily = await get_cpu_executor().run(
+            DailyAggregates.build, self.users, self.undated_users, self.sessions, self.sessions_start,
+            get_timezone(settings.get_bot_timezone(self.bot_id)), now, previous, dirty_from, rows=rows
+        )
+
+    def _evict(self, start: float) -> None:
+        """Вытесняет сессии с created_at раньше start"""
+        if start <= self.sessions_start:
+            return
+        cut = bisect_left(self.sessions.column('created_at'), start)
+        if cut:
+            self.sessions = self.sessions.slice(cut)
+        self.sessions_start = start
+
+    def nbytes(self) -> int:
+        """Приблизительный объем колонок набора в байтах"""
+        return sum(table.nbytes() for table in (self.users, self.sessions) if table is not None)
+
+
+class IncrementalDatasetStore:
+    """Наборы строк ботов с вытеснением по LRU"""
+
+    def __init__(self, max_bots: int):
+        self._datasets: "OrderedDict[str, BotDataset]" = OrderedDict()
+        self._max_bots = max_bots
+
+    async def get(self, db: "SupabaseClient", bot_id: str, since: float) -> BotDataset:
+        """
+        Набор строк бота, обновленный для периода, начинающегося с since
+
+        Срезы набора нужно брать сразу после await: следующее обновление
+        заменяет таблицы набора новыми.
+        """
+        dataset = self._datasets.get(bot_id)
+        if dataset is None:
+            dataset = self._datasets[bot_id] = BotDataset(bot_id)
+            while len(self._datasets) > self._max_bots:
+                self._datasets.popitem(last=False)
+        else:
+            self._datasets.move_to_end(bot_id)
+        await dataset.refresh(db, since)
+        return dataset
+
+    def clear(self) -> None:
+        self._datasets.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика наборов: количество ботов, строк и объем колонок"""
+        datasets = [dataset for dataset in self._datasets.values() if dataset.users is not None]
+        return {
+            "bots": len(self._datasets),
+            "max_bots": self._max_bots,
+            "users": sum(len(dataset.users) for dataset in datasets),
+            "sessions": sum(len(dataset.sessions) for dataset in datasets),
+            "bytes": sum(dataset.nbytes() for dataset in datasets)
+        }
+
+
+_dataset_store: Optional[IncrementalDatasetStore] = None
+
+
+def get_dataset_store() -> IncrementalDatasetStore:
+    """Глобальное хранилище наборов строк ботов"""
+    global _dataset_store
+    if _dataset_store is None:
+        _dataset_store = IncrementalDatasetStore(settings.INCREMENTAL_MAX_BOTS)
+    return _dataset_store
+
+
+register_structure(
+    "IncrementalDatasetStore._datasets", lambda: _dataset_store._datasets if _dataset_store is not None else None
+)
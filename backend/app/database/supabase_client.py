@@ -1,32 +1,177 @@
 import logging
 import asyncio
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from contextvars import ContextVar
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Any, Optional
-from supabase import create_client, Client
-from postgrest.exceptions import APIError
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
 
 from app.core.config import settings
+from app.core.executor import get_cpu_executor
+from app.core.log_sampling import sampled
+from app.core.memory_profiler import register_structure
+from app.core.metrics import DB_QUERY_DURATION, DB_ROWS_FETCHED, DB_BYTES_FETCHED
+from app.core.server_timing import record_timing
+from app.core.slow_queries import get_slow_query_log
+from app.core.timestamps import DAY, HOUR, TimeGrid, format_timestamp, get_timezone
+from app.core.tracing import start_span
+from app.database.columnar import ColumnarTable
+from app.database.incremental import get_dataset_store
+from app.services.analytics_aggregation import (
+    aggregate_dashboard_metrics,
+    aggregate_funnel,
+    aggregate_user_growth,
+)
+
+if TYPE_CHECKING:
+    import httpx
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
 
+class _SdkNotLoadedError(Exception):
+    """Заглушка APIError до загрузки Supabase SDK (никогда не выбрасывается)"""
+
+
+# Supabase SDK (supabase, postgrest, httpx) импортируется при создании первого
+# клиента: импорт занимает ~0.6 с и не нужен для старта воркера. До этого момента
+# APIError - заглушка: ошибки PostgREST невозможны без созданного клиента.
+APIError: type = _SdkNotLoadedError
+
+
+def load_supabase_sdk() -> None:
+    """Импортирует Supabase SDK и подменяет заглушку APIError"""
+    global APIError
+    if APIError is _SdkNotLoadedError:
+        import supabase  # noqa: F401
+        from postgrest.exceptions import APIError as PostgrestAPIError
+        APIError = PostgrestAPIError
+
+# Последний HTTP ответ PostgREST в текущем контексте (для учета объема ответа)
+_last_http_response: ContextVar[Optional[Any]] = ContextVar("last_http_response", default=None)
+
+
+def _capture_http_response(response) -> None:
+    """httpx event hook общей сессии: запоминает ответ, чтобы после execute() посчитать его размер"""
+    _last_http_response.set(response)
+
+
+class _PooledClient:
+    """Клиент Supabase в пуле с временем последнего использования"""
+    
+    __slots__ = ("client", "last_used")
+    
+    def __init__(self, client: "Client"):
+        self.client = client
+        self.last_used = time.monotonic()
+
+
 class ConnectionPool:
-    """Пул соединений для переиспользования клиентов Supabase"""
+    """
+    Пул клиентов Supabase с общей keep-alive HTTP сессией
+    
+    Клиенты (по одному на (url, key, bot_id)) разделяют одну httpx сессию,
+    поэтому TCP/TLS соединения переиспользуются между ботами. Клиенты
+    вытесняются по LRU и по времени простоя; фоновая задача периодически
+    проверяет доступность PostgREST и пересоздает сессию при сбое. Прежняя
+    сессия закрывается только после grace периода: ее еще могут использовать
+    выполняющиеся запросы.
+    """
     
-    def __init__(self, max_connections: int = 50):
+    def __init__(
+        self,
+        max_connections: int = 50,
+        idle_timeout: float = 300,
+        health_check_interval: float = 30,
+        http_max_connections: int = 100,
+        http_keepalive_connections: int = 20,
+        http_keepalive_expiry: float = 30,
+        http_timeout: float = 30,
+        session_close_grace: float = 60
+    ):
         """
         Инициализация пула соединений
         
         Args:
-            max_connections: Максимальное количество соединений в пуле
+            max_connections: Максимальное количество клиентов в пуле
+            idle_timeout: Клиенты без обращений дольше этого времени (секунды) вытесняются
+            health_check_interval: Интервал фоновой проверки доступности (секунды, 0 - отключить)
+            http_max_connections: Максимальное количество HTTP соединений общей сессии
+            http_keepalive_connections: Максимальное количество keep-alive соединений
+            http_keepalive_expiry: Время жизни простаивающего keep-alive соединения (секунды)
+            http_timeout: Таймаут HTTP запросов к PostgREST (секунды)
+            session_close_grace: Через сколько секунд закрывается замененная сессия
         """
-        # Кеш клиентов: ключ = (url, key) или (url, key, bot_id)
-        self._clients: Dict[tuple, Client] = {}
-        self._lock = asyncio.Lock()
+        # LRU: ключ (url, key, bot_id) -> клиент; последний элемент - самый свежий
+        self._clients: "OrderedDict[tuple, _PooledClient]" = OrderedDict()
+        # Клиенты в процессе создания: конкурентные запросы ждут один future
+        self._pending: Dict[tuple, asyncio.Future] = {}
         self._max_connections = max_connections
-        self._connection_count = 0
+        self._idle_timeout = idle_timeout
+        self._health_check_interval = health_check_interval
+        self._http_max_connections = http_max_connections
+        self._http_keepalive_connections = http_keepalive_connections
+        self._http_keepalive_expiry = http_keepalive_expiry
+        self._http_timeout = http_timeout
+        self._session_close_grace = session_close_grace
+        self._session: "Optional[httpx.Client]" = None
+        # Сессия создается в потоках создания клиентов: без блокировки два первых
+        # клиента создали бы по сессии, и одна из них никогда не закрылась бы
+        self._session_lock = threading.Lock()
+        # Замененные сессии и момент замены: закрываются после grace периода
+        self._retired_sessions: "List[tuple]" = []
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._healthy: Optional[bool] = None
+        self._last_health_check: Optional[float] = None
+        self._stats = {
+            "hits": 0,
+            "waits": 0,
+            "creations": 0,
+            "creation_errors": 0,
+            "evictions_lru": 0,
+            "evictions_idle": 0,
+            "health_checks": 0,
+            "health_check_failures": 0,
+            "session_resets": 0,
+            "retired_sessions_closed": 0
+        }
+    
+    def _get_session(self) -> "httpx.Client":
+        """Возвращает общую HTTP сессию (создает при первом обращении, потокобезопасно)"""
+        session = self._session
+        if session is not None:
+            return session
+        with self._session_lock:
+            if self._session is not None:
+                return self._session
+            import httpx
+            
+            session = self._session = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=self._http_max_connections,
+                    max_keepalive_connections=self._http_keepalive_connections,
+                    keepalive_expiry=self._http_keepalive_expiry
+                ),
+                timeout=self._http_timeout,
+                follow_redirects=True,
+                http2=True,
+                event_hooks={"response": [_capture_http_response]}
+            )
+            return session
     
-    async def get_client(self, url: str, key: str, bot_id: Optional[str] = None) -> Client:
+    def _create_client(self, url: str, key: str) -> "Client":
+        """Создает клиент Supabase поверх общей сессии (синхронно, вне event loop)"""
+        from supabase import create_client
+        from supabase.lib.client_options import SyncClientOptions
+        
+        load_supabase_sdk()
+        options = SyncClientOptions(httpx_client=self._get_session())
+        return create_client(url, key, options=options)
+    
+    async def get_client(self, url: str, key: str, bot_id: Optional[str] = None) -> "Client":
         """
         Получает клиент из пула или создает новый
         
@@ -38,52 +183,183 @@ class ConnectionPool:
         Returns:
             Client: Клиент Supabase
         """
-        # Ключ для кеша: используем общий клиент для всех запросов без bot_id
-        # или отдельный для каждого bot_id (если нужна изоляция)
-        cache_key = (url, key, bot_id) if bot_id else (url, key, None)
+        cache_key = (url, key, bot_id)
+        self._ensure_maintenance()
         
-        async with self._lock:
-            # Проверяем, есть ли клиент в пуле
-            if cache_key in self._clients:
-                client = self._clients[cache_key]
-                # Проверяем, что клиент еще валиден (базовая проверка)
-                if client:
-                    logger.debug(f"Использован существующий клиент из пула для {'bot_id: ' + bot_id if bot_id else 'общий'}")
-                    return client
-            
-            # Если пул переполнен, удаляем старые соединения
-            if self._connection_count >= self._max_connections:
-                # Удаляем первое соединение (FIFO)
-                if self._clients:
-                    first_key = next(iter(self._clients))
-                    del self._clients[first_key]
-                    self._connection_count -= 1
-                    logger.warning(f"Пул соединений переполнен, удалено соединение: {first_key}")
-            
-            # Создаем новый клиент
+        # Все операции со словарями выполняются в event loop без await между ними,
+        # поэтому блокировка не нужна; создание клиента вынесено в поток
+        pooled = self._clients.get(cache_key)
+        if pooled is not None:
+            self._clients.move_to_end(cache_key)
+            pooled.last_used = time.monotonic()
+            self._stats["hits"] += 1
+            return pooled.client
+        
+        pending = self._pending.get(cache_key)
+        if pending is not None:
+            self._stats["waits"] += 1
+            return await asyncio.shield(pending)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._pending[cache_key] = future
+        try:
+            client = await asyncio.to_thread(self._create_client, url, key)
+        except Exception as e:
+            self._stats["creation_errors"] += 1
+            logger.error(f"Ошибка создания клиента Supabase: {e}")
+            future.set_exception(e)
+            # Исключение уже передано ожидающим; подавляем предупреждение о неполученном исключении
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(cache_key, None)
+        
+        self._clients[cache_key] = _PooledClient(client)
+        self._stats["creations"] += 1
+        while len(self._clients) > self._max_connections:
+            evicted_key, _ = self._clients.popitem(last=False)
+            self._stats["evictions_lru"] += 1
+            logger.info(f"Пул соединений переполнен, вытеснен клиент bot_id: {evicted_key[2] or 'общий'}")
+        future.set_result(client)
+        logger.info(
+            f"Создан новый клиент Supabase в пуле{' для bot_id: ' + bot_id if bot_id else ' (общий)'}. "
+            f"Всего клиентов: {len(self._clients)}"
+        )
+        return client
+    
+    async def warm_up(self, url: str, key: str, connections: int) -> int:
+        """
+        Создает общий клиент и заранее открывает keep-alive соединения сессии
+        
+        Returns:
+            Количество успешных прогревочных запросов
+        """
+        await self.get_client(url, key)
+        session = self._get_session()
+        rest_url = f"{url.rstrip('/')}/rest/v1/"
+        # Параллельные запросы заставляют сессию открыть несколько соединений
+        results = await asyncio.gather(
+            *[asyncio.to_thread(session.head, rest_url, headers={"apikey": key}) for _ in range(connections)],
+            return_exceptions=True
+        )
+        opened = sum(1 for result in results if not isinstance(result, BaseException))
+        self._healthy = opened > 0
+        return opened
+    
+    def _ensure_maintenance(self) -> None:
+        """Запускает фоновую задачу обслуживания пула (в текущем event loop)"""
+        if self._maintenance_task is None or self._maintenance_task.done():
+            interval = self._health_check_interval or self._idle_timeout
+            if interval > 0:
+                self._maintenance_task = asyncio.get_running_loop().create_task(self._maintain(interval))
+    
+    async def _maintain(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
             try:
-                client = create_client(url, key)
-                self._clients[cache_key] = client
-                self._connection_count += 1
-                logger.info(f"Создан новый клиент Supabase в пуле{' для bot_id: ' + bot_id if bot_id else ' (общий)'}. Всего соединений: {self._connection_count}")
-                return client
+                self.evict_idle()
+                await self._close_retired_sessions()
+                if self._health_check_interval:
+                    await self.check_health()
             except Exception as e:
-                logger.error(f"Ошибка создания клиента Supabase: {e}")
-                raise
+                logger.warning(f"Ошибка обслуживания пула соединений: {e}")
+    
+    def evict_idle(self) -> int:
+        """Вытесняет клиенты, простаивающие дольше idle_timeout; возвращает их количество"""
+        if self._idle_timeout <= 0:
+            return 0
+        threshold = time.monotonic() - self._idle_timeout
+        idle_keys = [key for key, pooled in self._clients.items() if pooled.last_used < threshold]
+        for key in idle_keys:
+            del self._clients[key]
+        if idle_keys:
+            self._stats["evictions_idle"] += len(idle_keys)
+            logger.debug(f"Вытеснено простаивающих клиентов: {len(idle_keys)}")
+        return len(idle_keys)
+    
+    async def check_health(self) -> bool:
+        """
+        Проверяет доступность PostgREST через общую сессию
+        
+        При ошибке сессия заменяется, а клиенты удаляются из пула, чтобы следующие
+        запросы открыли новые соединения вместо "мертвых" keep-alive соединений.
+        """
+        if not self._clients or self._session is None:
+            return bool(self._healthy)
+        
+        import httpx
+        
+        url, key, _ = next(reversed(self._clients))
+        session = self._session
+        self._stats["health_checks"] += 1
+        self._last_health_check = time.time()
+        try:
+            response = await asyncio.to_thread(
+                session.head, f"{url.rstrip('/')}/rest/v1/", headers={"apikey": key}, timeout=5.0
+            )
+            healthy = response.status_code < 500
+        except httpx.HTTPError as e:
+            logger.warning(f"Проверка доступности Supabase не прошла: {e}")
+            healthy = False
+        
+        self._healthy = healthy
+        if not healthy:
+            self._stats["health_check_failures"] += 1
+            self._reset_session()
+        return healthy
+    
+    def _reset_session(self) -> None:
+        """
+        Удаляет из пула клиенты общей сессии; следующий клиент создаст новую сессию
+        
+        Старую сессию не закрываем сразу: выполняющиеся запросы и SupabaseClient,
+        уже получившие клиент, продолжают ее использовать (закрытая сессия дала бы
+        RuntimeError вместо ответа). Она закрывается через session_close_grace.
+        """
+        session, self._session = self._session, None
+        self._clients.clear()
+        if session is not None:
+            self._stats["session_resets"] += 1
+            self._retired_sessions.append((session, time.monotonic()))
+    
+    async def _close_retired_sessions(self, force: bool = False) -> int:
+        """Закрывает замененные сессии старше grace периода (все при force); возвращает их количество"""
+        threshold = time.monotonic() - self._session_close_grace
+        expired = [session for session, retired_at in self._retired_sessions if force or retired_at <= threshold]
+        if not expired:
+            return 0
+        self._retired_sessions = [
+            (session, retired_at) for session, retired_at in self._retired_sessions if session not in expired
+        ]
+        for session in expired:
+            await asyncio.to_thread(session.close)
+        self._stats["retired_sessions_closed"] += len(expired)
+        return len(expired)
     
     async def clear(self):
-        """Очищает пул соединений"""
-        async with self._lock:
-            self._clients.clear()
-            self._connection_count = 0
-            logger.info("Пул соединений очищен")
+        """Очищает пул соединений и закрывает HTTP сессию"""
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            self._maintenance_task = None
+        self._clients.clear()
+        session, self._session = self._session, None
+        if session is not None:
+            await asyncio.to_thread(session.close)
+        await self._close_retired_sessions(force=True)
+        logger.info("Пул соединений очищен")
     
     def get_stats(self) -> Dict[str, Any]:
         """Возвращает статистику пула"""
         return {
-            "total_connections": self._connection_count,
+            "total_connections": len(self._clients),
             "max_connections": self._max_connections,
-            "cached_clients": len(self._clients)
+            "cached_clients": len(self._clients),
+            "pending_creations": len(self._pending),
+            "retired_sessions": len(self._retired_sessions),
+            **self._stats,
+            "healthy": self._healthy,
+            "last_health_check": self._last_health_check,
+            "idle_timeout_seconds": self._idle_timeout
         }
 
 
@@ -94,12 +370,27 @@ def _get_connection_pool() -> ConnectionPool:
     """Получает или создает глобальный пул соединений"""
     global _connection_pool
     if _connection_pool is None:
-        max_connections = getattr(settings, 'DB_POOL_MAX_CONNECTIONS', 50)
-        _connection_pool = ConnectionPool(max_connections=max_connections)
+        max_connections = settings.DB_POOL_MAX_CONNECTIONS
+        _connection_pool = ConnectionPool(
+            max_connections=max_connections,
+            idle_timeout=settings.DB_POOL_IDLE_TIMEOUT_SECONDS,
+            health_check_interval=settings.DB_POOL_HEALTH_CHECK_INTERVAL_SECONDS,
+            http_max_connections=settings.DB_HTTP_MAX_CONNECTIONS,
+            http_keepalive_connections=settings.DB_HTTP_KEEPALIVE_CONNECTIONS,
+            http_keepalive_expiry=settings.DB_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            http_timeout=settings.DB_HTTP_TIMEOUT_SECONDS,
+            # Запрос, уже получивший клиент, завершается не позже чем через таймаут запроса
+            session_close_grace=settings.REQUEST_TIMEOUT_SECONDS + settings.DB_HTTP_TIMEOUT_SECONDS
+        )
         logger.info(f"Инициализирован пул соединений Supabase (максимум: {max_connections})")
     return _connection_pool
 
 
+register_structure(
+    "ConnectionPool._clients", lambda: _connection_pool._clients if _connection_pool is not None else None
+)
+
+
 class SupabaseClient:
     """Клиент для работы с Supabase с поддержкой bot_id для мультиботовой архитектуры"""
     
@@ -113,7 +404,7 @@ class SupabaseClient:
         self.url = settings.SUPABASE_URL
         self.key = settings.SUPABASE_KEY
         self.bot_id = bot_id
-        self.client: Optional[Client] = None
+        self.client: "Optional[Client]" = None
         
         if self.bot_id:
             logger.debug(f"Инициализация SupabaseClient для bot_id: {self.bot_id}")
@@ -131,6 +422,62 @@ class SupabaseClient:
             logger.error(f"Ошибка инициализации Supabase client: {e}")
             raise
     
+    async def execute_query(self, query, table: str, operation: str = "select"):
+        """
+        Выполняет запрос PostgREST с учетом метрик (латентность, строки, байты)
+        
+        Args:
+            query: Построенный запрос (builder с методом execute)
+            table: Имя таблицы (метка метрик)
+            operation: Тип операции: select, insert, update (метка метрик)
+        
+        Returns:
+            Ответ PostgREST
+        """
+        token = _last_http_response.set(None)
+        start_time = time.perf_counter()
+        outcome = "error"
+        rows = None
+        with start_span(f"db.{operation} {table}", **{"db.system": "postgresql", "db.sql.table": table}) as span:
+            try:
+                response = query.execute()
+                outcome = "ok"
+                data = response.data
+                rows = len(data) if isinstance(data, list) else int(bool(data))
+                if span is not None:
+                    span.set_attribute("db.rows", rows)
+            finally:
+                duration = time.perf_counter() - start_time
+                DB_QUERY_DURATION.observe(duration, table, operation, outcome)
+                record_timing(f"db.{table}", duration * 1000)
+                http_response = _last_http_response.get()
+                _last_http_response.reset(token)
+                response_bytes = len(http_response.content) if http_response is not None else None
+                get_slow_query_log().maybe_record(
+                    query, table, operation, duration * 1000, rows, response_bytes, outcome
+                )
+        
+        DB_ROWS_FETCHED.inc(table, operation, amount=rows)
+        if response_bytes is not None:
+            DB_BYTES_FETCHED.inc(table, operation, amount=response_bytes)
+        return response
+    
+    async def fetch_table(self, query, table: str, columns: List[str]) -> ColumnarTable:
+        """
+        Выполняет запрос и возвращает строки колоночной таблицей
+        
+        Args:
+            query: Построенный запрос (builder с методом execute)
+            table: Имя таблицы (метка метрик и схема колонок)
+            columns: Выбранные колонки
+        
+        Returns:
+            ColumnarTable: Строки ответа (список dict ответа после этого не хранится)
+        """
+        response = await self.execute_query(query, table)
+        rows = response.data or []
+        return await get_cpu_executor().run(ColumnarTable.from_rows, table, rows, columns, rows=len(rows))
+    
     async def get_user_bots(self, telegram_id: int) -> List[str]:
         """Получает список ботов, к которым пользователь имеет доступ"""
         try:
@@ -138,9 +485,9 @@ class SupabaseClient:
             bots = set()
             
             # Проверяем в sales_users
-            users_response = self.client.table('sales_admins').select('bot_id').eq(
+            users_response = await self.execute_query(self.client.table('sales_admins').select('bot_id').eq(
                 'telegram_id', telegram_id
-            ).execute()
+            ), 'sales_admins')
             
             if users_response.data:
                 for user in users_response.data:
@@ -148,16 +495,16 @@ class SupabaseClient:
                         bots.add(user['bot_id'])
             
             # Проверяем в sales_admins
-            admins_response = self.client.table('sales_admins').select('bot_id').eq(
+            admins_response = await self.execute_query(self.client.table('sales_admins').select('bot_id').eq(
                 'telegram_id', telegram_id
-            ).execute()
+            ), 'sales_admins')
             
             if admins_response.data:
                 for admin in admins_response.data:
                     if admin.get('bot_id'):
                         bots.add(admin['bot_id'])
             
-            logger.info(f"Найдено {len(bots)} ботов для пользователя {telegram_id}: {list(bots)}")
+            logger.debug("Найдено %d ботов для пользователя %s: %s", len(bots), telegram_id, bots)
             return list(bots)
             
         except APIError as e:
@@ -167,9 +514,9 @@ class SupabaseClient:
     async def get_user_info(self, telegram_id: int) -> Optional[Dict[str, Any]]:
         """Получает информацию о пользователе"""
         try:
-            response = self.client.table('sales_users').select(
+            response = await self.execute_query(self.client.table('sales_users').select(
                 'telegram_id', 'username', 'first_name', 'last_name', 'language_code', 'created_at', 'updated_at', 'is_active'
-            ).eq('telegram_id', telegram_id).limit(1).execute()
+            ).eq('telegram_id', telegram_id).limit(1), 'sales_users')
             
             if response.data:
                 return response.data[0]
@@ -187,25 +534,25 @@ class SupabaseClient:
             
             if existing:
                 # Обновляем существующего
-                self.client.table('sales_users').update({
+                await self.execute_query(self.client.table('sales_users').update({
                     'username': user_data.get('username'),
                     'first_name': user_data.get('first_name'),
                     'last_name': user_data.get('last_name'),
                     'updated_at': datetime.now().isoformat(),
                     'is_active': True
-                }).eq('telegram_id', user_data['telegram_id']).execute()
+                }).eq('telegram_id', user_data['telegram_id']), 'sales_users', 'update')
                 
                 logger.info(f"Обновлен пользователь {user_data['telegram_id']}")
             else:
                 # Создаем нового (без bot_id на этапе регистрации)
-                self.client.table('sales_users').insert({
+                await self.execute_query(self.client.table('sales_users').insert({
                     'telegram_id': user_data['telegram_id'],
                     'username': user_data.get('username'),
                     'first_name': user_data.get('first_name'),
                     'last_name': user_data.get('last_name'),
                     'is_active': True,
                     'bot_id': 'system'  # Временный bot_id для системных пользователей
-                }).execute()
+                }), 'sales_users', 'insert')
                 
                 logger.info(f"Создан новый пользователь {user_data['telegram_id']}")
             
@@ -218,84 +565,78 @@ class SupabaseClient:
     async def get_dashboard_metrics(self, bot_id: str, days: int = 7) -> Dict[str, Any]:
         """Получает метрики для дашборда (оптимизированная версия с параллельными запросами)"""
         try:
-            cutoff_date = datetime.now() - timedelta(days=days)
-            today = datetime.now(timezone.utc).date()
-            
-            # ОПТИМИЗАЦИЯ: Выполняем запросы пользователей и сессий параллельно
-            async def get_users():
+            now = datetime.now(timezone.utc)
+            cutoff_date = now - timedelta(days=days)
+            # "Сегодня" - с полуночи по времени бота
+            today_start = bot_time_grid(bot_id, 1, now).today_start
+            
+            daily = None
+            if settings.ENABLE_INCREMENTAL_FETCH:
+                # Строки бота в памяти, из базы - только новые с прошлого обновления
+                dataset = await get_dataset_store().get(self, bot_id, cutoff_date.timestamp())
+                daily = dataset.daily
+                if daily is None:
+                    all_users, all_sessions = dataset.users, dataset.sessions_since(cutoff_date.timestamp())
+            else:
+                # ОПТИМИЗАЦИЯ: Выполняем запросы пользователей и сессий параллельно
+                user_columns = ['telegram_id', 'created_at']
                 real_users_query = self.client.table('sales_users').select(
-                    'telegram_id', 'created_at'
+                    *user_columns
                 ).eq('bot_id', bot_id).not_.like('first_name', 'Test%')
-                real_users_response = real_users_query.execute()
-                return real_users_response.data or []
-            
-            async def get_sessions():
+                session_columns = ['id', 'user_id', 'current_stage', 'created_at']
                 sessions_query = self.client.table('sales_chat_sessions').select(
-                    'id', 'user_id', 'current_stage', 'created_at'
-                ).eq('bot_id', bot_id).gte('created_at', cutoff_date.isoformat())
-                sessions_response = sessions_query.execute()
-                return sessions_response.data or []
-            
-            # Параллельное выполнение запросов
-            all_users, all_sessions = await asyncio.gather(
-                get_users(),
-                get_sessions()
-            )
-            
-            real_user_ids = [u['telegram_id'] for u in all_users]
-            total_users = len(real_user_ids)
-            
-            # ОПТИМИЗАЦИЯ: Используем Set для O(1) поиска вместо O(n) списка
-            real_user_ids_set = set(real_user_ids) if real_user_ids else set()
-            
-            # Фильтруем сессии по реальным пользователям (в памяти, быстрее чем в БД)
-            sessions = [s for s in all_sessions if s.get('user_id') in real_user_ids_set] if real_user_ids_set else all_sessions
-            session_ids = [s['id'] for s in sessions]
+                    *session_columns
+                ).eq('bot_id', bot_id).gte('created_at', format_timestamp(cutoff_date))
+                
+                # Параллельное выполнение запросов
+                all_users, all_sessions = await asyncio.gather(
+                    self.fetch_table(real_users_query, 'sales_users', user_columns),
+                    self.fetch_table(sessions_query, 'sales_chat_sessions', session_columns)
+                )
             
-            # Считаем новых пользователей из уже полученных данных (оптимизация)
-            new_users = 0
-            if all_users:
-                cutoff_datetime = cutoff_date.replace(tzinfo=timezone.utc)
-                for user in all_users:
-                    if user.get('created_at'):
-                        try:
-                            user_date = datetime.fromisoformat(user['created_at'].replace('Z', '+00:00'))
-                            if user_date >= cutoff_datetime:
-                                new_users += 1
-                        except (ValueError, AttributeError):
-                            continue
+            aggregate_start = time.perf_counter()
+            if daily is not None:
+                # Период любой длины - префиксные суммы по дням набора
+                aggregated = daily.metrics(cutoff_date.timestamp())
+            else:
+                aggregated = await get_cpu_executor().run(
+                    aggregate_dashboard_metrics, all_users, all_sessions, cutoff_date,
+                    rows=len(all_users) + len(all_sessions)
+                )
+            session_ids = aggregated['session_ids']
+            record_timing("aggregate.metrics", (time.perf_counter() - aggregate_start) * 1000)
             
             # Активные пользователи сегодня
-            logger.info(f"🔍 Подсчет активных пользователей за сегодня ({today})")
             active_today = 0
             if session_ids:
                 # Ищем сообщения от пользователей (role='user') сегодня в этих сессиях
                 messages_query = self.client.table('sales_messages').select(
                     'session_id'
                 ).in_('session_id', session_ids).eq('role', 'user').gte(
-                    'created_at', today.isoformat()
+                    'created_at', format_timestamp(today_start)
                 )
-                messages_response = messages_query.execute()
+                messages = await self.fetch_table(messages_query, 'sales_messages', ['session_id'])
                 
                 # Считаем уникальные session_id (один пользователь = одна сессия)
-                unique_sessions = set(msg['session_id'] for msg in (messages_response.data or []))
-                active_today = len(unique_sessions)
+                active_today = len(set(messages.column('session_id')))
                 
-                logger.info(f"💬 Найдено {len(messages_response.data or [])} сообщений от пользователей сегодня")
-                logger.info(f"✅ Активных пользователей сегодня: {active_today}")
+                logger.debug(
+                    "💬 Найдено %d сообщений от пользователей сегодня, активных пользователей: %d",
+                    len(messages), active_today
+                )
             else:
-                logger.warning(f"⚠️ Нет сессий для бота {bot_id}")
+                logger.info("⚠️ Нет сессий для бота %s", bot_id, extra=sampled(0.1))
             
             # Реальные данные из базы
             return {
                 'total_revenue': 0.0,  # TODO: Добавить расчет из таблицы платежей
-                'new_users': new_users,
+                'new_users': aggregated['new_users'],
                 'conversion_rate': 0.0,  # TODO: Рассчитать конверсию
                 'average_check': 0.0,  # TODO: Средний чек из платежей
                 'ltv': 0.0,  # TODO: LTV из истории платежей
                 'active_today': active_today,
-                'total_users': total_users,
-                'total_sessions': len(sessions),
+                'total_users': aggregated['total_users'],
+                'total_sessions': aggregated['total_sessions'],
                 'period_days': days
             }
             
@@ -313,47 +654,58 @@ class SupabaseClient:
                 'period_days': days
             }
     
+    async def get_base_user_count(self, bot_id: str, days: int = 7) -> int:
+        """
+        Количество пользователей до начала периода (включая пользователей без created_at) -
+        базовое значение графика роста, равное total_users - new_users метрик дашборда,
+        но без запросов сессий и сообщений
+        """
+        try:
+            cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).timestamp()
+            if settings.ENABLE_INCREMENTAL_FETCH:
+                dataset = await get_dataset_store().get(self, bot_id, cutoff)
+                # Пользователи набора упорядочены по created_at, строки без него - в начале
+                return bisect_left(dataset.users.column('created_at'), cutoff, dataset.undated_users)
+            
+            users_query = self.client.table('sales_users').select('telegram_id', 'created_at').eq(
+                'bot_id', bot_id
+            ).not_.like('first_name', 'Test%')
+            users = await self.fetch_table(users_query, 'sales_users', ['telegram_id', 'created_at'])
+            # NaN (нет created_at) не проходит сравнение и считается, как в метриках
+            return sum(1 for created in users.column('created_at') if not created >= cutoff)
+        
+        except APIError as e:
+            logger.error(f"Ошибка подсчета пользователей до периода для бота {bot_id}: {e}")
+            return 0
+    
     async def get_funnel_stats(self, bot_id: str, days: int = 7) -> Dict[str, Any]:
         """Получает статистику воронки продаж"""
         try:
-            cutoff_date = datetime.now() - timedelta(days=days)
+            cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
             
             # Получаем сессии с этапами
-            sessions_query = self.client.table('sales_chat_sessions').select(
-                'id', 'user_id', 'current_stage', 'lead_quality_score'
-            ).eq('bot_id', bot_id).gte('created_at', cutoff_date.isoformat())
-            sessions_response = sessions_query.execute()
-            sessions = sessions_response.data if sessions_response.data else []
+            daily = None
+            if settings.ENABLE_INCREMENTAL_FETCH:
+                dataset = await get_dataset_store().get(self, bot_id, cutoff_date.timestamp())
+                daily = dataset.daily
+                if daily is None:
+                    sessions = dataset.sessions_since(cutoff_date.timestamp())
+            else:
+                session_columns = ['id', 'user_id', 'current_stage', 'lead_quality_score']
+                sessions_query = self.client.table('sales_chat_sessions').select(
+                    *session_columns
+                ).eq('bot_id', bot_id).gte('created_at', format_timestamp(cutoff_date))
+                sessions = await self.fetch_table(sessions_query, 'sales_chat_sessions', session_columns)
             
             # Группируем по этапам
-            stages = {}
-            for session in sessions:
-                stage = session.get('current_stage', 'unknown')
-                stages[stage] = stages.get(stage, 0) + 1
-            
-            total_sessions = len(sessions)
-            
-            # Формируем воронку с процентами
-            funnel_steps = []
-            stage_order = ['introduction', 'interest', 'consideration', 'intent', 'purchase']
-            
-            for i, stage in enumerate(stage_order):
-                count = stages.get(stage, 0)
-                percentage = (count / total_sessions * 100) if total_sessions > 0 else 0
-                
-                funnel_steps.append({
-                    'stage': stage,
-                    'users_count': count,
-                    'percentage': round(percentage, 1),
-                    'revenue': 0.0,  # TODO: Посчитать выручку на этапе
-                    'avg_check': 0.0  # TODO: Средний чек на этапе
-                })
+            aggregate_start = time.perf_counter()
+            if daily is not None:
+                funnel = daily.funnel(cutoff_date.timestamp())
+            else:
+                funnel = await get_cpu_executor().run(aggregate_funnel, sessions, rows=len(sessions))
+            record_timing("aggregate.funnel", (time.perf_counter() - aggregate_start) * 1000)
             
-            return {
-                'steps': funnel_steps,
-                'total_users': total_sessions,
-                'total_conversion': funnel_steps[-1]['percentage'] if funnel_steps else 0
-            }
+            return funnel
             
         except APIError as e:
             logger.error(f"Ошибка получения статистики воронки для бота {bot_id}: {e}")
@@ -365,86 +717,72 @@ class SupabaseClient:
     
     # Метод get_revenue_by_days удалён по требованию. Оставлены метрики и воронка.
     
-    async def get_user_growth_data(self, bot_id: str, days: int = 7, base_total: int = 0) -> List[Dict[str, Any]]:
-        """Получает данные роста пользователей по дням (оптимизированная версия с параллельными запросами)"""
+    async def get_user_growth_data(self, bot_id: str, days: int = 7, base_total: int = 0,
+                                   granularity: str = DAY) -> List[Dict[str, Any]]:
+        """
+        Получает данные роста и активности пользователей (параллельные запросы)
+        
+        Args:
+            bot_id: ID бота
+            days: Период в календарных днях бота (включая сегодня)
+            base_total: Количество пользователей до начала периода
+            granularity: Гранулярность точек: hour, day, week или month
+        """
         try:
-            cutoff_date = datetime.now() - timedelta(days=days)
-            
-            # ОПТИМИЗАЦИЯ: Выполняем запросы пользователей и сессий параллельно
-            async def get_users():
+            # Интервалы графика - часы или календарные дни бота, период начинается с полуночи первого дня
+            grid = bot_time_grid(bot_id, days, hourly=granularity == HOUR)
+            
+            growth_data = None
+            if settings.ENABLE_INCREMENTAL_FETCH:
+                start_seconds = grid.day_starts[0]
+                dataset = await get_dataset_store().get(self, bot_id, start_seconds)
+                if dataset.daily is not None:
+                    # Точки по дням, неделям и месяцам - из дневных агрегатов набора
+                    aggregate_start = time.perf_counter()
+                    growth_data = dataset.daily.growth(grid, base_total, granularity)
+                    record_timing("aggregate.growth", (time.perf_counter() - aggregate_start) * 1000)
+                if growth_data is None:
+                    all_users, all_sessions = dataset.users_since(start_seconds), dataset.sessions_since(start_seconds)
+            else:
+                period_start = format_timestamp(grid.start)
+                
+                # ОПТИМИЗАЦИЯ: Выполняем запросы пользователей и сессий параллельно
                 users_query = self.client.table('sales_users').select('telegram_id,created_at').eq(
                     'bot_id', bot_id
-                ).not_.like('first_name', 'Test%').gte('created_at', cutoff_date.isoformat())
-                users_response = users_query.execute()
-                return users_response.data if users_response.data else []
-            
-            async def get_sessions():
+                ).not_.like('first_name', 'Test%').gte('created_at', period_start)
                 sessions_query = self.client.table('sales_chat_sessions').select('user_id,created_at').eq(
                     'bot_id', bot_id
-                ).gte('created_at', cutoff_date.isoformat())
-                sessions_response = sessions_query.execute()
-                return sessions_response.data if sessions_response.data else []
-            
-            # Параллельное выполнение запросов
-            all_users, all_sessions = await asyncio.gather(
-                get_users(),
-                get_sessions()
-            )
-            
-            # ОПТИМИЗАЦИЯ: Используем Set для O(1) поиска
-            real_user_ids = {u['telegram_id'] for u in all_users}
-            
-            # Группируем данные по дням
-            growth_data = []
-            daily_new_users = {}
-            daily_active_users = {}
-            
-            # Подсчитываем новых пользователей по дням
-            for user in all_users:
-                if user.get('created_at'):
-                    user_date = datetime.fromisoformat(user['created_at'].replace('Z', '+00:00'))
-                    day_key = user_date.date().isoformat()
-                    daily_new_users[day_key] = daily_new_users.get(day_key, 0) + 1
-            
-            # Подсчитываем активных пользователей по дням
-            for session in all_sessions:
-                if session.get('user_id') and session.get('user_id') in real_user_ids:
-                    if session.get('created_at'):
-                        session_date = datetime.fromisoformat(session['created_at'].replace('Z', '+00:00'))
-                        day_key = session_date.date().isoformat()
-                        if day_key not in daily_active_users:
-                            daily_active_users[day_key] = set()
-                        daily_active_users[day_key].add(session['user_id'])
-            
-            # Формируем данные для каждого дня
-            # Используем базовое количество из metrics (передается как параметр)
-            current_total = base_total
-            for i in range(days):
-                date = datetime.now() - timedelta(days=days-1-i)
-                date_key = date.date().isoformat()
+                ).gte('created_at', period_start)
                 
-                # Новые пользователи за день
-                new_users = daily_new_users.get(date_key, 0)
-                current_total += new_users
-                
-                # Активные пользователи за день
-                active_set = daily_active_users.get(date_key, set())
-                active_users = len(active_set)
-                
-                growth_data.append({
-                    'date': date.isoformat(),
-                    'total_users': current_total,
-                    'new_users': new_users,
-                    'active_users': active_users
-                })
+                # Параллельное выполнение запросов
+                all_users, all_sessions = await asyncio.gather(
+                    self.fetch_table(users_query, 'sales_users', ['telegram_id', 'created_at']),
+                    self.fetch_table(sessions_query, 'sales_chat_sessions', ['user_id', 'created_at'])
+                )
             
-            logger.info(f"✅ Получены данные роста пользователей для бота {bot_id} за {days} дней")
+            if growth_data is None:
+                aggregate_start = time.perf_counter()
+                # Используем базовое количество из metrics (передается как параметр)
+                growth_data = await get_cpu_executor().run(
+                    aggregate_user_growth, all_users, all_sessions, grid, base_total, granularity,
+                    rows=len(all_users) + len(all_sessions)
+                )
+                record_timing("aggregate.growth", (time.perf_counter() - aggregate_start) * 1000)
+            
+            logger.debug(
+                "✅ Получены данные роста пользователей для бота %s за %d дней (%s)", bot_id, days, granularity
+            )
             return growth_data
             
         except Exception as e:
             logger.error(f"Ошибка получения данных роста пользователей: {e}")
             return []
 
+def bot_time_grid(bot_id: str, days: int, now: Optional[datetime] = None, hourly: bool = False) -> TimeGrid:
+    """Последние days дней (включая сегодня) в часовом поясе бота, по дням или по часам"""
+    return TimeGrid.ending_today(days, get_timezone(settings.get_bot_timezone(bot_id)), now, hourly)
+
+
 # Создание глобального экземпляра
 def get_supabase_client(bot_id: str = None) -> SupabaseClient:
     """
@@ -466,6 +804,12 @@ def get_connection_pool_stats() -> Dict[str, Any]:
     return pool.get_stats()
 
 
+async def warm_up_connection_pool(connections: int = 4) -> int:
+    """Прогревает пул: общий клиент и keep-alive соединения к Supabase"""
+    pool = _get_connection_pool()
+    return await pool.warm_up(settings.SUPABASE_URL, settings.SUPABASE_KEY, connections)
+
+
 async def clear_connection_pool():
     """Очищает пул соединений (полезно для тестов или graceful shutdown)"""
     pool = _get_connection_pool()
@@ -1,15 +1,29 @@
 import os
-import uvicorn
-import signal
+import asyncio
 import logging
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.gzip import GZipMiddleware
 from dotenv import load_dotenv
 from datetime import datetime, timezone
+from pathlib import Path
 
-from .api import auth, analytics, bots
+from .api import auth, analytics, bots, internal
 from .core.config import settings
+from .core.responses import FastJSONResponse
+from .core.tracing import TracedMiddleware
+from .core.loop_monitor import get_loop_monitor, get_loop_monitor_stats
+from .core.health import get_db_status, get_readiness
+from .core.drain import drain, install_drain_signal_handler
+from .core.cache import persist_cache, restore_cache
+from .core.warmup import (
+    run_warmup,
+    is_warmed_up,
+    get_warmup_state,
+    get_access_tracker,
+    persist_access_stats_periodically
+)
 from .core.exceptions import (
     http_exception_handler,
     starlette_http_exception_handler,
@@ -24,6 +38,8 @@ from .middleware.request_timeout import RequestTimeoutMiddleware
 from .middleware.etag import ETagMiddleware
 from .middleware.cache_headers import CacheHeadersMiddleware
 from .middleware.rate_limit import RateLimitMiddleware
+from .middleware.profiling import ProfilingMiddleware
+from .middleware.drain import DrainMiddleware
 from .database.supabase_client import get_supabase_client, clear_connection_pool
 from fastapi import HTTPException
 from fastapi.exceptions import RequestValidationError
@@ -43,14 +59,22 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Telegram Bot Dashboard API",
     description="API для дашборда управления телеграм ботами",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
+def add_middleware(middleware_class: type, **options) -> None:
+    """Добавляет middleware; при включенной трассировке - со своим span внутри трассы запроса"""
+    if settings.ENABLE_TRACING:
+        app.add_middleware(TracedMiddleware, wrapped=middleware_class, **options)
+    else:
+        app.add_middleware(middleware_class, **options)
+
 # Настройка CORS (origins берутся из конфигурации)
 cors_origins = settings.get_cors_origins()
 logger.info(f"CORS origins: {cors_origins}")
 
-app.add_middleware(
+add_middleware(
     CORSMiddleware,
     allow_origins=cors_origins,
     allow_credentials=True,
@@ -60,40 +84,48 @@ app.add_middleware(
 
 # Gzip Compression Middleware (сжимает ответы для экономии трафика)
 if settings.ENABLE_GZIP_COMPRESSION:
-    app.add_middleware(
+    add_middleware(
         GZipMiddleware,
         minimum_size=settings.GZIP_MINIMUM_SIZE
     )
     logger.info(f"Gzip compression enabled (minimum size: {settings.GZIP_MINIMUM_SIZE} bytes)")
 
 # Cache Headers Middleware (добавляет Cache-Control заголовки)
-app.add_middleware(CacheHeadersMiddleware)
+add_middleware(CacheHeadersMiddleware)
 
 # ETag Middleware (для условных запросов - временно отключен для диагностики)
 # app.add_middleware(ETagMiddleware)
 
 # Security Headers Middleware (последний добавленный = первый в стеке)
-app.add_middleware(SecurityHeadersMiddleware)
+add_middleware(SecurityHeadersMiddleware)
 
 # Request Timeout Middleware (устанавливает таймаут на выполнение запросов)
-app.add_middleware(RequestTimeoutMiddleware)
+add_middleware(RequestTimeoutMiddleware)
 logger.info(f"Request timeout: {settings.REQUEST_TIMEOUT_SECONDS} seconds")
 
 # Request Size Limit Middleware (проверяет размер тела запроса)
-app.add_middleware(RequestSizeLimitMiddleware)
+add_middleware(RequestSizeLimitMiddleware)
 
 # Rate Limiting Middleware (защита от DDoS и множественных запросов)
 if settings.ENABLE_RATE_LIMIT:
-    app.add_middleware(RateLimitMiddleware)
+    add_middleware(RateLimitMiddleware)
     logger.info(
         f"Rate limiting enabled: {settings.RATE_LIMIT_PER_MINUTE} req/min, "
         f"{settings.RATE_LIMIT_PER_HOUR} req/hour, max {settings.RATE_LIMIT_MAX_TRACKED_IPS} tracked IPs"
     )
 
+# Profiling Middleware (профилирование запроса по заголовку X-Profile, только если задан ADMIN_TOKEN)
+if settings.ADMIN_TOKEN:
+    add_middleware(ProfilingMiddleware)
+
 # Request Logging Middleware (использует Request ID)
-app.add_middleware(RequestLoggingMiddleware)
+add_middleware(RequestLoggingMiddleware)
+
+# Drain Middleware (503 для новых запросов во время graceful shutdown)
+add_middleware(DrainMiddleware)
 
-# Request ID Middleware (должен быть добавлен последним, чтобы выполниться первым)
+# Request ID Middleware (должен быть добавлен последним, чтобы выполниться первым;
+# открывает корневой span трассы, поэтому сам не оборачивается)
 app.add_middleware(RequestIDMiddleware)
 
 # Регистрация обработчиков исключений (должны быть до подключения роутеров)
@@ -106,6 +138,7 @@ app.add_exception_handler(Exception, global_exception_handler)
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"])
 app.include_router(bots.router, prefix="/api/bots", tags=["Bots"])
+app.include_router(internal.router, prefix="/internal", tags=["Internal"], include_in_schema=False)
 
 @app.get("/")
 async def root():
@@ -116,10 +149,27 @@ async def root():
         "status": "running"
     }
 
+@app.get("/livez", include_in_schema=False)
+async def liveness_check():
+    """Liveness проба: процесс жив и event loop обрабатывает запросы"""
+    return {"status": "alive"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readiness_check():
+    """
+    Readiness проба: прогрев завершен и БД доступна (по фоновой проверке, без запроса к БД)
+    """
+    readiness = get_readiness()
+    return JSONResponse(
+        status_code=200 if readiness["ready"] else 503,
+        content=readiness
+    )
+
 @app.get("/health")
 async def health_check():
     """
-    Проверка здоровья сервиса с проверкой подключения к БД
+    Подробная проверка здоровья сервиса (для людей) с проверкой подключения к БД;
+    для проб оркестратора используйте /livez и /readyz
     """
     try:
         # Проверяем подключение к базе данных
@@ -127,15 +177,19 @@ async def health_check():
         await db_client.initialize()
         
         # Простой запрос для проверки работоспособности БД
-        await db_client.client.table('sales_users').select('telegram_id').limit(1).execute()
+        await db_client.execute_query(
+            db_client.client.table('sales_users').select('telegram_id').limit(1), 'sales_users'
+        )
         
         # Получаем статистику пула соединений
         from .database.supabase_client import get_connection_pool_stats
         pool_stats = get_connection_pool_stats()
         
         health_data = {
-            "status": "healthy",
+            "status": "healthy" if is_warmed_up() else "warming_up",
+            "ready": is_warmed_up(),
             "database": "connected",
+            "warmup": get_warmup_state().to_dict(),
             "connection_pool": pool_stats,
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
@@ -145,6 +199,15 @@ async def health_check():
             from .core.cache import get_cache_stats
             health_data["cache"] = get_cache_stats()
         
+        if settings.ENABLE_INCREMENTAL_FETCH:
+            from .database.incremental import get_dataset_store
+            health_data["incremental_datasets"] = get_dataset_store().get_stats()
+        
+        if settings.ENABLE_LOOP_MONITOR:
+            health_data["event_loop"] = get_loop_monitor_stats()
+        
+        health_data["readiness"] = get_readiness()
+        
         return health_data
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -155,22 +218,78 @@ async def health_check():
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
 
-# Обработка graceful shutdown
-def shutdown_handler(signum, frame):
-    """Обработчик сигналов завершения"""
-    logger.info(f"Получен сигнал {signum}, начинаем graceful shutdown...")
-    # FastAPI/uvicorn автоматически обработают graceful shutdown
+if settings.ENABLE_METRICS:
+    from .core.metrics import registry, render_metrics, PROMETHEUS_CONTENT_TYPE
+    from .database.supabase_client import get_connection_pool_stats
+    from .core.cache import get_cache_stats
+    
+    registry.gauge(
+        "supabase_pool_connections", "Количество клиентов в пуле соединений Supabase",
+        lambda: get_connection_pool_stats()["cached_clients"]
+    )
+    registry.gauge(
+        "response_cache_entries", "Количество записей в кеше ответов",
+        lambda: get_cache_stats()["size"]
+    )
+    
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Метрики приложения в формате Prometheus"""
+        return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
 
-# Регистрируем обработчики сигналов (uvicorn сам обрабатывает SIGTERM/SIGINT)
-# Это нужно только если нужно дополнительное логирование
-if os.name != 'nt':  # На Windows сигналы работают по-другому
-    signal.signal(signal.SIGTERM, shutdown_handler)
-    signal.signal(signal.SIGINT, shutdown_handler)
+@app.on_event("startup")
+async def startup_event_handler():
+    """Выполняется при запуске приложения"""
+    # Graceful drain по SIGTERM: 503 для новых запросов, ожидание выполняющихся
+    if os.name != 'nt' and install_drain_signal_handler():
+        logger.info("Обработчик SIGTERM с graceful drain установлен")
+    restored = restore_cache()
+    if restored:
+        logger.info(f"Восстановлено записей кеша ответов: {restored}")
+    if settings.ENABLE_LOOP_MONITOR:
+        get_loop_monitor().start()
+    # Прогрев выполняется в фоне: сервис принимает запросы, но не сообщает о готовности до завершения
+    app.state.background_tasks = [
+        asyncio.create_task(run_warmup()),
+        asyncio.create_task(get_db_status().run()),
+        asyncio.create_task(persist_access_stats_periodically(settings.WARMUP_ACCESS_SAVE_INTERVAL_SECONDS))
+    ]
 
 @app.on_event("shutdown")
 async def shutdown_event_handler():
     """Выполняется при завершении приложения"""
     logger.info("Приложение завершает работу...")
+    # Дожидаемся выполняющихся запросов (если drain еще не выполнен обработчиком SIGTERM)
+    await drain()
+    
+    if settings.ENABLE_LOOP_MONITOR:
+        await get_loop_monitor().stop()
+    for task in getattr(app.state, "background_tasks", []):
+        task.cancel()
+    
+    # Сохраняем горячие записи кеша и статистику обращений до закрытия соединений
+    try:
+        saved = persist_cache(settings.DRAIN_PERSIST_CACHE_ENTRIES)
+        logger.info(f"Сохранено записей кеша ответов: {saved}")
+    except Exception as e:
+        logger.error(f"Ошибка сохранения кеша ответов: {e}")
+    get_access_tracker().save()
+    
+    # Отправляем накопленные трассы, финальный снимок метрик и логи
+    from .core.tracing import flush_traces
+    flush_traces()
+    if settings.ENABLE_METRICS:
+        try:
+            metrics_path = Path(settings.LOG_DIR) / f"metrics-final-{os.getpid()}.prom"
+            metrics_path.write_text(render_metrics(), encoding="utf-8")
+        except OSError as e:
+            logger.error(f"Ошибка сохранения финального снимка метрик: {e}")
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+    
+    from .core.executor import get_cpu_executor
+    get_cpu_executor().shutdown()
+    
     # Очищаем пул соединений с БД
     try:
         await clear_connection_pool()
@@ -179,6 +298,9 @@ async def shutdown_event_handler():
         logger.error(f"Ошибка при очистке пула соединений: {e}")
 
 if __name__ == "__main__":
+    # Режим разработки; production запуск: python -m app.server
+    import uvicorn
+    
     uvicorn.run(
         "app.main:app",
         reload=True,
@@ -0,0 +1,49 @@
+"""
+Drain Middleware - отклоняет новые запросы с 503 во время graceful shutdown
+и учитывает выполняющиеся запросы
+"""
+import logging
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from fastapi import status
+
+from app.core.config import settings
+from app.core.drain import get_drain_state
+
+logger = logging.getLogger(__name__)
+
+
+class DrainMiddleware(BaseHTTPMiddleware):
+    """
+    Middleware для graceful drain: пока сервис в режиме drain, новые запросы
+    (кроме liveness пробы) получают 503 с Retry-After и Connection: close
+    """
+    
+    async def dispatch(self, request: Request, call_next):
+        drain_state = get_drain_state()
+        
+        if drain_state.draining and request.url.path != "/livez":
+            drain_state.rejected += 1
+            request_id = getattr(request.state, "request_id", "unknown")
+            return JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={
+                    "success": False,
+                    "error": {
+                        "message": "Сервис перезапускается, повторите запрос",
+                        "status_code": status.HTTP_503_SERVICE_UNAVAILABLE,
+                        "request_id": request_id
+                    }
+                },
+                headers={
+                    "Retry-After": str(settings.DRAIN_RETRY_AFTER_SECONDS),
+                    "Connection": "close"
+                }
+            )
+        
+        drain_state.request_started()
+        try:
+            return await call_next(request)
+        finally:
+            drain_state.request_finished()
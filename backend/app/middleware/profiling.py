@@ -0,0 +1,50 @@
+"""
+Profiling Middleware - профилирование отдельного запроса по привилегированному заголовку
+"""
+import logging
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.core.dependencies import is_valid_admin_token
+from app.core.profiler import PROFILE_FORMATS, try_start_profiling, finish_profiling
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware(BaseHTTPMiddleware):
+    """
+    Middleware для профилирования запроса сэмплирующим профайлером.
+    Включается заголовком X-Profile: <ADMIN_TOKEN>, формат выбирается
+    заголовком X-Profile-Format (collapsed или speedscope).
+    """
+    
+    async def dispatch(self, request: Request, call_next) -> Response:
+        profile_token = request.headers.get("X-Profile")
+        if not profile_token:
+            return await call_next(request)
+        
+        if not is_valid_admin_token(profile_token):
+            logger.warning(f"Неверный токен профилирования для {request.url.path}")
+            return await call_next(request)
+        
+        profile_format = request.headers.get("X-Profile-Format", "collapsed")
+        if profile_format not in PROFILE_FORMATS:
+            profile_format = "collapsed"
+        
+        sampler = try_start_profiling()
+        if sampler is None:
+            # Уже идет другая сессия профилирования
+            response = await call_next(request)
+            response.headers["X-Profile-Status"] = "busy"
+            return response
+        
+        request_id = getattr(request.state, "request_id", "request")
+        try:
+            response = await call_next(request)
+        finally:
+            profile_path = finish_profiling(sampler, request_id, profile_format)
+        
+        response.headers["X-Profile-Status"] = "saved"
+        response.headers["X-Profile-File"] = profile_path.name
+        return response
@@ -11,6 +11,8 @@ from starlette.responses import JSONResponse
 from fastapi import status
 
 from app.core.config import settings
+from app.core.memory_profiler import register_structure
+from app.core.metrics import RATE_LIMIT_REJECTIONS
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +37,8 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         self._last_cleanup = time.time()
         self._cleanup_interval = 60  # Очистка каждую минуту
         
+        register_structure("RateLimitMiddleware._rate_limits", lambda: self._rate_limits)
+        
         logger.info(
             f"Rate limiting enabled: {self.requests_per_minute} req/min, "
             f"{self.requests_per_hour} req/hour, max {self.max_tracked_ips} tracked IPs"
@@ -113,11 +117,13 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         # Проверяем лимит за час
         if hour_count >= self.requests_per_hour:
             retry_after = 3600 - (int(current_time) % 3600)
+            RATE_LIMIT_REJECTIONS.inc("hour")
             return False, "Превышен лимит запросов за час", retry_after
         
         # Проверяем лимит за минуту
         if min_count >= self.requests_per_minute:
             retry_after = 60 - (int(current_time) % 60)
+            RATE_LIMIT_REJECTIONS.inc("minute")
             return False, "Превышен лимит запросов за минуту", retry_after
         
         # Увеличиваем счетчики
@@ -131,7 +137,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
     
     async def dispatch(self, request: Request, call_next):
         # Пропускаем health check и статические файлы
-        if request.url.path in ["/health", "/"] or request.url.path.startswith("/static"):
+        if request.url.path in ["/health", "/livez", "/readyz", "/metrics", "/"] or request.url.path.startswith("/static"):
             return await call_next(request)
         
         # Получаем IP клиента
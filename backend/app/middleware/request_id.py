@@ -6,6 +6,9 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import Response
 
+from app.core.request_context import set_request_context, reset_request_context
+from app.core.tracing import start_trace
+
 class RequestIDMiddleware(BaseHTTPMiddleware):
     """
     Middleware для добавления уникального Request ID к каждому запросу
@@ -22,8 +25,28 @@ class RequestIDMiddleware(BaseHTTPMiddleware):
         # Добавляем Request ID в state для доступа в других местах
         request.state.request_id = request_id
         
-        # Выполняем следующий middleware/endpoint
-        response = await call_next(request)
+        # Устанавливаем контекст запроса для логов и метрик (доступен во всем коде запроса)
+        context_tokens = set_request_context(request_id, request.cookies.get('telegram_id'))
+        try:
+            # Корневой span трассы охватывает всю цепочку middleware и endpoint
+            with start_trace(
+                f"{request.method} {request.url.path}",
+                request_id=request_id,
+                **{"http.method": request.method, "http.target": request.url.path}
+            ) as span:
+                # Выполняем следующий middleware/endpoint
+                response = await call_next(request)
+                
+                if span is not None:
+                    route = request.scope.get("route")
+                    if route is not None:
+                        span.name = f"{request.method} {route.path}"
+                        span.set_attribute("http.route", route.path)
+                    span.set_attribute("http.status_code", response.status_code)
+                    if response.status_code >= 500:
+                        span.set_error()
+        finally:
+            reset_request_context(context_tokens)
         
         # Добавляем Request ID в заголовки ответа
         response.headers["X-Request-ID"] = request_id
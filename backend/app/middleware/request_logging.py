@@ -7,9 +7,12 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import Response
 
-from app.core.logging_config import get_logger
+from app.core.health import PROBE_PATHS
+from app.core.log_sampling import ACCESS_LOGGER_NAME
+from app.core.metrics import HTTP_REQUESTS_TOTAL, HTTP_REQUEST_DURATION
+from app.core.server_timing import start_request_timings, reset_request_timings
 
-logger = logging.getLogger(__name__)
+logger = logging.getLogger(ACCESS_LOGGER_NAME)
 
 class RequestLoggingMiddleware(BaseHTTPMiddleware):
     """
@@ -17,44 +20,32 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
     """
     
     async def dispatch(self, request: Request, call_next) -> Response:
-        # Получаем Request ID из state (если был добавлен предыдущим middleware)
-        request_id = getattr(request.state, "request_id", "unknown")
-        
-        # Получаем информацию о запросе
+        # request_id и user_id добавляются в записи из контекста запроса (RequestContextFilter)
         method = request.method
         path = request.url.path
         query_params = str(request.query_params) if request.query_params else ""
         client_ip = request.client.host if request.client else "unknown"
         user_agent = request.headers.get("user-agent", "unknown")
-        
-        # Получаем user_id из cookies, если есть
-        user_id = request.cookies.get('telegram_id')
-        
-        # Создаем структурированный логгер с контекстом
-        structured_logger = get_logger(
-            __name__,
-            request_id=request_id,
-            ip_address=client_ip,
-            user_agent=user_agent[:100] if len(user_agent) > 100 else user_agent,
-            user_id=user_id
-        )
+        # Частые пробы оркестратора не засоряют лог
+        log_level = logging.DEBUG if path in PROBE_PATHS else logging.INFO
         
         # Логируем начало запроса
-        structured_logger.info(
+        logger.log(
+            log_level,
             f"{method} {path}" + (f"?{query_params}" if query_params else ""),
             extra={
                 "method": method,
                 "path": path,
                 "query_params": query_params,
-                "request_id": request_id,
                 "ip_address": client_ip,
-                "user_agent": user_agent,
-                "user_id": user_id
+                "user_agent": user_agent[:100]
             }
         )
         
         # Засекаем время начала обработки
         start_time = time.time()
+        # Тайминги этапов (проверка доступа, кеш, запросы к БД, агрегация, сериализация)
+        timings, timings_token = start_request_timings()
         
         try:
             # Выполняем следующий middleware/endpoint
@@ -67,21 +58,23 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
             status_code = response.status_code
             
             # Логируем результат
-            structured_logger.info(
+            logger.log(
+                log_level,
                 f"{method} {path} - Status: {status_code}",
                 extra={
                     "method": method,
                     "path": path,
                     "status_code": status_code,
                     "process_time": round(process_time, 3),
-                    "request_id": request_id,
-                    "ip_address": client_ip,
-                    "user_id": user_id
+                    "timings": timings.summary()
                 }
             )
             
+            self._record_metrics(request, status_code, process_time)
+            
             # Добавляем время обработки в заголовок ответа
             response.headers["X-Process-Time"] = f"{process_time:.3f}"
+            response.headers["Server-Timing"] = timings.to_header(total_ms=process_time * 1000)
             
             return response
             
@@ -90,7 +83,7 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
             process_time = time.time() - start_time
             
             # Логируем ошибку
-            structured_logger.error(
+            logger.error(
                 f"{method} {path} - Error: {str(e)}",
                 extra={
                     "method": method,
@@ -98,14 +91,25 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
                     "error": str(e),
                     "error_type": type(e).__name__,
                     "process_time": round(process_time, 3),
-                    "request_id": request_id,
-                    "ip_address": client_ip,
-                    "user_id": user_id
+                    "timings": timings.summary(),
+                    "ip_address": client_ip
                 },
                 exc_info=True
             )
             
+            self._record_metrics(request, 500, process_time)
+            
             # Пробрасываем исключение дальше
             raise
-
-
+        
+        finally:
+            reset_request_timings(timings_token)
+    
+    @staticmethod
+    def _record_metrics(request: Request, status_code: int, process_time: float) -> None:
+        """Учитывает запрос в метриках по шаблону маршрута (не по фактическому пути)"""
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        labels = (request.method, route_path, str(status_code))
+        HTTP_REQUESTS_TOTAL.inc(*labels)
+        HTTP_REQUEST_DURATION.observe(process_time, *labels)
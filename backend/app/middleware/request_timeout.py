@@ -9,6 +9,7 @@ from starlette.responses import JSONResponse
 from fastapi import status
 
 from app.core.config import settings
+from app.core.request_context import set_deadline, reset_deadline
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +23,7 @@ class RequestTimeoutMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         request_id = getattr(request.state, "request_id", "unknown")
         timeout_seconds = settings.REQUEST_TIMEOUT_SECONDS
+        deadline_token = set_deadline(timeout_seconds)
         
         try:
             # Устанавливаем таймаут на выполнение запроса
@@ -53,6 +55,9 @@ class RequestTimeoutMiddleware(BaseHTTPMiddleware):
         except Exception as e:
             # Пробрасываем другие исключения дальше
             raise
+        
+        finally:
+            reset_deadline(deadline_token)
 
 
 
@@ -0,0 +1,183 @@
+"""
+Production точка входа: python -m app.server
+
+- количество воркеров по квоте CPU (cgroup v2/v1, affinity), если WORKERS не задан
+- uvloop и httptools, если установлены
+- backlog, keep-alive и лимиты конкурентности из Settings
+- preload: приложение импортируется в мастер-процессе до fork, воркеры стартуют "теплыми"
+"""
+import importlib.util
+import logging
+import math
+import os
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.server")
+
+APP_IMPORT_STRING = "app.main:app"
+
+
+def detect_cpu_quota() -> float:
+    """
+    Определяет доступное процессу количество CPU с учетом квоты контейнера
+
+    Returns:
+        Количество CPU (может быть дробным, например 1.5 при квоте 150000/100000)
+    """
+    available = float(len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1))
+
+    # cgroup v2: "<quota> <period>" или "max <period>"
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            return min(available, int(quota) / int(period))
+        return available
+    except (OSError, ValueError):
+        pass
+
+    # cgroup v1
+    try:
+        quota = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+        period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+        if quota > 0 and period > 0:
+            return min(available, quota / period)
+    except (OSError, ValueError):
+        pass
+
+    return available
+
+
+def get_worker_count() -> int:
+    """Количество воркеров: WORKERS из настроек или по одному на доступный CPU"""
+    if settings.WORKERS:
+        return settings.WORKERS
+    # Асинхронным воркерам достаточно одного процесса на ядро
+    return max(1, math.ceil(detect_cpu_quota()))
+
+
+def _module_available(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+def build_config(app=APP_IMPORT_STRING, workers: int = 1) -> uvicorn.Config:
+    """Собирает конфигурацию uvicorn из Settings"""
+    return uvicorn.Config(
+        app,
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=workers,
+        loop="uvloop" if _module_available("uvloop") else "asyncio",
+        http="httptools" if _module_available("httptools") else "h11",
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_SECONDS,
+        limit_concurrency=settings.SERVER_LIMIT_CONCURRENCY,
+        limit_max_requests=settings.SERVER_LIMIT_MAX_REQUESTS,
+        # Сервер ждет соединения дольше, чем длится drain приложения
+        timeout_graceful_shutdown=settings.DRAIN_DELAY_SECONDS + settings.DRAIN_GRACE_SECONDS + 5,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.SERVER_FORWARDED_ALLOW_IPS,
+        access_log=False,
+        log_level="info",
+    )
+
+
+class PreforkSupervisor:
+    """
+    Мастер-процесс: загружает приложение, открывает сокет и форкает воркеры,
+    перезапуская упавшие; SIGTERM/SIGINT пересылаются воркерам
+    """
+
+    def __init__(self, config: uvicorn.Config, workers: int):
+        self.config = config
+        self.workers = workers
+        self.children: Dict[int, float] = {}  # pid -> время запуска
+        self.shutting_down = False
+        self.sock: Optional[socket.socket] = None
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            # Воркер: стандартные обработчики сигналов, их установит uvicorn
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            exit_code = 0
+            try:
+                uvicorn.Server(self.config).run(sockets=[self.sock])
+            except BaseException:
+                logger.exception("Воркер завершился с ошибкой")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        self.children[pid] = time.monotonic()
+
+    def _forward_signal(self, signum, frame) -> None:
+        self.shutting_down = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        # Загрузка приложения в мастере: воркеры получают его через fork (copy-on-write)
+        self.config.load()
+        # SDK Supabase импортируется лениво; в мастере - чтобы не импортировать его в каждом воркере
+        from app.database.supabase_client import load_supabase_sdk
+        load_supabase_sdk()
+        self.sock = self.config.bind_socket()
+        signal.signal(signal.SIGTERM, self._forward_signal)
+        signal.signal(signal.SIGINT, self._forward_signal)
+
+        logger.info(f"Запуск {self.workers} воркеров (preload, pid мастера: {os.getpid()})")
+        for _ in range(self.workers):
+            self._spawn()
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started_at = self.children.pop(pid, None)
+            if self.shutting_down or started_at is None:
+                continue
+            logger.warning(f"Воркер {pid} завершился (status={status}), перезапуск")
+            # Не перезапускаем в цикле воркер, падающий сразу после старта
+            if time.monotonic() - started_at < 1:
+                time.sleep(1)
+            self._spawn()
+
+        self.sock.close()
+        logger.info("Все воркеры завершены")
+
+
+def main() -> None:
+    workers = get_worker_count()
+    logger.info(
+        f"CPU квота: {detect_cpu_quota():.2f}, воркеров: {workers}, "
+        f"loop: {'uvloop' if _module_available('uvloop') else 'asyncio'}, "
+        f"http: {'httptools' if _module_available('httptools') else 'h11'}"
+    )
+
+    if workers == 1:
+        uvicorn.Server(build_config()).run()
+    elif settings.SERVER_PRELOAD and hasattr(os, "fork"):
+        PreforkSupervisor(build_config(workers=workers), workers).run()
+    else:
+        # Без preload каждый воркер импортирует приложение сам (spawn)
+        config = build_config(workers=workers)
+        Multiprocess(config, target=uvicorn.Server(config).run, sockets=[config.bind_socket()]).run()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    sys.exit(main())
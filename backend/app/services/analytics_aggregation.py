@@ -0,0 +1,189 @@
+"""
+Агрегация строк Supabase для метрик дашборда, воронки и роста пользователей
+
+Функции чистые (только данные на входе и выходе), поэтому для больших ботов
+выполняются в пуле потоков или процессов (см. app.core.executor). Строки
+передаются колоночными таблицами (app.database.columnar): метки времени уже
+разобраны в секунды от эпохи, этапы закодированы. От
+VECTORIZED_AGGREGATION_MIN_ROWS строк используется векторная реализация
+(app.services.vectorized_aggregation), если установлен numpy.
+"""
+from collections import Counter
+from datetime import datetime
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.timestamps import DAY, TimeGrid
+from app.database.columnar import INT, INT_NULL, ColumnarTable
+
+FUNNEL_STAGE_ORDER = ['introduction', 'interest', 'consideration', 'intent', 'purchase']
+
+
+def _vectorized_engine(rows: int) -> Optional[ModuleType]:
+    """Модуль векторной агрегации, если он выбран AGGREGATION_ENGINE и доступен"""
+    engine = settings.AGGREGATION_ENGINE
+    if engine == "python" or (engine == "auto" and rows < settings.VECTORIZED_AGGREGATION_MIN_ROWS):
+        return None
+    try:
+        # numpy импортируется при первой большой агрегации
+        from app.services import vectorized_aggregation
+    except ImportError:
+        return None
+    return vectorized_aggregation
+
+
+def _present_ids(table: ColumnarTable, name: str) -> Set[Any]:
+    """Множество заполненных id колонки"""
+    missing = INT_NULL if table.kind(name) == INT else None
+    ids = set(table.column(name))
+    ids.discard(missing)
+    return ids
+
+
+def funnel_from_counts(stage_counts: Dict[Any, int], total_sessions: int) -> Dict[str, Any]:
+    """Воронка с процентами по количеству сессий на каждом этапе"""
+    funnel_steps = []
+    for stage in FUNNEL_STAGE_ORDER:
+        count = stage_counts.get(stage, 0)
+        percentage = (count / total_sessions * 100) if total_sessions > 0 else 0
+
+        funnel_steps.append({
+            'stage': stage,
+            'users_count': count,
+            'percentage': round(percentage, 1),
+            'revenue': 0.0,  # TODO: Посчитать выручку на этапе
+            'avg_check': 0.0  # TODO: Средний чек на этапе
+        })
+
+    return {
+        'steps': funnel_steps,
+        'total_users': total_sessions,
+        'total_conversion': funnel_steps[-1]['percentage'] if funnel_steps else 0
+    }
+
+
+def growth_points(labels: List[str], new_users: List[int], active_users: List[int],
+                  base_total: int) -> List[Dict[str, Any]]:
+    """Точки графика роста: накопленный итог, новые и активные пользователи"""
+    growth_data = []
+    current_total = base_total
+    for label, new_count, active_count in zip(labels, new_users, active_users):
+        # Новые пользователи за интервал
+        current_total += new_count
+
+        growth_data.append({
+            'date': label,
+            'total_users': current_total,
+            'new_users': new_count,
+            'active_users': active_count
+        })
+
+    return growth_data
+
+
+def aggregate_dashboard_metrics(
+    all_users: ColumnarTable,
+    all_sessions: ColumnarTable,
+    cutoff_date: datetime
+) -> Dict[str, Any]:
+    """
+    Считает пользователей, новых пользователей и сессии реальных пользователей
+
+    Args:
+        all_users: Пользователи бота (telegram_id, created_at)
+        all_sessions: Сессии за период (id, user_id)
+        cutoff_date: Начало периода (datetime с часовым поясом)
+
+    Returns:
+        Dict: total_users, new_users, total_sessions, session_ids
+    """
+    engine = _vectorized_engine(len(all_users) + len(all_sessions))
+    if engine is not None:
+        result = engine.aggregate_dashboard_metrics(all_users, all_sessions, cutoff_date)
+        if result is not None:
+            return result
+
+    total_users = len(all_users)
+    real_user_ids_set = _present_ids(all_users, 'telegram_id')
+
+    # Фильтруем сессии по реальным пользователям (в памяти, быстрее чем в БД)
+    if real_user_ids_set:
+        indices = [i for i, user_id in enumerate(all_sessions.column('user_id')) if user_id in real_user_ids_set]
+    else:
+        indices = range(len(all_sessions))
+    # id сессии - первичный ключ, пропусков нет
+    ids = all_sessions.column('id')
+    session_ids = [ids[i] for i in indices]
+
+    # Новые пользователи: пропуски (NaN) не проходят сравнение
+    cutoff_seconds = cutoff_date.timestamp()
+    new_users = sum(1 for created in all_users.column('created_at') if created >= cutoff_seconds)
+
+    return {
+        'total_users': total_users,
+        'new_users': new_users,
+        'total_sessions': len(session_ids),
+        'session_ids': session_ids
+    }
+
+
+def aggregate_funnel(sessions: ColumnarTable) -> Dict[str, Any]:
+    """Группирует сессии по этапам воронки и считает проценты"""
+    engine = _vectorized_engine(len(sessions))
+    if engine is not None:
+        return engine.aggregate_funnel(sessions)
+
+    # Подсчет по кодам этапов, затем перевод кодов в названия
+    code_counts = Counter(sessions.column('current_stage'))
+    stages = {stage: code_counts.get(code, 0) for code, stage in enumerate(sessions.categories('current_stage'))}
+
+    return funnel_from_counts(stages, len(sessions))
+
+
+def aggregate_user_growth(
+    all_users: ColumnarTable,
+    all_sessions: ColumnarTable,
+    grid: TimeGrid,
+    base_total: int,
+    granularity: str = DAY
+) -> List[Dict[str, Any]]:
+    """
+    Группирует новых и активных пользователей по интервалам в часовом поясе бота
+
+    Args:
+        all_users: Пользователи за период (telegram_id, created_at)
+        all_sessions: Сессии за период (user_id, created_at)
+        grid: Интервалы периода (часы или дни)
+        base_total: Количество пользователей до начала периода
+        granularity: Гранулярность точек: hour, day, week или month
+    """
+    engine = _vectorized_engine(len(all_users) + len(all_sessions))
+    if engine is not None:
+        result = engine.aggregate_user_growth(all_users, all_sessions, grid, base_total, granularity)
+        if result is not None:
+            return result
+
+    real_user_ids = _present_ids(all_users, 'telegram_id')
+
+    # Один проход по строкам: мелкий интервал строки -> точка графика
+    bucket_index = grid.index
+    point_of, labels = grid.groups(granularity)
+    point_new_users = [0] * len(labels)
+    point_active_users = [set() for _ in labels]
+
+    # Подсчитываем новых пользователей по точкам (вне периода и NaN - индекс -1)
+    for created in all_users.column('created_at'):
+        index = bucket_index(created)
+        if index >= 0:
+            point_new_users[point_of[index]] += 1
+
+    # Подсчитываем уникальных активных пользователей по точкам
+    for user_id, created in zip(all_sessions.column('user_id'), all_sessions.column('created_at')):
+        if user_id and user_id in real_user_ids:
+            index = bucket_index(created)
+            if index >= 0:
+                point_active_users[point_of[index]].add(user_id)
+
+    # Формируем данные для каждой точки
+    return growth_points(labels, point_new_users, [len(users) for users in point_active_users], base_total)
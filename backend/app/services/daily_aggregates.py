@@ -0,0 +1,334 @@
+"""
+Дневные агрегаты набора строк бота для окон любой длины
+
+days в запросах дашборда - любое значение от 1 до 365, и каждое окно
+считалось заново по строкам. DailyAggregates хранит для каждого календарного
+дня бота (в его часовом поясе) в окне набора (app.database.incremental):
+- количество сессий и сессии по этапам
+- id сессий реальных пользователей
+- количество новых пользователей
+- множество активных пользователей
+
+Префиксные суммы по дням дают метрики и воронку любого окна за O(дней).
+Строки читаются только для неполного первого дня окна (период начинается в
+now - days, а не в полночь) и для сессий, созданных после конца
+сегодняшнего дня. Ряд роста по дням, неделям и месяцам собирается из дней:
+активные пользователи графика - созданные в его периоде, поэтому для
+каждого дня и календарной недели/месяца хранятся отсортированные моменты
+создания активных пользователей и количество считается бинарным поиском
+(группы недель и месяцев - при первом запросе такой гранулярности).
+Почасовые точки считаются по строкам.
+
+Агрегаты - неизменяемый снимок таблиц набора. При обновлении набора
+пересчитываются только дни, затронутые новыми строками (обычно сегодняшний),
+остальные дни переиспользуются. Новый пользователь делает реальными его
+более ранние сессии, поэтому дни пересчитываются и с первой такой сессии.
+Окно, начавшееся раньше (дозагрузка большего периода), пересчитывается целиком.
+"""
+import array
+import math
+from bisect import bisect_left
+from collections import Counter
+from datetime import date, datetime, time, timedelta, tzinfo
+from itertools import accumulate, compress
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+from app.core.timestamps import MONTH, WEEK, TimeGrid
+from app.database.columnar import INT, INT_NULL, ColumnarTable
+from app.services.analytics_aggregation import funnel_from_counts, growth_points
+
+
+class DayAggregate:
+    """Агрегаты сессий и пользователей одного дня"""
+
+    __slots__ = ("sessions", "stages", "real_session_ids", "new_users", "active_users", "active_created")
+
+    def __init__(self, sessions: int, stages: Dict[Any, int], real_session_ids: Sequence[Any],
+                 new_users: int, active_users: FrozenSet[Any], active_created: array.array):
+        self.sessions = sessions
+        self.stages = stages
+        self.real_session_ids = real_session_ids
+        self.new_users = new_users
+        self.active_users = active_users
+        # Моменты создания активных пользователей, созданных в окне агрегатов, по возрастанию
+        self.active_created = active_created
+
+
+# Календарная группа дней: первый день группы в окне, количество дней и моменты создания активных пользователей
+CalendarGroup = Tuple[date, int, array.array]
+
+
+def _calendar_key(day: date, granularity: str) -> Any:
+    """Календарная неделя (понедельник) или месяц дня, как в TimeGrid.groups"""
+    if granularity == WEEK:
+        return day - timedelta(days=day.weekday())
+    return (day.year, day.month)
+
+
+def _created_sorted(user_ids: Iterable[Any], user_created: Dict[Any, float]) -> array.array:
+    """Отсортированные моменты создания пользователей окна"""
+    created = [moment for moment in map(user_created.get, user_ids) if moment is not None]
+    created.sort()
+    return array.array("d", created)
+
+
+def _count_since(created: array.array, start: float) -> int:
+    """Количество моментов >= start в отсортированном массиве"""
+    return len(created) - bisect_left(created, start)
+
+
+def _session_filter(table: ColumnarTable, start: int, stop: int, real_ids: Set[Any]):
+    """Маска сессий реальных пользователей строк start:stop (все сессии, если пользователей нет)"""
+    user_ids = table.column('user_id')[start:stop]
+    if not real_ids:
+        return user_ids, [True] * len(user_ids)
+    return user_ids, [user_id in real_ids for user_id in user_ids]
+
+
+def _select(column: Sequence[Any], mask: List[bool]) -> Sequence[Any]:
+    """Значения колонки по маске (array сохраняет тип)"""
+    selected = compress(column, mask)
+    return type(column)(column.typecode, selected) if hasattr(column, "typecode") else list(selected)
+
+
+class DailyAggregates:
+    """Дни окна набора строк бота с префиксными суммами"""
+
+    __slots__ = (
+        "grid", "days", "groups", "users", "undated_users", "sessions", "real_ids", "user_created",
+        "_sessions_prefix", "_stage_prefix",
+    )
+
+    def __init__(self, grid: TimeGrid, days: List[DayAggregate], groups: Dict[str, Dict[Any, CalendarGroup]],
+                 users: ColumnarTable, undated_users: int, sessions: ColumnarTable, real_ids: Set[Any],
+                 user_created: Dict[Any, float]):
+        self.grid = grid
+        self.days = days
+        # Недели и месяцы: календарный ключ -> группа дней окна (заполняется при первом запросе)
+        self.groups = groups
+        self.users = users
+        self.undated_users = undated_users
+        self.sessions = sessions
+        # id всех пользователей и момент создания пользователей окна (для активных пользователей роста)
+        self.real_ids = real_ids
+        self.user_created = user_created
+        self._sessions_prefix = [0, *accumulate(day.sessions for day in days)]
+        stages = {stage for day in days for stage in day.stages}
+        self._stage_prefix = {
+            stage: [0, *accumulate(day.stages.get(stage, 0) for day in days)] for stage in stages
+        }
+
+    @classmethod
+    def build(cls, users: ColumnarTable, undated_users: int, sessions: ColumnarTable, sessions_start: float,
+              tz: tzinfo, now: datetime, previous: Optional["DailyAggregates"] = None,
+              dirty_from: float = -math.inf) -> "DailyAggregates":
+        """
+        Строит агрегаты полных дней с sessions_start по сегодня
+
+        Args:
+            users: Все пользователи бота (строки без created_at в начале, дальше по возрастанию)
+            undated_users: Количество строк пользователей без created_at
+            sessions: Сессии с created_at >= sessions_start по возрастанию created_at
+            sessions_start: Начало окна сессий, секунды от эпохи
+            tz: Часовой пояс бота
+            now: Текущий момент
+            previous: Прежние агрегаты: их дни до дня dirty_from переиспользуются
+            dirty_from: Строки с created_at >= dirty_from изменились с прошлого построения
+                (-inf - все строки, inf - строки не изменились)
+        """
+        first_day = datetime.fromtimestamp(sessions_start, tz).date()
+        if datetime.combine(first_day, time(), tz).timestamp() < sessions_start:
+            first_day += timedelta(days=1)
+        today = now.astimezone(tz).date()
+        grid = TimeGrid(first_day, max((today - first_day).days + 1, 0), tz)
+
+        session_created = sessions.column('created_at')
+        if previous is not None and previous.users is users:
+            real_ids = previous.real_ids
+        else:
+            real_ids = set(users.column('telegram_id'))
+            real_ids.discard(INT_NULL if users.kind('telegram_id') == INT else None)
+            if previous is not None and not previous.real_ids and real_ids:
+                # Без пользователей реальными считались все сессии
+                dirty_from = -math.inf
+            elif previous is not None:
+                new_ids = real_ids - previous.real_ids
+                first = next((index for index, user_id in enumerate(sessions.column('user_id'))
+                              if user_id in new_ids), None) if new_ids else None
+                if first is not None:
+                    dirty_from = min(dirty_from, session_created[first])
+
+        # Пользователи окна: максимальный момент создания по id
+        window_start = bisect_left(users.column('created_at'), grid.day_starts[0], undated_users)
+        user_created: Dict[Any, float] = {}
+        for user_id, created in zip(users.column('telegram_id')[window_start:],
+                                    users.column('created_at')[window_start:]):
+            if created > user_created.get(user_id, -math.inf):
+                user_created[user_id] = created
+
+        # Окно, начавшееся раньше, добавляет пользователей в user_created: прежние
+        # active_created их не содержат, поэтому дни не переиспользуются
+        reusable: Dict[date, DayAggregate] = {}
+        if (previous is not None and previous.grid.tz == tz and dirty_from > -math.inf
+                and first_day >= previous.grid.first_day):
+            dirty_day = date.max if dirty_from == math.inf else datetime.fromtimestamp(dirty_from, tz).date()
+            for index, day in enumerate(previous.days):
+                day_date = previous.grid.first_day + timedelta(days=index)
+                if day_date < dirty_day:
+                    reusable[day_date] = day
+
+        user_created_column = users.column('created_at')
+        stage_codes = sessions.column('current_stage')
+        stage_names = sessions.categories('current_stage')
+        ids = sessions.column('id')
+        days: List[DayAggregate] = []
+        for index in range(grid.days):
+            day_date = first_day + timedelta(days=index)
+            if day_date in reusable:
+                days.append(reusable[day_date])
+                continue
+            start, end = grid.day_starts[index], grid.day_starts[index + 1]
+            first = bisect_left(session_created, start)
+            last = bisect_left(session_created, end, first)
+            user_ids, mask = _session_filter(sessions, first, last, real_ids)
+            counts = Counter(stage_codes[first:last])
+            active_users = frozenset(user_id for user_id in compress(user_ids, mask) if user_id)
+            days.append(DayAggregate(
+                sessions=last - first,
+                stages={stage_names[code]: count for code, count in counts.items() if code >= 0},
+                real_session_ids=_select(ids[first:last], mask),
+                new_users=(bisect_left(user_created_column, end, undated_users)
+                           - bisect_left(user_created_column, start, undated_users)),
+                active_users=active_users,
+                active_created=_created_sorted(active_users, user_created)
+            ))
+
+        # Посчитанные недели и месяцы, все дни которых переиспользованы
+        groups: Dict[str, Dict[Any, CalendarGroup]] = {WEEK: {}, MONTH: {}}
+        if reusable:
+            for granularity, previous_groups in previous.groups.items():
+                # Копия: запрос роста может дополнять группы прежних агрегатов во время построения
+                for key, group in list(previous_groups.items()):
+                    group_first, group_days, _ = group
+                    group_dates = [group_first + timedelta(days=offset) for offset in range(group_days)]
+                    next_date = group_first + timedelta(days=group_days)
+                    # Группа не должна продолжаться ни раньше, ни позже посчитанных дней
+                    starts_here = group_first == first_day or _calendar_key(
+                        group_first - timedelta(days=1), granularity) != key
+                    ends_here = next_date > today or _calendar_key(next_date, granularity) != key
+                    if (starts_here and ends_here and group_first >= first_day
+                            and all(day_date in reusable for day_date in group_dates)):
+                        groups[granularity][key] = group
+        return cls(grid, days, groups, users, undated_users, sessions, real_ids, user_created)
+
+    def _window(self, since: float):
+        """
+        Разбиение окна с since: первый полный день и строки сессий вне полных дней
+
+        Returns:
+            (индекс первого полного дня, диапазоны строк неполного первого дня и после конца сегодня)
+        """
+        day_starts = self.grid.day_starts
+        created = self.sessions.column('created_at')
+        first_day = min(bisect_left(day_starts, since), self.grid.days)
+        head_start = bisect_left(created, since)
+        head = (head_start, max(head_start, bisect_left(created, day_starts[first_day])))
+        tail = (max(head_start, bisect_left(created, day_starts[-1])), len(created))
+        return first_day, (head, tail)
+
+    def _real_session_ids(self, start: int, stop: int) -> Sequence[Any]:
+        """id сессий реальных пользователей строк start:stop"""
+        _, mask = _session_filter(self.sessions, start, stop, self.real_ids)
+        return _select(self.sessions.column('id')[start:stop], mask)
+
+    def metrics(self, since: float) -> Dict[str, Any]:
+        """Аналог aggregate_dashboard_metrics для сессий с created_at >= since"""
+        first_day, (head, tail) = self._window(since)
+        # Неполный первый день, полные дни и сессии после конца сегодня - по возрастанию created_at
+        session_ids: List[Any] = list(self._real_session_ids(*head))
+        for day in self.days[first_day:]:
+            session_ids.extend(day.real_session_ids)
+        session_ids.extend(self._real_session_ids(*tail))
+
+        new_users = len(self.users) - bisect_left(self.users.column('created_at'), since, self.undated_users)
+        return {
+            'total_users': len(self.users),
+            'new_users': new_users,
+            'total_sessions': len(session_ids),
+            'session_ids': session_ids
+        }
+
+    def funnel(self, since: float) -> Dict[str, Any]:
+        """Аналог aggregate_funnel для сессий с created_at >= since"""
+        first_day, ranges = self._window(since)
+        days = self.grid.days
+        stage_counts = {
+            stage: prefix[days] - prefix[first_day] for stage, prefix in self._stage_prefix.items()
+        }
+        total_sessions = self._sessions_prefix[days] - self._sessions_prefix[first_day]
+        names = self.sessions.categories('current_stage')
+        codes = self.sessions.column('current_stage')
+        for start, stop in ranges:
+            total_sessions += stop - start
+            for code, count in Counter(codes[start:stop]).items():
+                if code >= 0:
+                    stage_counts[names[code]] = stage_counts.get(names[code], 0) + count
+        return funnel_from_counts(stage_counts, total_sessions)
+
+    def growth(self, grid: TimeGrid, base_total: int, granularity: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Аналог aggregate_user_growth из дней агрегатов
+
+        Returns:
+            Точки графика или None, если сетка не состоит из дней агрегатов
+            (почасовые точки, другой часовой пояс или другой последний день)
+        """
+        if (grid.hourly or grid.tz != self.grid.tz or grid.first_day < self.grid.first_day
+                or grid.day_starts[-1] != self.grid.day_starts[-1]):
+            return None
+        offset = (grid.first_day - self.grid.first_day).days
+        days = self.days[offset:offset + grid.days]
+        point_of, labels = grid.groups(granularity)
+        # Активные - пользователи, созданные в периоде графика
+        start = grid.day_starts[0]
+
+        point_new_users = [0] * len(labels)
+        for index, day in enumerate(days):
+            point_new_users[point_of[index]] += day.new_users
+
+        if granularity not in (WEEK, MONTH):
+            point_active_users = [_count_since(day.active_created, start) for day in days]
+        else:
+            point_active_users = [0] * len(labels)
+            for index, day in enumerate(days):
+                point = point_of[index]
+                if point and (index == 0 or point_of[index - 1] != point):
+                    # Вся календарная группа внутри периода
+                    group = self._calendar_group(offset + index, granularity)
+                    point_active_users[point] = _count_since(group[2], start)
+            # Первая группа может начинаться раньше периода - объединение ее дней
+            user_created = self.user_created
+            first_group = set().union(*(day.active_users for index, day in enumerate(days) if point_of[index] == 0))
+            point_active_users[0] = sum(
+                1 for user_id in first_group if user_created.get(user_id, -math.inf) >= start
+            )
+        return growth_points(labels, point_new_users, point_active_users, base_total)
+
+    def _calendar_group(self, first_index: int, granularity: str) -> CalendarGroup:
+        """Календарная неделя или месяц, начинающиеся с дня first_index окна (считается один раз)"""
+        first_date = self.grid.first_day + timedelta(days=first_index)
+        key = _calendar_key(first_date, granularity)
+        group = self.groups[granularity].get(key)
+        if group is None:
+            last_index = first_index
+            while (last_index + 1 < self.grid.days
+                   and _calendar_key(first_date + timedelta(days=last_index + 1 - first_index), granularity) == key):
+                last_index += 1
+            indices = range(first_index, last_index + 1)
+            active_users = set().union(*(self.days[index].active_users for index in indices))
+            group = (first_date, len(indices), _created_sorted(active_users, self.user_created))
+            self.groups[granularity][key] = group
+        return group
+
+    def __repr__(self) -> str:
+        return f"DailyAggregates({self.grid!r}, sessions={len(self.sessions)}, users={len(self.users)})"
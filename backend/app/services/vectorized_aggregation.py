@@ -0,0 +1,117 @@
+"""
+Векторная (NumPy) реализация агрегаций из analytics_aggregation
+
+Колонки ColumnarTable (array('q'), array('d'), коды array('i')) отображаются
+в numpy без копирования через np.frombuffer; подсчеты выполняются через
+bincount/unique/isin.
+
+Результаты совпадают с построчной реализацией. Если id хранятся не целыми
+(колонка OBJECT, например uuid), функции возвращают None и используется
+построчная реализация.
+"""
+from datetime import datetime
+from itertools import compress
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.timestamps import TimeGrid
+from app.core.vectorized_timestamps import grid_indices
+from app.database.columnar import INT, INT_NULL, ColumnarTable
+from app.services.analytics_aggregation import funnel_from_counts, growth_points
+
+
+def _view(table: ColumnarTable, name: str, dtype) -> np.ndarray:
+    """Колонка таблицы как numpy массив без копирования"""
+    data = table.column(name)
+    if not len(data):
+        return np.empty(0, dtype=dtype)
+    return np.frombuffer(data, dtype=dtype)
+
+
+def _int_view(table: ColumnarTable, name: str) -> Optional[np.ndarray]:
+    """int64 колонка id (пропуск - INT_NULL) или None для не целых id"""
+    if table.kind(name) != INT:
+        return None
+    return _view(table, name, np.int64)
+
+
+def aggregate_dashboard_metrics(
+    all_users: ColumnarTable,
+    all_sessions: ColumnarTable,
+    cutoff_date: datetime
+) -> Optional[Dict[str, Any]]:
+    """Векторный вариант analytics_aggregation.aggregate_dashboard_metrics"""
+    user_ids = _int_view(all_users, 'telegram_id')
+    session_user_ids = _int_view(all_sessions, 'user_id')
+    if user_ids is None or session_user_ids is None:
+        return None
+    real_user_ids = user_ids[user_ids != INT_NULL]
+
+    # Сессии реальных пользователей (все сессии, если пользователей нет)
+    session_id_view = _int_view(all_sessions, 'id')
+    if len(real_user_ids):
+        mask = np.isin(session_user_ids, real_user_ids)
+        if session_id_view is not None:
+            session_ids = session_id_view[mask].tolist()
+        else:
+            session_ids = list(compress(all_sessions.column('id'), mask.tolist()))
+    else:
+        session_ids = session_id_view.tolist() if session_id_view is not None else list(all_sessions.column('id'))
+
+    # Новые пользователи: момент создания не раньше cutoff (NaN не проходит сравнение)
+    cutoff_seconds = cutoff_date.timestamp()
+    new_users = int((_view(all_users, 'created_at', np.float64) >= cutoff_seconds).sum())
+
+    return {
+        'total_users': len(user_ids),
+        'new_users': new_users,
+        'total_sessions': len(session_ids),
+        'session_ids': session_ids
+    }
+
+
+def aggregate_funnel(sessions: ColumnarTable) -> Dict[str, Any]:
+    """Векторный вариант analytics_aggregation.aggregate_funnel"""
+    # Этапы уже закодированы: количество по кодам и перевод в названия
+    categories = sessions.categories('current_stage')
+    codes = _view(sessions, 'current_stage', np.int32)
+    code_counts = np.bincount(codes[codes >= 0], minlength=len(categories)).tolist()
+    return funnel_from_counts(dict(zip(categories, code_counts)), len(sessions))
+
+
+def aggregate_user_growth(
+    all_users: ColumnarTable,
+    all_sessions: ColumnarTable,
+    grid: TimeGrid,
+    base_total: int,
+    granularity: str
+) -> Optional[List[Dict[str, Any]]]:
+    """Векторный вариант analytics_aggregation.aggregate_user_growth"""
+    user_ids = _int_view(all_users, 'telegram_id')
+    session_user_ids = _int_view(all_sessions, 'user_id')
+    if user_ids is None or session_user_ids is None:
+        return None
+
+    # Мелкий интервал строки (вне периода и NaN - индекс -1) -> точка графика
+    point_of, labels = grid.groups(granularity)
+    point_of = np.asarray(point_of, dtype=np.int64)
+    points = len(labels)
+
+    # Новые пользователи по точкам
+    user_buckets = grid_indices(_view(all_users, 'created_at', np.float64), grid)
+    new_per_point = np.bincount(point_of[user_buckets[user_buckets >= 0]], minlength=points)
+
+    # Уникальные активные пользователи по точкам: сессии реальных пользователей
+    session_buckets = grid_indices(_view(all_sessions, 'created_at', np.float64), grid)
+    mask = (
+        (session_user_ids != 0) & (session_buckets >= 0)
+        & np.isin(session_user_ids, user_ids[user_ids != INT_NULL])
+    )
+    active_per_point = np.zeros(points, dtype=np.int64)
+    if mask.any():
+        unique_users, user_index = np.unique(session_user_ids[mask], return_inverse=True)
+        pairs = np.unique(point_of[session_buckets[mask]] * len(unique_users) + user_index)
+        active_per_point = np.bincount(pairs // len(unique_users), minlength=points)
+
+    return growth_points(labels, new_per_point.tolist(), active_per_point.tolist(), base_total)
@@ -0,0 +1,70 @@
+"""
+Бенчмарк колоночного представления строк: память и время построения
+ColumnarTable против списка dict из JSON ответа PostgREST
+
+Запуск (из каталога backend):
+    python -m benchmarks.bench_columnar_rows [количество сессий]
+"""
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from app.database.columnar import ColumnarTable
+from app.services.analytics_aggregation import FUNNEL_STAGE_ORDER
+
+DAYS = 365
+
+
+def make_payload(count: int, seed: int = 42) -> bytes:
+    """JSON ответа PostgREST по sales_chat_sessions"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            'id': session_id,
+            'user_id': rng.randrange(count // 3) + 1,
+            'current_stage': rng.choice(FUNNEL_STAGE_ORDER),
+            'created_at': (now - timedelta(seconds=rng.randrange(DAYS * 86400))).isoformat(),
+        }
+        for session_id in range(1, count + 1)
+    ]
+    return json.dumps(rows).encode()
+
+
+def _measure(build):
+    """Результат, прирост памяти после построения (байт) и время (мс, без tracemalloc)"""
+    gc.collect()
+    start = time.perf_counter()
+    timed = build()
+    elapsed = time.perf_counter() - start
+    del timed
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, elapsed * 1000
+
+
+def main(count: int) -> None:
+    payload = make_payload(count)
+    print(f"сессий: {count}, JSON: {len(payload) / 2**20:.1f} MiB")
+
+    rows, rows_bytes, rows_ms = _measure(lambda: json.loads(payload))
+    columns = list(rows[0])
+    table, table_bytes, table_ms = _measure(
+        lambda: ColumnarTable.from_rows('sales_chat_sessions', rows, columns)
+    )
+    del rows
+    print(f"list[dict]     память: {rows_bytes / 2**20:>8.1f} MiB | json.loads: {rows_ms:>7.1f} ms")
+    print(f"ColumnarTable  память: {table_bytes / 2**20:>8.1f} MiB | построение: {table_ms:>7.1f} ms "
+          f"| x{rows_bytes / table_bytes:.1f} меньше")
+    print(f"байт на строку: {rows_bytes / count:.0f} -> {table_bytes / count:.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
@@ -0,0 +1,74 @@
+"""
+Бенчмарк выноса агрегации из event loop: максимальная задержка event loop
+во время агрегации роста пользователей на месте, в пуле потоков и процессов
+
+Запуск (из каталога backend):
+    python -m benchmarks.bench_cpu_offload [количество строк]
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.core.executor import CPUExecutor
+from app.core.timestamps import TimeGrid, get_timezone
+from app.database.columnar import ColumnarTable
+from app.services.analytics_aggregation import aggregate_user_growth
+
+DAYS = 365
+
+
+def make_rows(count: int):
+    now = datetime.now(timezone.utc)
+    users = [
+        {'telegram_id': i, 'created_at': (now - timedelta(seconds=i * 7919 % (DAYS * 86400))).isoformat()}
+        for i in range(count // 4)
+    ]
+    sessions = [
+        {'user_id': i % len(users), 'created_at': (now - timedelta(seconds=i * 104729 % (DAYS * 86400))).isoformat()}
+        for i in range(count - len(users))
+    ]
+    return (
+        ColumnarTable.from_rows('sales_users', users),
+        ColumnarTable.from_rows('sales_chat_sessions', sessions),
+    )
+
+
+async def _measure(executor: CPUExecutor, users, sessions, rows: int):
+    max_stall = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal max_stall
+        while running:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            max_stall = max(max_stall, time.perf_counter() - start - 0.001)
+
+    tick_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    grid = TimeGrid.ending_today(DAYS, get_timezone("Europe/Moscow"))
+    await executor.run(aggregate_user_growth, users, sessions, grid, 0, rows=rows)
+    elapsed = time.perf_counter() - start
+    running = False
+    await tick_task
+    return elapsed, max_stall
+
+
+async def main(count: int) -> None:
+    users, sessions = make_rows(count)
+    print(f"строк: {len(users) + len(sessions)} (users: {len(users)}, sessions: {len(sessions)})")
+    for name, executor, rows in (
+        ("inline", CPUExecutor(row_threshold=count + 1), count),
+        ("thread", CPUExecutor(kind="thread", row_threshold=0), count),
+        ("process", CPUExecutor(kind="process", row_threshold=0), count),
+    ):
+        await executor.run(len, [], rows=rows)  # создание пула вне замера
+        elapsed, max_stall = await _measure(executor, users, sessions, rows)
+        print(f"{name:<8} агрегация: {elapsed * 1000:>8.1f} ms | макс. задержка loop: {max_stall * 1000:>8.1f} ms")
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000))
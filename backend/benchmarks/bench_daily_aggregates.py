@@ -0,0 +1,152 @@
+"""
+Бенчмарк дневных агрегатов: окна разной длины из одного набора против агрегации строк
+
+Строит DailyAggregates по сессиям за год, сравнивает метрики, воронку и рост
+для нескольких периодов с агрегацией срезов строк (результаты должны
+совпадать) и печатает время построения, пересчета последнего дня и запросов.
+Проверяет также расширение окна: агрегаты, построенные поверх агрегатов
+более короткого окна, совпадают с построенными заново.
+
+Запуск (из каталога backend):
+    python -m benchmarks.bench_daily_aggregates [количество строк]
+"""
+import math
+import random
+import sys
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+
+from app.core.timestamps import DAY, MONTH, WEEK, TimeGrid, get_timezone
+from app.database.columnar import ColumnarTable
+from app.database.incremental import SESSION_COLUMNS, USER_COLUMNS, _merge
+from app.services import analytics_aggregation
+from app.services.analytics_aggregation import FUNNEL_STAGE_ORDER
+from app.services.daily_aggregates import DailyAggregates
+
+DAYS = 365
+WINDOWS = (1, 7, 14, 30, 90, 180, 364)
+# Окно набора до и после дозагрузки большего периода
+NARROW_DAYS, WIDE_DAYS = 30, 45
+
+
+def make_tables(count: int, now: datetime, seed: int = 42):
+    """Пользователи и сессии за год, упорядоченные по created_at, как в наборе строк бота"""
+    rng = random.Random(seed)
+    end = now.timestamp()
+
+    def timestamp():
+        return datetime.fromtimestamp(end - rng.uniform(0, DAYS * 86400), tz=timezone.utc).isoformat()
+
+    users = [
+        {'telegram_id': telegram_id, 'created_at': timestamp() if rng.random() > 0.01 else None}
+        for telegram_id in range(1, count // 4 + 1)
+    ]
+    sessions = [
+        {
+            'id': session_id,
+            'user_id': rng.randrange(len(users) * 11 // 10) if rng.random() > 0.01 else None,
+            'current_stage': rng.choice(FUNNEL_STAGE_ORDER + [None]),
+            'created_at': timestamp()
+        }
+        for session_id in range(1, count - len(users) + 1)
+    ]
+    users = ColumnarTable.from_rows('sales_users', users, USER_COLUMNS).sort_by('created_at')
+    sessions = ColumnarTable.from_rows('sales_chat_sessions', sessions, SESSION_COLUMNS).sort_by('created_at')
+    undated = sum(1 for created in users.column('created_at') if created != created)
+    return users, undated, sessions
+
+
+def _timed(func, repeat: int = 3):
+    """Результат и лучшее время из repeat запусков (мс)"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def check_widening(users, undated, sessions, tz, now: datetime) -> bool:
+    """Расширение окна с 30 до 45 дней поверх прежних агрегатов против построения заново"""
+    def window(days):
+        start = now.timestamp() - days * 86400
+        return sessions.slice(bisect_left(sessions.column('created_at'), start)), start
+
+    narrow = DailyAggregates.build(users, undated, *window(NARROW_DAYS), tz, now)
+    widened = DailyAggregates.build(users, undated, *window(WIDE_DAYS), tz, now, narrow, math.inf)
+    fresh = DailyAggregates.build(users, undated, *window(WIDE_DAYS), tz, now)
+    for days in (NARROW_DAYS, WIDE_DAYS - 1):
+        grid = TimeGrid.ending_today(days, tz, now)
+        cutoff = (now - timedelta(days=days)).timestamp()
+        results = [
+            (aggregates.metrics(cutoff), aggregates.funnel(cutoff),
+             *(aggregates.growth(grid, 0, granularity) for granularity in (DAY, WEEK, MONTH)))
+            for aggregates in (widened, fresh)
+        ]
+        if results[0] != results[1]:
+            return False
+    return True
+
+
+def main(count: int) -> None:
+    now = datetime.now(timezone.utc)
+    tz = get_timezone("Europe/Moscow")
+    users, undated, sessions = make_tables(count, now)
+    sessions_start = now.timestamp() - DAYS * 86400
+    print(f"строк: {len(users) + len(sessions)} (users: {len(users)}, sessions: {len(sessions)})")
+
+    daily, build_ms = _timed(lambda: DailyAggregates.build(users, undated, sessions, sessions_start, tz, now), 1)
+
+    # Догрузка: новые сессии сегодняшнего дня, пересчитывается только он
+    since = sessions.column('created_at')[-1] - 60
+    batch = ColumnarTable.from_rows('sales_chat_sessions', [
+        {'id': len(sessions) + i + 1, 'user_id': i + 1, 'current_stage': 'interest',
+         'created_at': (now - timedelta(seconds=i)).isoformat()}
+        for i in range(30)
+    ], SESSION_COLUMNS)
+    merged = _merge(sessions, batch.sort_by('created_at'), 'id', since)
+    _, update_ms = _timed(
+        lambda: DailyAggregates.build(users, undated, merged, sessions_start, tz, now, daily, since)
+    )
+    print(f"построение: {build_ms:.1f} ms | пересчет сегодняшнего дня: {update_ms:.1f} ms")
+
+    same = check_widening(users, undated, sessions, tz, now)
+    print(f"расширение окна {NARROW_DAYS} -> {WIDE_DAYS} дней: совпадает: {same}")
+    if not same:
+        sys.exit(1)
+
+    def sessions_since(seconds):
+        return sessions.slice(bisect_left(sessions.column('created_at'), seconds))
+
+    def users_since(seconds):
+        return users.slice(bisect_left(users.column('created_at'), seconds, undated))
+
+    for days in WINDOWS:
+        cutoff = now - timedelta(days=days)
+        grid = TimeGrid.ending_today(days, tz, now)
+        start = grid.day_starts[0]
+        granularity = DAY if days <= 92 else WEEK if days <= 183 else MONTH
+
+        def rows_impl():
+            window = sessions_since(cutoff.timestamp())
+            return (analytics_aggregation.aggregate_dashboard_metrics(users, window, cutoff),
+                    analytics_aggregation.aggregate_funnel(window),
+                    analytics_aggregation.aggregate_user_growth(
+                        users_since(start), sessions_since(start), grid, 1000, granularity))
+
+        def daily_impl():
+            return (daily.metrics(cutoff.timestamp()), daily.funnel(cutoff.timestamp()),
+                    daily.growth(grid, 1000, granularity))
+
+        expected, rows_ms = _timed(rows_impl)
+        actual, daily_ms = _timed(daily_impl)
+        same = actual == expected
+        print(f"days={days:<4} строки: {rows_ms:>8.1f} ms | дни: {daily_ms:>7.1f} ms | "
+              f"x{rows_ms / daily_ms:.1f} | совпадает: {same}")
+        if not same:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
@@ -0,0 +1,113 @@
+"""
+Бенчмарк сериализации ответа дашборда за 365 дней
+
+Сравнивает:
+- legacy: response_model=Dict[str, Any] + jsonable_encoder + stdlib JSONResponse
+- encoder: response_model=None (только jsonable_encoder) + FastJSONResponse
+- direct: direct_json_response (FastJSONResponse без jsonable_encoder)
+- model: response_model=DetailedAnalytics (для сравнения стоимости схемы)
+
+Запуск (из каталога backend):
+    python -m benchmarks.bench_dashboard_response
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.core.responses import FastJSONResponse, orjson
+from app.models.analytics import DetailedAnalytics
+
+DAYS = 365
+
+
+def make_dashboard_payload(days: int = DAYS) -> Dict[str, Any]:
+    """Ответ /dashboard той же структуры, что формирует get_dashboard_analytics"""
+    now = datetime.now()
+    stages = ['introduction', 'interest', 'consideration', 'intent', 'purchase']
+    total = 1000
+    growth = []
+    for i in range(days):
+        new_users = (i * 7) % 23
+        total += new_users
+        growth.append({
+            'date': (now - timedelta(days=days - 1 - i)).isoformat(),
+            'total_users': total,
+            'new_users': new_users,
+            'active_users': (i * 13) % 97
+        })
+    return {
+        "bot_id": "demo-bot",
+        "metrics": {
+            'total_revenue': 0.0, 'new_users': total - 1000, 'conversion_rate': 0.0, 'average_check': 0.0,
+            'ltv': 0.0, 'active_today': 42, 'total_users': total, 'total_sessions': 5321, 'period_days': days
+        },
+        "funnel": {
+            'steps': [
+                {'stage': stage, 'users_count': 100 - i * 20, 'percentage': 50.0 - i * 10, 'revenue': 0.0, 'avg_check': 0.0}
+                for i, stage in enumerate(stages)
+            ],
+            'total_users': 5321,
+            'total_conversion': 10.0
+        },
+        "user_growth": growth,
+        "generated_at": now.isoformat()
+    }
+
+
+def make_detailed_payload() -> Dict[str, Any]:
+    return {
+        "bot_id": "demo-bot", "period_days": DAYS, "total_sessions": 5321, "total_users": 4200,
+        "stages": {'introduction': 100, 'interest': 80, 'consideration': 60, 'intent': 40, 'purchase': 20},
+        "events": [], "avg_quality": 0.0, "generated_at": datetime.now().isoformat()
+    }
+
+
+def _bench(name: str, render, iterations: int, baseline: Optional[float] = None) -> float:
+    render()  # прогрев
+    start = time.perf_counter()
+    for _ in range(iterations):
+        render()
+    per_call_us = (time.perf_counter() - start) / iterations * 1_000_000
+    speedup = f" | x{baseline / per_call_us:.1f}" if baseline else ""
+    print(f"{name:<10} {per_call_us:>10.1f} us/ответ{speedup}")
+    return per_call_us
+
+
+def main(iterations: int = 500) -> None:
+    payload = make_dashboard_payload()
+    detailed = make_detailed_payload()
+    dict_field = create_response_field(name="Response_dashboard", type_=Dict[str, Any], mode="serialization")
+    model_field = create_response_field(name="Response_detailed", type_=DetailedAnalytics, mode="serialization")
+    loop = asyncio.new_event_loop()
+
+    def legacy():
+        content = loop.run_until_complete(serialize_response(field=dict_field, response_content=payload))
+        return JSONResponse(content).body
+
+    def encoder_only():
+        content = loop.run_until_complete(serialize_response(response_content=payload))
+        return FastJSONResponse(content).body
+
+    def direct():
+        return FastJSONResponse(payload).body
+
+    print(f"encoder: {'orjson' if orjson else 'json (stdlib)'}, "
+          f"dashboard {DAYS} дней: {len(direct())} байт")
+    baseline = _bench("legacy", legacy, iterations)
+    _bench("encoder", encoder_only, iterations, baseline)
+    _bench("direct", direct, iterations, baseline)
+
+    print("\n/detailed:")
+    model = _bench("model", lambda: FastJSONResponse(loop.run_until_complete(
+        serialize_response(field=model_field, response_content=detailed))).body, iterations * 10)
+    _bench("direct", lambda: FastJSONResponse(detailed).body, iterations * 10, model)
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Бенчмарк обновления дашборда: полная перезагрузка окна против догрузки по watermark
+
+Моделирует бота с сессиями за период и опрос фронтенда каждые 30 секунд:
+полная перезагрузка передает и разбирает все окно, догрузка - только строки
+после watermark с перекрытием и сверку этапов окна (только id и current_stage,
+app.database.incremental). Между опросами у части сессий меняется этап.
+Проверяет, что таблица после серии догрузок, сверок и вытеснений совпадает с
+загруженной заново.
+
+Запуск (из каталога backend):
+    python -m benchmarks.bench_incremental_fetch [количество сессий]
+"""
+import random
+import sys
+import time
+from bisect import bisect_left
+
+import orjson
+
+from app.core.config import settings
+from app.core.timestamps import SECONDS_PER_DAY
+from app.database.columnar import ColumnarTable
+from app.database.incremental import SESSION_COLUMNS, STAGE_COLUMNS, _merge, _reconcile_stages
+from app.services.analytics_aggregation import FUNNEL_STAGE_ORDER
+
+DAYS = 30
+POLL_SECONDS = 30
+POLLS = 20
+# Сессий со смененным этапом за интервал опроса
+STAGE_CHANGES = 20
+
+
+def _iso(seconds: float) -> str:
+    """Секунды от эпохи -> created_at в формате PostgREST (строки сравнимы лексикографически)"""
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds)) + f".{int(seconds % 1 * 1e6):06d}+00:00"
+
+
+def make_sessions(count: int, start: float, end: float, first_id: int, rng: random.Random):
+    """Сессии с created_at в [start, end), упорядоченные по времени создания"""
+    moments = sorted(rng.uniform(start, end) for _ in range(count))
+    return [
+        {
+            'id': first_id + i,
+            'user_id': rng.randrange(1, count // 3 + 2),
+            'current_stage': rng.choice(FUNNEL_STAGE_ORDER),
+            'created_at': _iso(moment)
+        }
+        for i, moment in enumerate(moments)
+    ]
+
+
+def _fetch(rows, created, since: float, columns=SESSION_COLUMNS) -> tuple:
+    """Строки с created_at >= since через JSON (как ответ PostgREST): таблица и объем ответа"""
+    payload = orjson.dumps(rows[bisect_left(created, _iso(since)):])
+    return ColumnarTable.from_rows('sales_chat_sessions', orjson.loads(payload), columns), len(payload)
+
+
+def main(count: int) -> None:
+    rng = random.Random(42)
+    now = time.time()
+    window = DAYS * SECONDS_PER_DAY
+    rows = make_sessions(count, now - window, now, 1, rng)
+    rate = count / window
+    overlap = settings.INCREMENTAL_OVERLAP_SECONDS
+    print(f"сессий в окне: {count} ({rate * POLL_SECONDS:.1f} новых за {POLL_SECONDS} с)")
+
+    full_ms = incremental_ms = 0.0
+    full_bytes = incremental_bytes = 0
+    full_rows = incremental_rows = 0
+    table = ColumnarTable.from_rows('sales_chat_sessions', rows, SESSION_COLUMNS)
+    next_id = count + 1
+    for _ in range(POLLS):
+        # Новые сессии за интервал опроса, часть записана с задержкой
+        new_count = max(1, round(rng.gauss(rate * POLL_SECONDS, 1)))
+        new_rows = make_sessions(new_count, now - 20, now + POLL_SECONDS, next_id, rng)
+        next_id += new_count
+        now += POLL_SECONDS
+        rows = sorted(rows + new_rows, key=lambda row: row['created_at'])
+        for row in rng.sample(rows, STAGE_CHANGES):
+            row['current_stage'] = rng.choice(FUNNEL_STAGE_ORDER)
+        created = [row['created_at'] for row in rows]
+        start = now - window
+        # Выборка колонок сверки на стороне базы (не входит в замер)
+        stage_rows = [{column: row[column] for column in STAGE_COLUMNS} for row in rows]
+
+        # Полная перезагрузка: все окно по сети и разбор всех строк
+        begin = time.perf_counter()
+        expected, size = _fetch(rows, created, start)
+        full_ms += (time.perf_counter() - begin) * 1000
+        full_bytes += size
+        full_rows += len(expected)
+
+        # Догрузка: строки после watermark с перекрытием, слияние, вытеснение и сверка этапов окна
+        since = table.column('created_at')[-1] - overlap
+        begin = time.perf_counter()
+        batch, size = _fetch(rows, created, since)
+        table = _merge(table, batch.sort_by('created_at'), 'id', since)
+        table = table.slice(bisect_left(table.column('created_at'), start))
+        stages, stages_size = _fetch(stage_rows, created, start, STAGE_COLUMNS)
+        table, _ = _reconcile_stages(table, stages, 0, len(table))
+        incremental_ms += (time.perf_counter() - begin) * 1000
+        incremental_bytes += size + stages_size
+        incremental_rows += len(batch)
+
+        if any(table.values(name) != expected.values(name) for name in SESSION_COLUMNS):
+            print("таблица после догрузки не совпадает с полной загрузкой")
+            sys.exit(1)
+
+    print(f"полная:            {full_ms / POLLS:>8.1f} ms | {full_rows // POLLS:>8} строк | {full_bytes / POLLS / 1024:>9.1f} KiB на обновление")
+    print(f"догрузка и сверка: {incremental_ms / POLLS:>8.1f} ms | {incremental_rows // POLLS:>8} строк | "
+          f"{incremental_bytes / POLLS / 1024:>9.1f} KiB на обновление")
+    print(f"x{full_ms / incremental_ms:.0f} по времени, x{full_bytes / incremental_bytes:.0f} по объему | совпадает: True")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
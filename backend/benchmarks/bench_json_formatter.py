@@ -0,0 +1,82 @@
+"""
+Микробенчмарк JSONFormatter: записей в секунду до и после оптимизации
+
+Запуск (из каталога backend):
+    python -m benchmarks.bench_json_formatter
+"""
+import json
+import logging
+import time
+import traceback
+from datetime import datetime
+
+from app.core.logging_config import JSONFormatter, orjson
+
+
+class LegacyJSONFormatter(logging.Formatter):
+    """Исходная реализация форматтера (для сравнения)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        log_data = {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+        }
+        for key in ('request_id', 'user_id', 'bot_id', 'ip_address', 'user_agent'):
+            if getattr(record, key, None):
+                log_data[key] = getattr(record, key)
+        for key, value in record.__dict__.items():
+            if key not in ['name', 'msg', 'args', 'created', 'filename', 'funcName',
+                           'levelname', 'levelno', 'lineno', 'module', 'msecs', 'message',
+                           'pathname', 'process', 'processName', 'relativeCreated', 'thread',
+                           'threadName', 'exc_info', 'exc_text', 'stack_info', 'request_id',
+                           'user_id', 'bot_id', 'ip_address', 'user_agent']:
+                if not key.startswith('_'):
+                    log_data[key] = value
+        if record.exc_info:
+            log_data["exception"] = self.formatException(record.exc_info)
+        if record.levelno >= logging.ERROR and record.exc_info is None:
+            log_data["stack_trace"] = traceback.format_stack()
+        return json.dumps(log_data, ensure_ascii=False, default=str)
+
+
+def _make_record(level: int) -> logging.LogRecord:
+    record = logging.LogRecord(
+        name="app.middleware.request_logging", level=level, pathname=__file__, lineno=42,
+        msg="GET /api/analytics/%s/dashboard - Status: %d", args=("demo-bot", 200), exc_info=None
+    )
+    record.request_id = "4c7e57b2-55ea-4135-8128-6467f113ca9f"
+    record.user_id = "123456789"
+    record.ip_address = "10.0.0.1"
+    record.method = "GET"
+    record.path = "/api/analytics/demo-bot/dashboard"
+    record.status_code = 200
+    record.process_time = 0.123
+    return record
+
+
+def _bench(formatter: logging.Formatter, record: logging.LogRecord, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        formatter.format(record)
+    return iterations / (time.perf_counter() - start)
+
+
+def main(iterations: int = 50_000) -> None:
+    print(f"encoder: {'orjson' if orjson else 'json (stdlib)'}")
+    for level, count in ((logging.INFO, iterations), (logging.ERROR, iterations // 10)):
+        record = _make_record(level)
+        legacy = _bench(LegacyJSONFormatter(), record, count)
+        current = _bench(JSONFormatter(static_fields={"environment": "production"}), record, count)
+        print(
+            f"{logging.getLevelName(level):<6} legacy: {legacy:>10,.0f} rec/s | "
+            f"current: {current:>10,.0f} rec/s | x{current / legacy:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Микробенчмарк разбора меток времени PostgREST: прежний разбор с ключом дня
+(replace + fromisoformat + date().isoformat()), parse_timestamp построчно
+и parse_timestamps для колонки
+
+parse_timestamp - тот же C разбор fromisoformat, без replace и ключа дня;
+отдельного быстрого пути для одиночных значений нет (результаты на машине с
+шумом колеблются около прежнего разбора), выигрыш дает разбор колонки.
+
+Проверяет совпадение с datetime.fromisoformat на нестандартных значениях.
+
+Запуск (из каталога backend):
+    python -m benchmarks.bench_timestamp_parsing [количество значений]
+"""
+import math
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.core.timestamps import parse_timestamp, parse_timestamps
+
+EDGE_VALUES = [
+    None, "", "2024-01-01", "2024-01-01T10:00:00", "2024-01-01 10:00:00+03:00",
+    "2024-01-01T10:00:00Z", "2024-01-01T10:00:00.5+00:00", "2024-01-01T10:00:00.+00:00",
+    "2024-01-01T10:00:00.1234567Z", "2024-01-01T10:00:00+0300", "2024-02-30T00:00:00+00:00",
+    "2024-13-01T00:00:00+00:00", "2024-01-01T24:00:00+00:00", "2024-01-01X10:00:00+00:00",
+    "2024-01-01T10:00:00-05:30", "not-a-timestamp-at-all-25", "2024-01-01T10:00:00Ж",
+]
+
+
+def make_values(count: int, seed: int = 42):
+    """Метки времени в формате PostgREST за год (часть без дробной части)"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    values = []
+    for _ in range(count):
+        moment = now - timedelta(seconds=rng.randrange(365 * 86400))
+        if rng.random() > 0.1:
+            moment -= timedelta(microseconds=rng.randrange(1_000_000))
+        values.append(moment.isoformat())
+    return values
+
+
+def _legacy(values):
+    """Прежний разбор: ключ дня YYYY-MM-DD для каждой строки"""
+    return [
+        datetime.fromisoformat(value.replace('Z', '+00:00')).date().isoformat()
+        for value in values
+    ]
+
+
+def _same(left: float, right: float) -> bool:
+    return left == right or (math.isnan(left) and math.isnan(right))
+
+
+def _timed(func, repeat: int = 3):
+    """Результат и лучшее время из repeat запусков (мс)"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def main(count: int) -> None:
+    values = make_values(count)
+    checked = values[:10_000] + EDGE_VALUES * 100
+    expected = [parse_timestamp(value) for value in checked]
+    same = all(map(_same, parse_timestamps(checked), expected))
+    print(f"значений: {count} | совпадение с fromisoformat: {same}")
+
+    _, legacy_ms = _timed(lambda: _legacy(values))
+    _, scalar_ms = _timed(lambda: list(map(parse_timestamp, values)))
+    _, batch_ms = _timed(lambda: parse_timestamps(values))
+    for name, elapsed in (
+        ("legacy (ключ дня)", legacy_ms),
+        ("parse_timestamp", scalar_ms),
+        ("parse_timestamps", batch_ms),
+    ):
+        print(f"{name:<18} {elapsed:>8.1f} ms | {elapsed * 1e6 / count:>6.0f} нс/значение | x{legacy_ms / elapsed:.1f}")
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
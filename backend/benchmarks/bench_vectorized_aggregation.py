@@ -0,0 +1,121 @@
+"""
+Бенчмарк векторной агрегации (NumPy) против построчной на 1M строк
+
+Проверяет совпадение результатов (включая пустые и нестандартные значения)
+и печатает время каждой агрегации.
+
+Запуск (из каталога backend):
+    python -m benchmarks.bench_vectorized_aggregation [количество строк]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.core.timestamps import DAY, HOUR, MAX_HOURLY_DAYS, MONTH, WEEK, TimeGrid, get_timezone
+from app.database.columnar import ColumnarTable
+from app.services import analytics_aggregation, vectorized_aggregation
+from app.services.analytics_aggregation import FUNNEL_STAGE_ORDER
+
+DAYS = 365
+
+
+def make_rows(count: int, seed: int = 42):
+    """Пользователи и сессии за период с пропусками, нулевыми id и разными смещениями"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    offsets = ("+00:00", "Z", "+03:00", "-05:00")
+    stages = FUNNEL_STAGE_ORDER + ["unknown", None]
+
+    def timestamp():
+        moment = now - timedelta(seconds=rng.randrange(DAYS * 86400))
+        suffix = rng.choice(offsets)
+        text = moment.replace(tzinfo=None).isoformat()
+        return text + suffix
+
+    users = []
+    for telegram_id in range(1, count // 4 + 1):
+        users.append({'telegram_id': telegram_id, 'created_at': timestamp() if rng.random() > 0.01 else None})
+    sessions = []
+    for session_id in range(count - len(users)):
+        user_id = rng.randrange(len(users) * 11 // 10) if rng.random() > 0.01 else None
+        sessions.append({
+            'id': session_id,
+            'user_id': user_id,
+            'current_stage': rng.choice(stages),
+            'created_at': timestamp() if rng.random() > 0.01 else ''
+        })
+    return (
+        ColumnarTable.from_rows('sales_users', users),
+        ColumnarTable.from_rows('sales_chat_sessions', sessions),
+    )
+
+
+def _timed(func, repeat: int = 3):
+    """Результат и лучшее время из repeat запусков (мс)"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def main(count: int) -> None:
+    users, sessions = make_rows(count)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=DAYS // 2)
+    # Москва - дни по 24 часа (деление), Нью-Йорк - с переходом на летнее время (бинарный поиск)
+    moscow = TimeGrid.ending_today(DAYS, get_timezone("Europe/Moscow"))
+    new_york = TimeGrid.ending_today(DAYS, get_timezone("America/New_York"))
+    # Почасовая сетка за месяц с переходом на летнее время
+    new_york_hours = TimeGrid.ending_today(MAX_HOURLY_DAYS, get_timezone("America/New_York"), hourly=True)
+    print(f"строк: {len(users) + len(sessions)} (users: {len(users)}, sessions: {len(sessions)})")
+
+    settings.AGGREGATION_ENGINE = "python"
+    cases = (
+        ("metrics",
+         lambda: analytics_aggregation.aggregate_dashboard_metrics(users, sessions, cutoff),
+         lambda: vectorized_aggregation.aggregate_dashboard_metrics(users, sessions, cutoff)),
+        ("funnel",
+         lambda: analytics_aggregation.aggregate_funnel(sessions),
+         lambda: vectorized_aggregation.aggregate_funnel(sessions)),
+        ("growth",
+         lambda: analytics_aggregation.aggregate_user_growth(users, sessions, moscow, 1000, DAY),
+         lambda: vectorized_aggregation.aggregate_user_growth(users, sessions, moscow, 1000, DAY)),
+        ("growth-ny",
+         lambda: analytics_aggregation.aggregate_user_growth(users, sessions, new_york, 1000, DAY),
+         lambda: vectorized_aggregation.aggregate_user_growth(users, sessions, new_york, 1000, DAY)),
+        ("week",
+         lambda: analytics_aggregation.aggregate_user_growth(users, sessions, moscow, 1000, WEEK),
+         lambda: vectorized_aggregation.aggregate_user_growth(users, sessions, moscow, 1000, WEEK)),
+        ("month",
+         lambda: analytics_aggregation.aggregate_user_growth(users, sessions, new_york, 1000, MONTH),
+         lambda: vectorized_aggregation.aggregate_user_growth(users, sessions, new_york, 1000, MONTH)),
+        ("hour",
+         lambda: analytics_aggregation.aggregate_user_growth(users, sessions, new_york_hours, 1000, HOUR),
+         lambda: vectorized_aggregation.aggregate_user_growth(users, sessions, new_york_hours, 1000, HOUR)),
+        ("hour-day",
+         lambda: analytics_aggregation.aggregate_user_growth(users, sessions, new_york_hours, 1000, DAY),
+         lambda: vectorized_aggregation.aggregate_user_growth(users, sessions, new_york_hours, 1000, DAY)),
+    )
+    for name, python_impl, vectorized_impl in cases:
+        expected, python_ms = _timed(python_impl)
+        actual, vectorized_ms = _timed(vectorized_impl)
+        same = actual == expected
+        print(f"{name:<9} python: {python_ms:>8.1f} ms | numpy: {vectorized_ms:>8.1f} ms | "
+              f"x{python_ms / vectorized_ms:.1f} | совпадает: {same}")
+        if not same:
+            sys.exit(1)
+
+    # Итог периода и сумма новых пользователей не зависят от гранулярности
+    for grid, granularities in ((moscow, (DAY, WEEK, MONTH)), (new_york_hours, (HOUR, DAY, WEEK, MONTH))):
+        series = [analytics_aggregation.aggregate_user_growth(users, sessions, grid, 1000, g) for g in granularities]
+        totals = {(points[-1]['total_users'], sum(point['new_users'] for point in points)) for points in series}
+        print(f"{grid!r}: точек {[len(points) for points in series]} | итоги совпадают: {len(totals) == 1}")
+        if len(totals) != 1:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,96 @@
+"""
+Время импорта приложения (холодный старт воркера) и проверка бюджета
+
+Каждый замер - отдельный интерпретатор с -X importtime; отчет показывает
+самые тяжелые модули и пакеты верхнего уровня. Если медиана времени импорта
+превышает бюджет, скрипт завершается с кодом 1 (для CI).
+
+Запуск (из каталога backend, с переменными окружения приложения):
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget-ms 600 --runs 5 --top 20
+
+Тот же бюджет проверяет tests/test_import_time.py (python -m pytest).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+DEFAULT_MODULE = "app.main"
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "700"))
+
+# (модуль, собственное время мкс, суммарное время мкс)
+ImportRecord = Tuple[str, int, int]
+
+
+def measure(module: str) -> List[ImportRecord]:
+    """Импортирует модуль в новом интерпретаторе и разбирает вывод -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Импорт {module} завершился с ошибкой:\n{result.stderr[-2000:]}")
+
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        records.append((name.strip(), int(self_us), int(cumulative_us)))
+    return records
+
+
+def total_ms(records: List[ImportRecord], module: str) -> float:
+    """Суммарное время импорта модуля в миллисекундах"""
+    return next(cumulative for name, _, cumulative in records if name == module) / 1000
+
+
+def by_package(records: List[ImportRecord]) -> Dict[str, int]:
+    """Собственное время импорта, сгруппированное по пакету верхнего уровня"""
+    totals: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in records:
+        totals[name.split(".")[0]] += self_us
+    return totals
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default=DEFAULT_MODULE)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    totals_ms = [total_ms(records, args.module) for records in runs]
+    median_ms = statistics.median(totals_ms)
+    # Для отчета берется самый быстрый замер (меньше всего шума)
+    records = runs[totals_ms.index(min(totals_ms))]
+
+    print(f"import {args.module}: median {median_ms:.0f} ms, "
+          f"runs: {', '.join(f'{t:.0f}' for t in totals_ms)} ms, modules: {len(records)}")
+
+    print(f"\nTop {args.top} пакетов (собственное время):")
+    for package, self_us in sorted(by_package(records).items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:>8.1f} ms  {package}")
+
+    print(f"\nTop {args.top} модулей (суммарное время, без {args.module}):")
+    heaviest = sorted((r for r in records if r[0] != args.module), key=lambda r: r[2], reverse=True)
+    for name, self_us, cumulative_us in heaviest[:args.top]:
+        print(f"  {cumulative_us / 1000:>8.1f} ms  (self {self_us / 1000:>6.1f})  {name}")
+
+    if median_ms > args.budget_ms:
+        print(f"\nFAIL: {median_ms:.0f} ms > бюджет {args.budget_ms:.0f} ms")
+        return 1
+    print(f"\nOK: {median_ms:.0f} ms <= бюджет {args.budget_ms:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
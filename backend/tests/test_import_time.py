@@ -0,0 +1,35 @@
+"""
+Бюджет времени импорта приложения (холодный старт воркера), см. benchmarks.import_time
+
+Запуск (из каталога backend):
+    python -m pytest tests/test_import_time.py
+"""
+import os
+import statistics
+
+from benchmarks.import_time import DEFAULT_BUDGET_MS, DEFAULT_MODULE, measure, total_ms
+
+RUNS = 3
+
+# Обязательные настройки приложения, если они не заданы в окружении
+REQUIRED_ENV = {
+    "SUPABASE_URL": "http://127.0.0.1:54321",
+    "SUPABASE_KEY": "test",
+    "TELEGRAM_BOT_TOKEN": "test",
+    "SECRET_KEY": "test",
+}
+
+
+def test_import_time_within_budget(monkeypatch, tmp_path):
+    for name, value in REQUIRED_ENV.items():
+        if not os.getenv(name):
+            monkeypatch.setenv(name, value)
+    # Импорт app.main настраивает логирование и создает каталог логов
+    monkeypatch.setenv("LOG_DIR", str(tmp_path))
+
+    totals_ms = [total_ms(measure(DEFAULT_MODULE), DEFAULT_MODULE) for _ in range(RUNS)]
+    median_ms = statistics.median(totals_ms)
+    assert median_ms <= DEFAULT_BUDGET_MS, (
+        f"import {DEFAULT_MODULE}: {median_ms:.0f} ms > бюджет {DEFAULT_BUDGET_MS:.0f} ms "
+        f"(подробный отчет: python -m benchmarks.import_time)"
+    )
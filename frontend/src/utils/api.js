@@ -80,6 +80,9 @@ export const analyticsAPI = {
   getFunnelAnalytics: (botId, days = 7) => 
     apiClient.get(`/analytics/${botId}/funnel`, { params: { days } }),
   
+  getGrowthAnalytics: (botId, days = 30, granularity = 'auto') => 
+    apiClient.get(`/analytics/${botId}/growth`, { params: { days, granularity } }),
+  
   getDetailedAnalytics: (botId, days = 30) => 
     apiClient.get(`/analytics/${botId}/detailed`, { params: { days } }),
   